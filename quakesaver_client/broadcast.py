@@ -0,0 +1,199 @@
+"""Share a single sensor websocket between many in-process consumers."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import AsyncIterator, Literal
+
+from quakesaver_client.client_websocket import TraceChunk, WebsocketHandler
+
+logger = logging.getLogger(__name__)
+
+OverflowPolicy = Literal["drop_oldest", "block"]
+
+_CLOSED = object()
+
+
+class Subscription:
+    """A consumer of a `WaveformBroadcast` with its own bounded queue.
+
+    Iterate over a subscription with `async for` to receive the chunks of the
+    sensor. All subscribers receive the very same `TraceChunk` instances, so they
+    must not modify them.
+    """
+
+    def __init__(
+        self, broadcast: WaveformBroadcast, maxsize: int, overflow: OverflowPolicy
+    ) -> None:
+        """Initialize `Subscription`, use `WaveformBroadcast.subscribe` instead.
+
+        Args:
+            broadcast: The broadcast to receive chunks from.
+            maxsize: Number of chunks the queue holds.
+            overflow: What happens when the queue is full.
+        """
+        self._broadcast = broadcast
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._ended = False
+        self._discarded = False
+        self.overflow = overflow
+        self.dropped = 0
+
+    async def _put(self, trace: TraceChunk) -> None:
+        if self._ended:
+            return
+        if self.overflow == "block":
+            await self._queue.put(trace)
+            return
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(trace)
+
+    def _end(self, discard: bool = False) -> None:
+        """End the iteration once the queued chunks are consumed.
+
+        Args:
+            discard: Drop the queued chunks and end the iteration right away.
+                Draining the queue wakes up a `_put` blocked on it.
+                Defaults to False.
+        """
+        # Only a consumer of an empty queue waits for the close signal, others
+        # find the subscription ended after they took the queued chunks.
+        waiting = self._queue.empty()
+        self._ended = True
+        self._discarded = discard
+        while discard and not self._queue.empty():
+            self._queue.get_nowait()
+        if waiting:
+            self._queue.put_nowait(_CLOSED)
+
+    def __aiter__(self) -> AsyncIterator[TraceChunk]:
+        """Iterate over the received chunks."""
+        return self
+
+    async def __anext__(self) -> TraceChunk:
+        """Wait for the next chunk."""
+        if self._ended and (self._discarded or self._queue.empty()):
+            raise StopAsyncIteration
+        trace = await self._queue.get()
+        if trace is _CLOSED:
+            raise StopAsyncIteration
+        return trace
+
+    async def close(self) -> None:
+        """Unsubscribe from the broadcast."""
+        await self._broadcast._unsubscribe(self)
+
+    async def __aenter__(self) -> Subscription:
+        """Use the subscription as a context manager which unsubscribes on exit."""
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        """Unsubscribe from the broadcast."""
+        await self.close()
+
+
+class WaveformBroadcast:
+    """Fan out the chunks of one upstream `WebsocketHandler` to many subscribers.
+
+    The upstream websocket is opened with the first subscription and closed when
+    the last subscriber leaves. Subscribers falling behind either lose their
+    oldest chunks (`drop_oldest`) or hold back the upstream, and thereby all other
+    subscribers, until they caught up (`block`).
+
+    Queued chunks outlive the next frame, so with a handler which reuses its
+    buffers every chunk is copied once before it is handed to the subscribers.
+    """
+
+    def __init__(self, handler: WebsocketHandler) -> None:
+        """Initialize `WaveformBroadcast`.
+
+        Args:
+            handler: The upstream websocket handler.
+        """
+        self.handler = handler
+        self._subscribers: list[Subscription] = []
+        self._task: asyncio.Task | None = None
+
+    @property
+    def subscribers(self) -> int:
+        """Number of active subscribers."""
+        return len(self._subscribers)
+
+    def subscribe(
+        self, maxsize: int = 100, overflow: OverflowPolicy = "drop_oldest"
+    ) -> Subscription:
+        """Add a subscriber and start the upstream websocket if needed.
+
+        Args:
+            maxsize: Number of chunks the subscriber's queue holds. Defaults to 100.
+            overflow: What happens when the queue is full. Defaults to
+                "drop_oldest".
+
+        Returns:
+            Subscription: An async iterator over the sensor's chunks.
+        """
+        subscription = Subscription(self, maxsize=maxsize, overflow=overflow)
+        self._subscribers.append(subscription)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._pump())
+        return subscription
+
+    async def _unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self._subscribers:
+            self._subscribers.remove(subscription)
+        # Discard the queue, so a pump blocked on it continues with the others.
+        subscription._end(discard=True)
+        if not self._subscribers:
+            await self.stop()
+
+    async def _pump(self) -> None:
+        try:
+            copy = self.handler.reuse_buffers
+            async for trace in self.handler.start():
+                if copy:
+                    trace = trace.copy()
+                for subscription in tuple(self._subscribers):
+                    if subscription in self._subscribers:
+                        await subscription._put(trace)
+        except Exception as e:
+            logger.exception(f"{e}")
+        finally:
+            for subscription in self._subscribers:
+                subscription._end()
+
+    async def stop(self) -> None:
+        """Close the upstream websocket and end all subscriptions."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+_broadcasts: dict[tuple[asyncio.AbstractEventLoop, str], WaveformBroadcast] = {}
+
+
+def get_broadcast(url: str) -> WaveformBroadcast:
+    """Get the broadcast of the sensor at `url` shared within the event loop.
+
+    Must be called from a coroutine. Broadcasts are not shared between event
+    loops, since their upstream task belongs to the loop it was started in.
+
+    Args:
+        url: hostname (without protocol and route).
+
+    Returns:
+        WaveformBroadcast: The shared broadcast of the sensor.
+    """
+    loop = asyncio.get_running_loop()
+    for key in [key for key in _broadcasts if key[0].is_closed()]:
+        del _broadcasts[key]
+    if (loop, url) not in _broadcasts:
+        _broadcasts[loop, url] = WaveformBroadcast(WebsocketHandler(url))
+    return _broadcasts[loop, url]
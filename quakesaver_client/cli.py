@@ -1,12 +1,16 @@
 import asyncio
+import csv
 import logging
+import time
+from datetime import datetime
 from functools import wraps
-from ipaddress import IPv4Address, ip_network
-from typing import Optional, Tuple
+from ipaddress import ip_network
+from typing import Optional
 
 import click
 
-from quakesaver_client.sensor_actor import SensorActor
+from quakesaver_client.fetch import PRODUCTS
+from quakesaver_client.models.sensor_state import RecordLength
 
 logger = logging.getLogger("quakesaver_client")
 logging.basicConfig(level=logging.DEBUG)
@@ -29,20 +33,6 @@ def click_coro(f):
     return wrapper
 
 
-async def probe_sensor(host) -> Optional[Tuple[str, IPv4Address]]:
-    logger.debug(f"probing {host}")
-    sensor = SensorActor(host)
-    alive = await sensor.is_alive()
-    if alive:
-        state = await sensor.get_state()
-        uid = state["uid"]
-        version = state["software_version"]
-        logger.info(f"Sensor {uid}@{host} (version {version}) is alive")
-        return uid, host
-    else:
-        logger.debug("No running sensor software found on %s", host)
-
-
 def local_address() -> str:
     """Retrieve hosts local IP address."""
     import socket
@@ -56,31 +46,294 @@ def local_address() -> str:
 
 @cli.command()
 @click.argument("hosts", default=local_address, required=False, type=str)
+@click.option(
+    "--concurrency",
+    default=1024,
+    show_default=True,
+    help="Hosts probed in parallel, limited by the open file limit.",
+)
+@click.option(
+    "--connect-timeout",
+    default=0.3,
+    show_default=True,
+    help="Seconds to wait for a TCP connection to a host.",
+)
+@click.option(
+    "--registry",
+    default="sensors.json",
+    show_default=True,
+    type=click.Path(dir_okay=False),
+    help="File in which known sensors are kept between scans.",
+)
+@click.option(
+    "--watch",
+    type=float,
+    default=None,
+    help="Rescan every WATCH seconds until interrupted.",
+)
 @click_coro
-async def detect(hosts: Optional[str]) -> None:
+async def detect(
+    hosts: Optional[str],
+    concurrency: int,
+    connect_timeout: float,
+    registry: str,
+    watch: Optional[float],
+) -> None:
     """Detect QuakeSaver sensors.
 
+    Known sensors are re-probed first, then the rest of the range is swept.
+    Online sensors are also written to sensors-alive.csv. A sweep of hosts
+    which do not answer takes about hosts / concurrency * connect timeout
+    seconds, e.g. 20 s for a /16 network with the defaults.
+
     Args:
         hosts: IP range to scan for sensors in CIDR notation.
         Defaults to local ip range.
+        concurrency: Number of hosts probed in parallel.
+        connect_timeout: Seconds to wait for a TCP connection to a host.
+        registry: File in which known sensors are kept between scans.
+        watch: Rescan every `watch` seconds until interrupted.
     """
+    from quakesaver_client.registry import SensorRegistry
+
     logger.info(f"detecting hosts at {hosts}")
 
-    hosts = ip_network(hosts, strict=False)
+    hosts = list(ip_network(hosts, strict=False).hosts())
+    sensor_registry = SensorRegistry(registry)
 
-    logger.info(f"scanning {hosts.num_addresses} hosts")
+    logger.info(f"scanning {len(hosts)} hosts")
 
-    sensors = await asyncio.gather(*[probe_sensor(host) for host in hosts])
-    sensors = [sensor for sensor in sensors if sensor]
-    logger.info(f"found {len(sensors)} sensors")
+    kwargs = {
+        "concurrency": concurrency,
+        "sweep_concurrency": concurrency,
+        "connect_timeout": connect_timeout,
+    }
+    if watch is not None:
+        async for _ in sensor_registry.watch(hosts, interval=watch, **kwargs):
+            sensor_registry.export_csv()
+        return
+
+    started = time.monotonic()
+    await sensor_registry.scan(hosts, **kwargs)
+    sensors = sensor_registry.online
+    logger.info(f"found {len(sensors)} sensors in {time.monotonic() - started:.1f} s")
     if len(sensors) >= 1:
-        await save_sensors(sensors)
+        sensor_registry.export_csv()
+        logger.info("saved alive sensor list to sensors-alive.csv")
+
+
+@cli.command()
+@click.argument("sensors", nargs=-1, required=True)
+@click.option(
+    "--start", "start_time", required=True, type=click.DateTime(), help="Start time."
+)
+@click.option(
+    "--end", "end_time", required=True, type=click.DateTime(), help="End time."
+)
+@click.option(
+    "--product",
+    "products",
+    multiple=True,
+    default=("waveforms",),
+    show_default=True,
+    type=click.Choice(PRODUCTS),
+    help="Product to download, can be given more than once.",
+)
+@click.option(
+    "--workers", default=4, show_default=True, help="Downloads running in parallel."
+)
+@click.option(
+    "--output",
+    default="data",
+    show_default=True,
+    type=click.Path(file_okay=False),
+    help="Directory to write the data and the manifest to.",
+)
+@click.option("--email", envvar="QS_CLIENT_EMAIL", required=True)
+@click.option("--password", envvar="QS_CLIENT_PASSWORD", required=True)
+@click.option(
+    "--domain",
+    envvar="QS_CLIENT_DOMAIN",
+    default="network.quakesaver.net",
+    show_default=True,
+)
+def fetch(
+    sensors: tuple[str, ...],
+    start_time: datetime,
+    end_time: datetime,
+    products: tuple[str, ...],
+    workers: int,
+    output: str,
+    email: str,
+    password: str,
+    domain: str,
+) -> None:
+    """Download data of cloud sensors in parallel.
+
+    SENSORS are sensor UIDs, or "all" for every sensor of the account. Runs
+    resume from the manifest in the output directory.
+
+    Args:
+        sensors: Sensor UIDs or "all".
+        start_time: Start of the time window.
+        end_time: End of the time window.
+        products: Products to download.
+        workers: Downloads running in parallel.
+        output: Directory to write the data and the manifest to.
+        email: Email of the QuakeSaver account.
+        password: Password of the QuakeSaver account.
+        domain: Base domain of the QuakeSaver cloud.
+    """
+    from quakesaver_client import QSCloudClient
+    from quakesaver_client.fetch import BulkFetcher, FetchEntry, FetchProgress
+
+    client = QSCloudClient(email=email, password=password, base_domain=domain)
+    sensor_uids = client.get_sensor_ids() if sensors == ("all",) else list(sensors)
+    fetcher = BulkFetcher(
+        client, output, start_time, end_time, products=products, workers=workers
+    )
+
+    def log_progress(progress: FetchProgress, entry: FetchEntry) -> None:
+        finished = progress.skipped + progress.done + progress.failed
+        logger.info(
+            f"[{finished}/{progress.total}] {entry.product} of {entry.sensor_uid} "
+            f"{entry.status.value}, {progress.throughput / 1e6:.2f} MB/s"
+        )
+
+    progress = fetcher.run(sensor_uids, on_progress=log_progress)
+    logger.info(
+        f"fetched {progress.done} files, {progress.bytes / 1e6:.1f} MB in "
+        f"{progress.elapsed:.1f} s, {progress.failed} failed, "
+        f"{progress.skipped} already done"
+    )
+    if progress.failed:
+        raise SystemExit(1)
+
+
+def read_sensor_list(path: str) -> list[str]:
+    """Read the addresses of the sensors in a file written by `detect`."""
+    with open(path) as f:
+        return [row["ip_address"] for row in csv.DictReader(f)]
+
+
+def sensor_hosts(hosts: tuple[str, ...], sensor_list: str) -> list[str]:
+    """Get `hosts`, else the sensors in `sensor_list`, with the sensor port."""
+    from quakesaver_client.sensor_actor import SENSOR_PORT
+
+    hosts = hosts or read_sensor_list(sensor_list)
+    if not hosts:
+        raise click.UsageError(f"no hosts given and none in {sensor_list}")
+    return [host if ":" in host else f"{host}:{SENSOR_PORT}" for host in hosts]
+
+
+@cli.command()
+@click.argument("hosts", nargs=-1)
+@click.option(
+    "--sensors",
+    "sensor_list",
+    default="sensors-alive.csv",
+    show_default=True,
+    type=click.Path(dir_okay=False),
+    help="Sensor list written by detect, used if no HOSTS are given.",
+)
+@click.option(
+    "--output",
+    default="records",
+    show_default=True,
+    type=click.Path(file_okay=False),
+    help="Directory to write the MiniSEED files to.",
+)
+@click.option("--time-length", default=600, show_default=True, help="Seconds per file.")
+@click.option(
+    "--record-length",
+    default="4096",
+    show_default=True,
+    type=click.Choice([str(length.value) for length in RecordLength]),
+    help="Size of the MiniSEED records in bytes.",
+)
+@click.option(
+    "--stats-interval",
+    default=60.0,
+    show_default=True,
+    help="Seconds between two statistics reports.",
+)
+@click_coro
+async def record(
+    hosts: tuple[str, ...],
+    sensor_list: str,
+    output: str,
+    time_length: int,
+    record_length: str,
+    stats_interval: float,
+) -> None:
+    """Record the live streams of many sensors to MiniSEED.
+
+    HOSTS are sensor addresses, optionally with a port. Without HOSTS the
+    sensors of the sensor list are recorded. Files are rotated every
+    TIME_LENGTH seconds, the rate, lag and gaps of every sensor are logged
+    periodically. Stop with Ctrl+C.
+
+    Args:
+        hosts: Sensor addresses.
+        sensor_list: Sensor list written by detect.
+        output: Directory to write the MiniSEED files to.
+        time_length: Seconds per file.
+        record_length: Size of the MiniSEED records in bytes.
+        stats_interval: Seconds between two statistics reports.
+    """
+    from quakesaver_client.recorder import FleetRecorder, MiniSEEDRecorder
+
+    hosts = sensor_hosts(hosts, sensor_list)
+
+    recorder = MiniSEEDRecorder(
+        output, record_length=int(record_length), time_length=time_length
+    )
+    fleet = FleetRecorder(recorder, stats_interval=stats_interval)
+    logger.info(f"recording {len(hosts)} sensors to {output}")
+    await fleet.record(FleetRecorder.handler(host) for host in hosts)
+
+
+@cli.command()
+@click.argument("hosts", nargs=-1)
+@click.option(
+    "--sensors",
+    "sensor_list",
+    default="sensors-alive.csv",
+    show_default=True,
+    type=click.Path(dir_okay=False),
+    help="Sensor list written by detect, used if no HOSTS are given.",
+)
+@click.option(
+    "--interval", default=5.0, show_default=True, help="Seconds between two polls."
+)
+@click.option(
+    "--concurrency", default=64, show_default=True, help="Sensors polled in parallel."
+)
+@click_coro
+async def monitor(
+    hosts: tuple[str, ...], sensor_list: str, interval: float, concurrency: int
+) -> None:
+    """Show the health of many sensors in a live table.
+
+    HOSTS are sensor addresses, optionally with a port. Without HOSTS the
+    sensors of the sensor list are monitored. The table shows CPU, memory and
+    disk usage, ringbuffer fill level, sampler rate and CRC errors, clock
+    offset and warnings, and flags saturated sensors. Stop with Ctrl+C.
+
+    Args:
+        hosts: Sensor addresses.
+        sensor_list: Sensor list written by detect.
+        interval: Seconds between two polls.
+        concurrency: Sensors polled in parallel.
+    """
+    from quakesaver_client.monitor import FleetMonitor, HealthTable
 
+    hosts = sensor_hosts(hosts, sensor_list)
+    # Log messages would tear the table apart.
+    logging.getLogger().setLevel(logging.CRITICAL)
+    logger.setLevel(logging.CRITICAL)
 
-async def save_sensors(sensors) -> None:
-    fn_alive_sensors = "sensors-alive.csv"
-    with open(fn_alive_sensors, "w") as f:
-        f.write("uid,ip_address\n")
-        for uid, ip_address in sensors:
-            f.write(f"{uid},{ip_address}\n")
-    logger.info(f"saved alive sensor list to {fn_alive_sensors}")
+    fleet = FleetMonitor(hosts, interval=interval, concurrency=concurrency)
+    table = HealthTable(hosts, click.get_text_stream("stdout"))
+    async for changed in fleet.run():
+        table.draw(changed)
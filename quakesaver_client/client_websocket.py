@@ -3,21 +3,35 @@
 from __future__ import annotations
 
 import asyncio
-import base64
+import binascii
 import gzip
+import json
 import logging
-from datetime import timedelta
-from typing import Any, AsyncIterator
+import random
+import time
+from datetime import datetime, timezone
+from fnmatch import fnmatchcase
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterable, Optional
 
 import aiohttp
 import numpy as np
-from obspy import Stream, Trace, UTCDateTime
+from numpy.typing import DTypeLike
+from obspy import Stream, Trace, UTCDateTime, read
 from obspy.core import Stats
+from pydantic.datetime_parse import parse_datetime
 
+from quakesaver_client.errors import CorruptedDataError, NoDataError
+from quakesaver_client.fdsnws import FDSNWSDataselectQuery
+from quakesaver_client.fdsnws import dataselect as fdsnws_dataselect
+from quakesaver_client.metrics import CompressionStats, StreamMetrics
 from quakesaver_client.models.data_products import DataUnit
 
 from .models.data_products import TraceModel as TraceModelBase
-from .models.websocket import WebSocketPayload, WebSocketRequest
+from .models.websocket import WebSocketRequest
+
+if TYPE_CHECKING:
+    from quakesaver_client.replay import SessionRecorder
 
 logger = logging.getLogger(__name__)
 
@@ -33,28 +47,150 @@ START_ACTION = WebSocketRequest(action="startWaveformStream")
 STOP_ACTION = WebSocketRequest(action="stopWaveformStream")
 
 
+def _timestamp(time: datetime) -> float:
+    """Convert a datetime to a POSIX timestamp, treating naive times as UTC."""
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    return time.timestamp()
+
+
+def _datetime(timestamp: float) -> datetime:
+    """Convert a POSIX timestamp to a timezone aware UTC datetime."""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
 class TraceModel(TraceModelBase):
     """Trace model."""
 
-    def _convert_waveform_data(self) -> None:
-        """Convert received binary channel data to np.ndarrays."""
-        for channel, data in self.data.items():
-            if not isinstance(data, bytes):
-                continue
-            data = base64.b64decode(data)
-            if self.compressed:
-                data = gzip.decompress(data)
-            self.data[channel] = np.frombuffer(data, dtype=DTYPE_MAP[self.data_unit])
+    def as_stream(self) -> Stream:
+        """Convert model to an obspy.Stream."""
+        return TraceDecoder().decode(self.dict()).as_stream()
+
+
+class TraceChunk:
+    """A decoded chunk of multi-channel waveform data.
+
+    All channels share the same timing and are stored as rows of a single
+    (channels x samples) array. Times are POSIX timestamps; `tmax` is the time
+    after the last sample, matching `TraceModel.endtime`. The attributes of
+    `TraceModel` are available as properties, so a chunk can be used in its
+    place.
+    """
+
+    __slots__ = ("uid", "channels", "array", "tmax", "delta_t", "data_unit")
+
+    def __init__(
+        self,
+        uid: Optional[str],
+        channels: tuple[str, ...],
+        array: np.ndarray,
+        tmax: float,
+        delta_t: float,
+        data_unit: DataUnit = DataUnit.counts,
+    ) -> None:
+        """Initialize `TraceChunk`.
+
+        Args:
+            uid: UID of the sensor.
+            channels: Channel names, one per row of `array`.
+            array: Samples with shape (channels, samples).
+            tmax: POSIX timestamp after the last sample.
+            delta_t: Sampling interval in seconds.
+            data_unit: Unit of the samples. Defaults to counts.
+        """
+        self.uid = uid
+        self.channels = channels
+        self.array = array
+        self.tmax = tmax
+        self.delta_t = delta_t
+        self.data_unit = data_unit
+
+    @classmethod
+    def from_model(cls, trace: TraceModel) -> TraceChunk:
+        """Create a chunk from a `TraceModel` with decoded data."""
+        channels = tuple(trace.data)
+        return cls(
+            uid=trace.uid,
+            channels=channels,
+            array=np.stack([trace.data[channel] for channel in channels]),
+            tmax=_timestamp(trace.endtime),
+            delta_t=trace.delta_t,
+            data_unit=DataUnit(trace.data_unit),
+        )
+
+    @classmethod
+    def concatenate(cls, chunks: list[TraceChunk]) -> TraceChunk:
+        """Join contiguous chunks of the same channels into a single chunk.
+
+        Args:
+            chunks: Chunks ordered by time, see `follows`.
+
+        Returns:
+            TraceChunk: A chunk holding the samples of all `chunks`.
+        """
+        if len(chunks) == 1:
+            return chunks[0]
+        last = chunks[-1]
+        return cls(
+            uid=last.uid,
+            channels=last.channels,
+            array=np.concatenate([chunk.array for chunk in chunks], axis=1),
+            tmax=last.tmax,
+            delta_t=last.delta_t,
+            data_unit=last.data_unit,
+        )
+
+    def copy(self) -> TraceChunk:
+        """Copy the chunk including its samples."""
+        return TraceChunk(
+            self.uid,
+            self.channels,
+            self.array.copy(),
+            self.tmax,
+            self.delta_t,
+            self.data_unit,
+        )
+
+    def follows(self, other: TraceChunk) -> bool:
+        """Check whether the chunk continues `other` without a gap."""
+        return (
+            self.uid == other.uid
+            and self.channels == other.channels
+            and self.delta_t == other.delta_t
+            and self.array.dtype == other.array.dtype
+            and abs(self.tmin - other.tmax) <= self.delta_t / 2
+        )
+
+    @property
+    def nsamples(self) -> int:
+        """Number of samples per channel."""
+        return self.array.shape[1]
+
+    @property
+    def tmin(self) -> float:
+        """POSIX timestamp of the first sample."""
+        return self.tmax - self.delta_t * self.array.shape[1]
+
+    @property
+    def endtime(self) -> datetime:
+        """Time after the last sample."""
+        return _datetime(self.tmax)
 
-        if self.compressed:
-            self.compressed = False
+    @property
+    def data(self) -> dict[str, np.ndarray]:
+        """Samples by channel name, as views into `array`."""
+        return dict(zip(self.channels, self.array))
+
+    @property
+    def compressed(self) -> bool:
+        """Chunks are always decompressed."""
+        return False
 
     def as_stream(self) -> Stream:
-        """Convert model to an obspy.Stream."""
+        """Convert chunk to an obspy.Stream."""
+        starttime = UTCDateTime(self.tmin)
         traces = []
-        for channel, data in self.data.items():
-            if not isinstance(data, np.ndarray):
-                continue
+        for channel, data in zip(self.channels, self.array):
             stats = Stats()
             stats.network = "QS"
             stats.station = self.uid
@@ -62,63 +198,504 @@ class TraceModel(TraceModelBase):
             stats.channel = channel
             stats.npts = data.size
             stats.sampling_rate = 1.0 / self.delta_t
-            stats.starttime = UTCDateTime(
-                self.endtime - timedelta(seconds=self.delta_t * data.size)
-            )
+            stats.starttime = starttime
             traces.append(Trace(data, header=stats))
         return Stream(traces=traces)
 
+    def __repr__(self) -> str:
+        """Describe the chunk without its samples."""
+        return (
+            f"TraceChunk(uid={self.uid!r}, channels={self.channels!r}, "
+            f"nsamples={self.nsamples}, endtime={self.endtime.isoformat()})"
+        )
+
+
+class TraceDecoder:
+    """Decode websocket payloads into `TraceChunk` instances.
+
+    With `reuse_buffers` the samples of every chunk are decoded into the same
+    array as long as the number of channels, samples and the data type stay the
+    same. A chunk is then only valid until the next payload is decoded.
+
+    With `channels` only the selected channels are base64 and gzip decoded, all
+    others are dropped beforehand.
+
+    Streams in physical units are decoded into `float_dtype`. With float32 the
+    samples are converted while they are copied into the chunk's array, without
+    an intermediate float64 array.
+    """
+
+    def __init__(
+        self,
+        reuse_buffers: bool = False,
+        channels: Iterable[str] | None = None,
+        float_dtype: DTypeLike = np.float64,
+    ) -> None:
+        """Initialize `TraceDecoder`.
+
+        Args:
+            reuse_buffers: Decode into a reused array. Defaults to False.
+            channels: Names or shell-style patterns, e.g. "??Z", of the channels
+                to decode. Defaults to all channels.
+            float_dtype: Data type of streams in m/s or m/s². Defaults to
+                float64.
+        """
+        self.float_dtype = np.dtype(float_dtype)
+        if self.float_dtype.kind != "f":
+            raise ValueError(f"float_dtype has to be a float type, not {float_dtype}")
+        self.reuse_buffers = reuse_buffers
+        self.channels = None if channels is None else tuple(channels)
+        self._buffer: np.ndarray | None = None
+        self._selections: dict[tuple[str, ...], tuple[str, ...]] = {}
+
+    def _select(self, channels: tuple[str, ...]) -> tuple[str, ...]:
+        """Get the subscribed subset of `channels`."""
+        if self.channels is None:
+            return channels
+        selection = self._selections.get(channels)
+        if selection is None:
+            selection = self._selections[channels] = tuple(
+                channel
+                for channel in channels
+                if any(fnmatchcase(channel, pattern) for pattern in self.channels)
+            )
+        return selection
+
+    def _get_buffer(self, nchannels: int, nsamples: int, dtype: Any) -> np.ndarray:
+        buffer = self._buffer
+        if (
+            not self.reuse_buffers
+            or buffer is None
+            or buffer.shape != (nchannels, nsamples)
+            or buffer.dtype != dtype
+        ):
+            buffer = np.empty((nchannels, nsamples), dtype=dtype)
+            if self.reuse_buffers:
+                self._buffer = buffer
+        return buffer
+
+    def decode(self, payload: dict) -> TraceChunk:
+        """Decode the payload of a waveform message.
+
+        Args:
+            payload: The `payload` of a `WebSocketPayload` holding trace data.
+
+        Returns:
+            TraceChunk: The decoded chunk.
+        """
+        try:
+            data: dict[str, str] = payload["data"]
+            data_unit = DataUnit(payload.get("data_unit") or DataUnit.counts)
+            wire_dtype = np.dtype(DTYPE_MAP[data_unit])
+            dtype = self.float_dtype if wire_dtype.kind == "f" else wire_dtype
+            channels = self._select(tuple(data))
+            raw = [binascii.a2b_base64(data[channel]) for channel in channels]
+            if payload.get("compressed"):
+                raw = [gzip.decompress(channel) for channel in raw]
+            itemsize = wire_dtype.itemsize
+            nsamples = len(raw[0]) // itemsize if raw else 0
+            if any(len(channel) != nsamples * itemsize for channel in raw):
+                raise ValueError("channels differ in length")
+
+            array = self._get_buffer(len(channels), nsamples, dtype)
+            for row, channel in zip(array, raw):
+                row[:] = np.frombuffer(channel, dtype=wire_dtype)
+
+            return TraceChunk(
+                uid=payload.get("uid"),
+                channels=channels,
+                array=array,
+                tmax=_timestamp(parse_datetime(payload["endtime"])),
+                delta_t=float(payload["delta_t"]),
+                data_unit=data_unit,
+            )
+        except (KeyError, TypeError, ValueError, binascii.Error, OSError) as e:
+            raise CorruptedDataError(f"Invalid waveform payload: {e}") from e
+
+
+def _count_received_bytes(
+    ws: aiohttp.ClientWebSocketResponse, stats: CompressionStats
+) -> None:
+    """Count the bytes and CPU time spent receiving from a websocket's socket."""
+    connection = ws._response.connection
+    protocol = connection.protocol if connection is not None else None
+    if protocol is None:
+        logger.warning("Cannot count received bytes of the websocket.")
+        return
+    data_received = protocol.data_received
+
+    def counting_data_received(data: bytes) -> None:
+        started = time.thread_time()
+        data_received(data)
+        stats.cpu_seconds += time.thread_time() - started
+        stats.wire_bytes += len(data)
+
+    protocol.data_received = counting_data_received
+
+
+async def batch_chunks(
+    chunks: AsyncIterator[TraceChunk],
+    max_messages: int = 50,
+    max_seconds: float | None = 1.0,
+    copy: bool = False,
+) -> AsyncIterator[TraceChunk]:
+    """Join the chunks of a stream into larger blocks.
+
+    A block is yielded once it holds `max_messages` chunks, `max_seconds` passed
+    since its first chunk arrived, or the next chunk does not continue it, e.g.
+    after a gap. Vectorized consumers then pay the per-message overhead only
+    once per block.
+
+    Args:
+        chunks: The stream, e.g. `WebsocketHandler.start()`.
+        max_messages: Largest number of chunks per block. Defaults to 50.
+        max_seconds: Longest time in seconds to wait for a block to fill, or None
+            to wait indefinitely. Defaults to 1.0.
+        copy: Copy every chunk, required if `chunks` reuses its buffers.
+            Defaults to False.
+
+    Yields:
+        TraceChunk: Blocks of contiguous chunks.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = chunks.__aiter__()
+    pending = asyncio.ensure_future(iterator.__anext__())
+    batch: list[TraceChunk] = []
+    deadline: float | None = None
+    try:
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if done:
+                try:
+                    chunk = pending.result()
+                except StopAsyncIteration:
+                    break
+                pending = asyncio.ensure_future(iterator.__anext__())
+                chunk = chunk.copy() if copy else chunk
+                if batch and not chunk.follows(batch[-1]):
+                    yield TraceChunk.concatenate(batch)
+                    batch = []
+                batch.append(chunk)
+
+            if not done or len(batch) >= max_messages:
+                yield TraceChunk.concatenate(batch)
+                batch = []
+            if len(batch) == 1 and max_seconds is not None:
+                deadline = loop.time() + max_seconds
+            elif not batch:
+                deadline = None
+
+        if batch:
+            yield TraceChunk.concatenate(batch)
+    finally:
+        pending.cancel()
+
 
 class WebsocketHandler:
     """Manage a sensor websocket connection."""
 
-    def __init__(self, url: str = "qssensor.local") -> None:
+    def __init__(
+        self,
+        url: str = "qssensor.local",
+        backfill: bool = True,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 60.0,
+        max_backfill_seconds: float = 3600.0,
+        reuse_buffers: bool = False,
+        metrics: StreamMetrics | None = None,
+        session_recorder: SessionRecorder | None = None,
+        channels: Iterable[str] | None = None,
+        compress: int = 0,
+        compression_stats: CompressionStats | None = None,
+        float_dtype: DTypeLike = np.float64,
+    ) -> None:
         """Initialize `WebsocketHandler`.
 
         Args:
             url: hostname (without protocol and route).
+            backfill: Request data missed while disconnected via fdsnws after a
+                reconnect and splice it into the stream. Defaults to True.
+            reconnect_delay: Base delay in seconds of the exponential reconnect
+                backoff. Defaults to 1.0.
+            max_reconnect_delay: Upper limit of the reconnect delay in seconds.
+                Defaults to 60.0.
+            max_backfill_seconds: Longest gap in seconds which is backfilled.
+                Defaults to 3600.0.
+            reuse_buffers: Decode all chunks into the same array. A chunk is then
+                only valid until the next one is received. Defaults to False.
+            metrics: Record latency and throughput of every frame into these
+                metrics. Defaults to None.
+            session_recorder: Capture every raw frame with its receive time,
+                e.g. to replay the session later with `ReplayHandler`.
+                Defaults to None.
+            channels: Names or shell-style patterns, e.g. "??Z", of the channels
+                to subscribe to. Other channels are dropped before decoding.
+                Defaults to all channels.
+            compress: Window bits (9 to 15) of the permessage-deflate websocket
+                compression to negotiate, or 0 to disable. Defaults to 0.
+            compression_stats: Count raw and received bytes and the CPU time
+                spent receiving frames. Defaults to None.
+            float_dtype: Data type of streams in m/s or m/s², e.g. float32 to
+                halve the size of chunks and everything derived from them.
+                Defaults to float64.
         """
         self._session = None
         self.url = url
+        self.backfill = backfill
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_backfill_seconds = max_backfill_seconds
+        self.metrics = metrics
+        self.session_recorder = session_recorder
+        self.compress = compress
+        self.compression_stats = compression_stats
 
-    async def create_websocket(
-        self, session: aiohttp.ClientSession
-    ) -> AsyncIterator[TraceModel]:
-        """Create a websocket the yields data chunks as `TraceModel` instances."""
-        async with session.ws_connect(f"ws://{self.url}/ws") as ws:
-            await ws.send_str(START_ACTION.json())
+        self._decoder = TraceDecoder(
+            reuse_buffers=reuse_buffers, channels=channels, float_dtype=float_dtype
+        )
+        self._reconnect_attempts = 0
+        self._last_endtime: dict[str, float] = {}
+
+    @property
+    def reuse_buffers(self) -> bool:
+        """Whether all chunks are decoded into the same array."""
+        return self._decoder.reuse_buffers
 
+    async def _receive(self, session: aiohttp.ClientSession) -> AsyncIterator[str]:
+        """Connect to the sensor and yield the raw frames of the websocket."""
+        async with session.ws_connect(
+            f"ws://{self.url}/ws", compress=self.compress
+        ) as ws:
+            stats = self.compression_stats
+            if stats is not None:
+                stats.compress = ws.compress
+                _count_received_bytes(ws, stats)
+            await ws.send_str(START_ACTION.json())
             async for msg in ws:
-                data = WebSocketPayload.parse_raw(msg.data)
+                if stats is not None:
+                    stats.frames += 1
+                    stats.raw_bytes += len(msg.data)
+                yield msg.data
 
-                if "data" not in data.payload:
-                    continue
+    async def create_websocket(
+        self, session: aiohttp.ClientSession
+    ) -> AsyncIterator[TraceChunk]:
+        """Create a websocket the yields data chunks as `TraceChunk` instances."""
+        metrics = self.metrics
+        session_recorder = self.session_recorder
+        timed = metrics is not None or session_recorder is not None
+        async for frame in self._receive(session):
+            if timed:
+                received = time.time()
+            if session_recorder is not None:
+                session_recorder.write(received, frame)
+            payload = self._parse_frame(frame)
+            if payload is None:
+                continue
 
-                trace = TraceModel(**data.payload)
-                trace._convert_waveform_data()
-                logger.debug(f"received data from uid: {trace.uid}")
-                yield trace
+            if metrics is not None:
+                parsed = time.time()
+            try:
+                trace = self._decoder.decode(payload)
+            except CorruptedDataError as e:
+                # Skip the frame, the stream itself is still intact.
+                logger.warning(f"Skipping corrupted frame: {e}")
+                if metrics is not None:
+                    metrics.record_corrupted(payload.get("uid"))
+                continue
+            if metrics is not None:
+                metrics.record(
+                    trace.uid,
+                    trace.tmax,
+                    len(frame),
+                    received,
+                    parsed,
+                    time.time(),
+                )
+            if not trace.channels:
+                continue
+            logger.debug(f"received data from uid: {trace.uid}")
+            yield trace
+
+    @staticmethod
+    def _parse_frame(frame: str) -> Optional[dict]:
+        """Get the payload of a data frame, or None for any other frame."""
+        try:
+            message = json.loads(frame)
+        except ValueError as e:
+            logger.warning(f"Skipping malformed frame: {e}")
+            return None
+        if not isinstance(message, dict):
+            return None
+        payload = message.get("payload")
+        if not isinstance(payload, dict) or "data" not in payload:
+            return None
+        return payload
 
     def _get_session(self) -> aiohttp.ClientSession:
-        if self._session is None:
+        if self._session is None or self._session.closed:
             self._session = aiohttp.ClientSession()
         return self._session
 
-    async def start(self) -> AsyncIterator[TraceModel]:
-        """Start the websocket connection."""
+    def _reconnect_backoff(self) -> float:
+        """Get the jittered exponential delay before the next reconnect attempt."""
+        delay = min(
+            self.max_reconnect_delay,
+            self.reconnect_delay * 2**self._reconnect_attempts,
+        )
+        self._reconnect_attempts += 1
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _track(self, trace: TraceChunk) -> None:
+        """Remember the end time of every channel in `trace`."""
+        for channel in trace.channels:
+            self._last_endtime[channel] = trace.tmax
+
+    def _request_backfill(self, starttime: float, endtime: float) -> Stream:
+        """Request waveforms between `starttime` and `endtime` from the sensor."""
+        params = FDSNWSDataselectQuery(
+            starttime=_datetime(starttime),
+            endtime=_datetime(endtime),
+            longestonly=False,
+        )
+        buffer = BytesIO()
+        fdsnws_dataselect(uri=f"http://{self.url}", params=params, buffer=buffer)
+        buffer.seek(0)
+        return read(buffer)
+
+    async def _backfill(self, trace: TraceChunk) -> list[TraceChunk]:
+        """Fetch the data missed between the last tracked chunk and `trace`.
+
+        Args:
+            trace: The first chunk received after a reconnect.
+
+        Returns:
+            list[TraceChunk]: Chunks covering the gap, ordered by time.
+        """
+        if not self.backfill:
+            return []
+
+        gap_end = trace.tmin
+        gaps: dict[str, tuple[float, float]] = {}
+        for channel in trace.channels:
+            if channel not in self._last_endtime:
+                continue
+            gap_start = max(
+                self._last_endtime[channel], gap_end - self.max_backfill_seconds
+            )
+            if gap_end - gap_start >= trace.delta_t:
+                gaps[channel] = (gap_start, gap_end)
+
+        if not gaps:
+            return []
+
+        starttime = min(start for start, _ in gaps.values())
+        endtime = max(end for _, end in gaps.values())
+        logger.info(f"backfilling {endtime - starttime:.1f} s of data from {self.url}.")
+        try:
+            stream = await asyncio.get_running_loop().run_in_executor(
+                None, self._request_backfill, starttime, endtime
+            )
+        except NoDataError as e:
+            logger.warning(f"No data available for backfill: {e}")
+            return []
+        except Exception as e:
+            logger.exception(f"Backfill failed: {e}")
+            return []
+
+        return self._splice(stream, gaps, trace)
+
+    @staticmethod
+    def _splice(
+        stream: Stream, gaps: dict[str, tuple[float, float]], trace: TraceChunk
+    ) -> list[TraceChunk]:
+        """Cut `stream` to the `gaps` and group it into `TraceChunk` instances.
+
+        MiniSEED does not record the unit of the samples. Integer samples are
+        taken as counts and floating point samples as the physical unit of
+        `trace`. Channels whose samples do not match the unit of `trace` are
+        skipped instead of being relabelled.
+        """
+        counts = trace.data_unit == DataUnit.counts
+        chunks: dict[tuple[float, int, float], dict[str, np.ndarray]] = {}
+        for tr in stream:
+            channel = tr.stats.channel
+            if channel not in gaps:
+                continue
+            if np.issubdtype(tr.data.dtype, np.integer) != counts:
+                logger.warning(
+                    f"Not backfilling {tr.id}: archived {tr.data.dtype} samples "
+                    f"do not match the live stream in {trace.data_unit.value}"
+                )
+                continue
+            gap_start, gap_end = gaps[channel]
+            delta = tr.stats.delta
+            tmin = tr.stats.starttime.timestamp
+            first = max(0, round((gap_start - tmin) / delta))
+            stop = min(tr.stats.npts, round((gap_end - tmin) / delta))
+            if stop <= first:
+                continue
+            data = tr.data[first:stop].astype(trace.array.dtype, copy=False)
+            key = (round(tmin + first * delta, 6), data.size, delta)
+            chunks.setdefault(key, {})[channel] = data
+
+        return [
+            TraceChunk(
+                uid=trace.uid,
+                channels=tuple(data),
+                array=np.stack(list(data.values())),
+                tmax=start + npts * delta,
+                delta_t=delta,
+                data_unit=trace.data_unit,
+            )
+            for (start, npts, delta), data in sorted(chunks.items())
+        ]
+
+    async def start(self) -> AsyncIterator[TraceChunk]:
+        """Start the websocket connection.
+
+        Reconnects with a jittered exponential backoff whenever the connection is
+        lost. Data missed in the meantime is backfilled via fdsnws and yielded
+        before the first chunk of the new connection.
+        """
         session = self._get_session()
         async with session:
+            reconnected = False
             while True:
                 try:
                     async for trace in self.create_websocket(session):
+                        if reconnected:
+                            reconnected = False
+                            self._reconnect_attempts = 0
+                            for backfilled in await self._backfill(trace):
+                                self._track(backfilled)
+                                yield backfilled
+                        self._track(trace)
                         yield trace
+                    logger.warning("Websocket closed. Trying to reconnect.")
                 except aiohttp.ServerDisconnectedError as e:
                     logger.warning(f"{e}. Trying to reconnect.")
-                    await asyncio.sleep(1)
-
                 except Exception as e:
                     logger.exception(f"{e}")
 
+                reconnected = True
+                await asyncio.sleep(self._reconnect_backoff())
+
+    def batches(
+        self, max_messages: int = 50, max_seconds: float | None = 1.0
+    ) -> AsyncIterator[TraceChunk]:
+        """Start the websocket connection and yield blocks of contiguous chunks.
+
+        See `batch_chunks` for the arguments.
+        """
+        return batch_chunks(
+            self.start(),
+            max_messages=max_messages,
+            max_seconds=max_seconds,
+            copy=self.reuse_buffers,
+        )
+
     async def stop(self) -> None:
         """Stop the websocket connection."""
         session = self._get_session()
@@ -0,0 +1,196 @@
+"""Discover sensors on the local network."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from ipaddress import IPv4Address
+from typing import AsyncIterator, Iterable, Optional
+
+import aiohttp
+from pydantic import BaseModel
+
+from quakesaver_client.sensor_actor import SENSOR_PORT, SensorActor
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 1024
+# File descriptors left for the rest of the process when probing.
+RESERVED_FILES = 64
+
+
+class DiscoveredSensor(BaseModel):
+    """A sensor found on the local network."""
+
+    uid: str
+    ip_address: IPv4Address
+    software_version: Optional[str]
+    rtt: Optional[float]
+
+
+async def tcp_probe(host: IPv4Address | str, port: int, timeout: float) -> bool:
+    """Check whether a TCP connection to `host` can be opened.
+
+    Args:
+        host: The host to probe.
+        port: The port to connect to.
+        timeout: Seconds to wait for the connection.
+
+    Returns:
+        bool: True if the port accepts connections.
+    """
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(str(host), port), timeout=timeout
+        )
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def probe_sensor(
+    host: IPv4Address | str,
+    session: aiohttp.ClientSession,
+    port: int = SENSOR_PORT,
+    connect_timeout: float = 0.3,
+    timeout: float = 2.0,
+) -> DiscoveredSensor | None:
+    """Check whether a sensor runs on `host` and get its identity.
+
+    A plain TCP connect rules out most hosts before any HTTP or websocket
+    request is made.
+
+    Args:
+        host: The host to probe.
+        session: The session to send requests with.
+        port: Port of the sensor's HTTP server. Defaults to 5533.
+        connect_timeout: Seconds to wait for the TCP connection. Defaults to 0.3.
+        timeout: Seconds to wait for the sensor's state. Defaults to 2.0.
+
+    Returns:
+        DiscoveredSensor | None: The sensor, or None if there is none.
+    """
+    logger.debug(f"probing {host}")
+    if not await tcp_probe(host, port, connect_timeout):
+        return None
+
+    sensor = SensorActor(host, port=port, session=session)
+    if not await sensor.is_alive():
+        logger.debug(f"No running sensor software found on {host}")
+        return None
+    try:
+        state = await asyncio.wait_for(sensor.get_state(), timeout=timeout)
+        found = DiscoveredSensor(
+            uid=state["uid"],
+            ip_address=host,
+            software_version=state.get("software_version"),
+            rtt=sensor.rtt,
+        )
+    except (
+        aiohttp.ClientError,
+        asyncio.TimeoutError,
+        ValueError,
+        KeyError,
+        TypeError,
+        AttributeError,
+    ) as e:
+        logger.debug(f"Invalid sensor state from {host}: {e!r}")
+        return None
+
+    logger.info(
+        f"Sensor {found.uid}@{host} (version {found.software_version}) is alive"
+    )
+    return found
+
+
+def max_concurrency() -> int:
+    """Get the number of hosts which can be probed without running out of files.
+
+    Returns:
+        int: The soft limit of open files less `RESERVED_FILES`, or
+            `DEFAULT_CONCURRENCY` if the limit is unknown or unlimited.
+    """
+    if resource is None:
+        return DEFAULT_CONCURRENCY
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return DEFAULT_CONCURRENCY
+    return max(soft - RESERVED_FILES, 1)
+
+
+async def discover(
+    hosts: Iterable[IPv4Address | str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    port: int = SENSOR_PORT,
+    connect_timeout: float = 0.3,
+    timeout: float = 2.0,
+) -> AsyncIterator[DiscoveredSensor]:
+    """Probe many hosts concurrently and yield sensors as soon as they are found.
+
+    At most `concurrency` hosts are probed at the same time and all requests share
+    a single connection pool. Hosts which do not answer take `connect_timeout`
+    each, so a sweep takes about `len(hosts) / concurrency * connect_timeout`
+    seconds, e.g. 20 s for a /16 network with the defaults.
+
+    Args:
+        hosts: The hosts to probe, e.g. `ip_network("192.168.1.0/24").hosts()`.
+        concurrency: Number of hosts probed in parallel, limited by the number
+            of files the process may open, see `max_concurrency`.
+            Defaults to 1024.
+        port: Port of the sensor's HTTP server. Defaults to 5533.
+        connect_timeout: Seconds to wait for the TCP connection. Defaults to 0.3.
+        timeout: Seconds to wait for the sensor's state. Defaults to 2.0.
+
+    Yields:
+        DiscoveredSensor: The sensors found, in the order they answered.
+    """
+    limit = max_concurrency()
+    if concurrency > limit:
+        logger.warning(
+            f"Probing {limit} instead of {concurrency} hosts in parallel "
+            "to stay below the open file limit"
+        )
+        concurrency = limit
+    pending = iter(hosts)
+    found: asyncio.Queue[DiscoveredSensor | None] = asyncio.Queue()
+
+    async def worker(session: aiohttp.ClientSession) -> None:
+        for host in pending:
+            try:
+                sensor = await probe_sensor(
+                    host, session, port, connect_timeout, timeout
+                )
+            except Exception as e:
+                # A single misbehaving host must not abort the scan.
+                logger.warning(f"Probing {host} failed: {e!r}")
+                continue
+            if sensor is not None:
+                await found.put(sensor)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        workers = asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        workers.add_done_callback(lambda _: found.put_nowait(None))
+        try:
+            while True:
+                sensor = await found.get()
+                if sensor is None:
+                    break
+                yield sensor
+            await workers
+        finally:
+            workers.cancel()
+            try:
+                await workers
+            except asyncio.CancelledError:
+                pass
@@ -37,11 +37,15 @@ def dataselect(
     uri: str,
     params: FDSNWSDataselectQuery,
     buffer: BinaryIO,
+    timeout: Optional[float] = None,
 ) -> str:
-    """Request FDSN waveform data of the sensor and stores in as a MiniSEED file."""
+    """Request FDSN waveform data of the sensor and stores in as a MiniSEED file.
+
+    `timeout` limits the seconds to wait for the server, by default forever.
+    """
     logging.debug("requesting waveform data for sensor %s.", uri)
     response = requests.get(
-        url=f"{uri}/fdsnws/dataselect/1/query", params=params.dict()
+        url=f"{uri}/fdsnws/dataselect/1/query", params=params.dict(), timeout=timeout
     )
 
     if response.status_code in get_args(NoData):
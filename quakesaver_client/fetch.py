@@ -0,0 +1,275 @@
+"""Download data of many cloud sensors in parallel and resume interrupted runs."""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, Optional
+
+from pydantic import BaseModel
+
+from quakesaver_client.models.measurement import MeasurementQuery
+
+if TYPE_CHECKING:
+    from quakesaver_client import QSCloudClient
+    from quakesaver_client.models.cloud_sensor import CloudSensor
+
+logger = logging.getLogger(__name__)
+
+MEASUREMENTS = {
+    "pga": "get_peak_horizontal_acceleration",
+    "jma": "get_jma_intensity",
+    "rms_amplitude": "get_rms_amplitude",
+    "spectral_intensity": "get_spectral_intensity",
+    "rms_offset": "get_rms_offset",
+}
+PRODUCTS = ("waveforms", "stationxml", *MEASUREMENTS)
+
+
+class FetchStatus(Enum):
+    done = "done"
+    failed = "failed"
+
+
+class FetchEntry(BaseModel):
+    """The outcome of downloading one product of one sensor.
+
+    `path` is relative to the output directory, so a run resumes from any
+    working directory.
+    """
+
+    sensor_uid: str
+    product: str
+    status: FetchStatus
+    path: Optional[Path]
+    size: int = 0
+    error: Optional[str]
+
+
+class _ManifestFile(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    entries: list[FetchEntry] = []
+
+
+class FetchProgress(BaseModel):
+    """Progress of a `BulkFetcher` run, passed to its progress callback."""
+
+    total: int
+    done: int = 0
+    failed: int = 0
+    skipped: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Bytes downloaded per second."""
+        return self.bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class BulkFetcher:
+    """Download waveforms, StationXML and measurements of many sensors.
+
+    Every product of every sensor is a task, tasks run on a pool of worker
+    threads. Finished tasks are written to a manifest in the output directory.
+    A run with the same time window skips the tasks which are done there, so
+    an interrupted run resumes where it stopped and failed tasks are retried.
+    """
+
+    def __init__(
+        self,
+        client: QSCloudClient,
+        output: Path | str,
+        start_time: datetime,
+        end_time: datetime,
+        products: Iterable[str] = ("waveforms",),
+        workers: int = 4,
+        manifest: Path | str | None = None,
+    ) -> None:
+        """Initialize `BulkFetcher`.
+
+        Args:
+            client: The client to download with.
+            output: Directory to write the data to.
+            start_time: Start of the time window.
+            end_time: End of the time window.
+            products: Products to download, see `PRODUCTS`.
+                Defaults to waveforms only.
+            workers: Downloads running in parallel. Defaults to 4.
+            manifest: The manifest file. Defaults to manifest.json in `output`.
+        """
+        products = tuple(products)
+        unknown = set(products) - set(PRODUCTS)
+        if unknown:
+            raise ValueError(f"unknown products: {', '.join(sorted(unknown))}")
+        if start_time > end_time:
+            raise ValueError("start_time is after end_time")
+
+        self.client = client
+        self.output = Path(output)
+        self.start_time = start_time
+        self.end_time = end_time
+        self.products = products
+        self.workers = workers
+        self.manifest = (
+            Path(manifest) if manifest is not None else self.output / "manifest.json"
+        )
+
+        self.entries: dict[tuple[str, str], FetchEntry] = {}
+        self._sensors: dict[str, CloudSensor] = {}
+        self._sensor_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """Load the entries of a previous run of the same time window."""
+        if not self.manifest.exists():
+            return
+        manifest = _ManifestFile.parse_file(self.manifest)
+        if (manifest.start_time, manifest.end_time) != (self.start_time, self.end_time):
+            logger.warning(
+                f"Ignoring {self.manifest}, it was written for another time window"
+            )
+            return
+        self.entries = {
+            (entry.sensor_uid, entry.product): entry for entry in manifest.entries
+        }
+
+    def _save(self) -> None:
+        """Write the manifest, called with the lock held."""
+        manifest = _ManifestFile(
+            start_time=self.start_time,
+            end_time=self.end_time,
+            entries=list(self.entries.values()),
+        )
+        tmp = self.manifest.with_name(f".{self.manifest.name}.tmp")
+        tmp.write_text(manifest.json(indent=2))
+        tmp.replace(self.manifest)
+
+    def is_done(self, sensor_uid: str, product: str) -> bool:
+        """Whether a product of a sensor was downloaded by a previous run."""
+        entry = self.entries.get((sensor_uid, product))
+        return (
+            entry is not None
+            and entry.status == FetchStatus.done
+            and entry.path is not None
+            and (self.output / entry.path).exists()
+        )
+
+    def _get_sensor(self, sensor_uid: str) -> CloudSensor:
+        """Get a sensor once and share it between its tasks."""
+        with self._lock:
+            sensor_lock = self._sensor_locks.setdefault(sensor_uid, threading.Lock())
+        with sensor_lock:
+            if sensor_uid not in self._sensors:
+                self._sensors[sensor_uid] = self.client.get_sensor(sensor_uid)
+            return self._sensors[sensor_uid]
+
+    def fetch(self, sensor_uid: str, product: str) -> Path:
+        """Download one product of one sensor.
+
+        Args:
+            sensor_uid: The sensor.
+            product: The product, see `PRODUCTS`.
+
+        Returns:
+            Path: The written file.
+        """
+        sensor = self._get_sensor(sensor_uid)
+        directory = self.output / sensor_uid
+        directory.mkdir(parents=True, exist_ok=True)
+        if product == "waveforms":
+            return sensor.get_waveform_data(
+                self.start_time, self.end_time, location_to_store=directory
+            )
+        if product == "stationxml":
+            return sensor.get_stationxml(
+                self.start_time, self.end_time, location_to_store=directory
+            )
+
+        query = MeasurementQuery(start_time=self.start_time, end_time=self.end_time)
+        result = getattr(sensor, MEASUREMENTS[product])(query)
+        path = directory / f"{product}.json"
+        path.write_text(result.json())
+        return path
+
+    def _run_task(self, sensor_uid: str, product: str) -> FetchEntry:
+        try:
+            path = self.fetch(sensor_uid, product)
+        except Exception as e:
+            logger.warning(f"Cannot fetch {product} of {sensor_uid}: {e!r}")
+            return FetchEntry(
+                sensor_uid=sensor_uid,
+                product=product,
+                status=FetchStatus.failed,
+                error=repr(e),
+            )
+        return FetchEntry(
+            sensor_uid=sensor_uid,
+            product=product,
+            status=FetchStatus.done,
+            path=os.path.relpath(path, self.output),
+            size=path.stat().st_size,
+        )
+
+    def run(
+        self,
+        sensor_uids: Iterable[str],
+        on_progress: Callable[[FetchProgress, FetchEntry], None] | None = None,
+    ) -> FetchProgress:
+        """Download the products of all sensors which are not done yet.
+
+        Args:
+            sensor_uids: The sensors to download.
+            on_progress: Called with the progress and the entry of every
+                finished task. Defaults to none.
+
+        Returns:
+            FetchProgress: Counts and throughput of the run.
+        """
+        self.output.mkdir(parents=True, exist_ok=True)
+        tasks = [(uid, product) for uid in sensor_uids for product in self.products]
+        pending = [task for task in tasks if not self.is_done(*task)]
+        progress = FetchProgress(total=len(tasks), skipped=len(tasks) - len(pending))
+        if progress.skipped:
+            logger.info(f"Resuming, {progress.skipped} of {len(tasks)} tasks done")
+
+        started = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        futures = [executor.submit(self._run_task, *task) for task in pending]
+        recorded = set()
+        try:
+            for future in as_completed(futures):
+                entry = future.result()
+                recorded.add(future)
+                self._record(entry)
+                if entry.status == FetchStatus.done:
+                    progress.done += 1
+                    progress.bytes += entry.size
+                else:
+                    progress.failed += 1
+                progress.elapsed = time.monotonic() - started
+                if on_progress is not None:
+                    on_progress(progress, entry)
+        except BaseException:
+            # Drop queued downloads, but keep the ones which finished meanwhile.
+            executor.shutdown(wait=True, cancel_futures=True)
+            for future in futures:
+                if future not in recorded and not future.cancelled():
+                    self._record(future.result())
+            raise
+        executor.shutdown()
+        return progress
+
+    def _record(self, entry: FetchEntry) -> None:
+        """Add a finished task to the manifest."""
+        with self._lock:
+            self.entries[entry.sensor_uid, entry.product] = entry
+            self._save()
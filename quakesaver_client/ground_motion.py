@@ -0,0 +1,380 @@
+"""Streaming peak ground motion and intensity computation on live waveform data."""
+
+from __future__ import annotations
+
+import logging
+from collections import deque
+from typing import Optional
+
+import numpy as np
+from scipy.signal import butter, sosfilt, sosfilt_zi
+
+from quakesaver_client.client_websocket import TraceChunk
+from quakesaver_client.models.sensor_state import (
+    JMAIntensityConfig,
+    PeakGroundMotionConfig,
+    PGMMeasurement,
+)
+
+logger = logging.getLogger(__name__)
+
+GAL = 100.0  # cm/s² per m/s²
+
+# Lower bounds of CWB intensities 1 to 7 in gal.
+CWB_THRESHOLDS = np.array([0.8, 2.5, 8.0, 25.0, 80.0, 250.0, 400.0])
+
+JMA_DURATION_SECONDS = 0.3
+
+
+def mmi_from_pga_pgv(pga: float, pgv: float) -> float:
+    """Modified Mercalli intensity after Worden et al. (2012).
+
+    Args:
+        pga: Peak ground acceleration in m/s².
+        pgv: Peak ground velocity in m/s.
+
+    Returns:
+        float: The larger of the PGA and PGV based intensities, clipped to 1-10.
+    """
+    mmi = 1.0
+    if pga > 0.0:
+        log_pga = np.log10(pga * GAL)
+        mmi = max(
+            mmi, 1.78 + 1.55 * log_pga if log_pga <= 1.57 else -1.60 + 3.70 * log_pga
+        )
+    if pgv > 0.0:
+        log_pgv = np.log10(pgv * 100.0)
+        mmi = max(
+            mmi, 3.78 + 1.47 * log_pgv if log_pgv <= 0.53 else 2.89 + 3.16 * log_pgv
+        )
+    return float(min(mmi, 10.0))
+
+
+def cwb_intensity(pga: float) -> int:
+    """CWB (Taiwan) seismic intensity from peak ground acceleration in m/s²."""
+    return int(np.searchsorted(CWB_THRESHOLDS, pga * GAL, side="right"))
+
+
+def jma_filter(frequencies: np.ndarray) -> np.ndarray:
+    """Gain of the JMA instrumental intensity filter chain.
+
+    Combines the period effect filter, the high-cut filter and the low-cut filter
+    of the Japan Meteorological Agency.
+
+    Args:
+        frequencies: Frequencies in Hz.
+
+    Returns:
+        np.ndarray: The filter gain at `frequencies`.
+    """
+    with np.errstate(divide="ignore"):
+        period = np.where(frequencies > 0.0, np.sqrt(1.0 / frequencies), 0.0)
+    x = frequencies / 10.0
+    high_cut = (
+        1.0
+        + 0.694 * x**2
+        + 0.241 * x**4
+        + 0.0557 * x**6
+        + 0.009664 * x**8
+        + 0.00134 * x**10
+        + 0.000155 * x**12
+    ) ** -0.5
+    low_cut = np.sqrt(1.0 - np.exp(-((frequencies / 0.5) ** 3)))
+    return period * high_cut * low_cut
+
+
+def jma_intensity(acceleration: np.ndarray, delta_t: float) -> float:
+    """JMA instrumental intensity of a multi-component acceleration record.
+
+    Args:
+        acceleration: Acceleration in m/s² with shape (components, samples).
+        delta_t: Sampling interval in seconds.
+
+    Returns:
+        float: The JMA instrumental intensity.
+    """
+    nsamples = acceleration.shape[1]
+    nfft = 1 << (nsamples - 1).bit_length()
+    spectrum = np.fft.rfft(acceleration * GAL, n=nfft, axis=1)
+    spectrum *= jma_filter(np.fft.rfftfreq(nfft, delta_t))
+    filtered = np.fft.irfft(spectrum, n=nfft, axis=1)[:, :nsamples]
+
+    magnitude = np.sqrt(np.einsum("ij,ij->j", filtered, filtered))
+    nabove = min(nsamples, max(1, int(np.ceil(JMA_DURATION_SECONDS / delta_t))))
+    threshold = np.partition(magnitude, nsamples - nabove)[nsamples - nabove]
+    if threshold <= 0.0:
+        return 0.0
+    return float(2.0 * np.log10(threshold) + 0.94)
+
+
+class _SlidingPeak:
+    """Maximum of per-chunk peaks within a sliding time window."""
+
+    __slots__ = ("window", "_peaks")
+
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self._peaks: deque[tuple[float, float]] = deque()
+
+    def update(self, time: float, peak: float) -> float:
+        """Add the peak of the chunk ending at `time` and get the window maximum."""
+        while self._peaks and self._peaks[-1][1] <= peak:
+            self._peaks.pop()
+        self._peaks.append((time, peak))
+        while self._peaks[0][0] <= time - self.window:
+            self._peaks.popleft()
+        return self._peaks[0][1]
+
+
+class _SensorState:
+    """Filter states and windows of a single sensor, shared by all channels."""
+
+    def __init__(
+        self,
+        channels: tuple[str, ...],
+        delta_t: float,
+        window: float,
+        jma_nsamples: int,
+        dtype: np.dtype,
+    ) -> None:
+        self.channels = channels
+        self.delta_t = delta_t
+        self.highpass: Optional[np.ndarray] = None
+        self.lowpass: Optional[np.ndarray] = None
+        self.velocity: Optional[np.ndarray] = None
+        self.velocity_highpass: Optional[np.ndarray] = None
+        self.pga = _SlidingPeak(window)
+        self.pha = _SlidingPeak(window)
+        self.pgv = _SlidingPeak(window)
+        self.jma_buffer = np.zeros((len(channels), jma_nsamples), dtype=dtype)
+        self.jma_head = 0
+        self.jma_filled = 0
+        self.jma = 0.0
+        self.jma_slot: Optional[int] = None
+
+
+class GroundMotionProcessor:
+    """Compute PGA, PGV and intensities from live acceleration streams.
+
+    Every chunk is highpass filtered to remove the offset, lowpass filtered for
+    PGA and integrated and highpass filtered again for PGV. The filter states are
+    carried across chunks, so no transients occur at chunk borders. Peaks are
+    taken over a sliding window of `window_length_seconds`. The JMA intensity is
+    computed with the JMA filter chain over the last
+    `jma_window_length_seconds` of all components, once every
+    `jma_interval_seconds` of data since it needs a spectrum of the whole window.
+
+    The input has to be acceleration; samples are multiplied by `gain` to get
+    m/s². Channels ending with one of `vertical_suffixes` are treated as vertical,
+    all others as horizontal components.
+    """
+
+    def __init__(
+        self,
+        pga_lowpass: float = 10.0,
+        pgv_highpass: float = 0.075,
+        window_length_seconds: float = 30.0,
+        jma_window_length_seconds: float = 60.0,
+        gain: float | dict[str, float] = 1.0,
+        vertical_suffixes: tuple[str, ...] = ("Z", "3"),
+        filter_order: int = 2,
+        jma_interval_seconds: float = 1.0,
+    ) -> None:
+        """Initialize `GroundMotionProcessor`.
+
+        Args:
+            pga_lowpass: Corner frequency of the PGA lowpass in Hz. Defaults to 10.
+            pgv_highpass: Corner frequency of the highpass filters in Hz.
+                Defaults to 0.075.
+            window_length_seconds: Length of the peak window. Defaults to 30.
+            jma_window_length_seconds: Length of the JMA intensity window.
+                Defaults to 60.
+            gain: Factor converting samples to m/s², either for all or per
+                channel. Defaults to 1.0 for data in `DataUnit.m_s2`.
+            vertical_suffixes: Channel name suffixes of vertical components.
+                Defaults to ("Z", "3").
+            filter_order: Order of the Butterworth filters. Defaults to 2.
+            jma_interval_seconds: Update the JMA intensity whenever a chunk ends
+                in a new interval of this length, or with every chunk if 0.
+                Defaults to 1.0.
+        """
+        self.pga_lowpass = pga_lowpass
+        self.pgv_highpass = pgv_highpass
+        self.window_length_seconds = window_length_seconds
+        self.jma_window_length_seconds = jma_window_length_seconds
+        self.gain = gain
+        self.vertical_suffixes = vertical_suffixes
+        self.filter_order = filter_order
+        self.jma_interval_seconds = jma_interval_seconds
+
+        self._sos: dict[float, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._sensors: dict[Optional[str], _SensorState] = {}
+
+    @classmethod
+    def from_config(
+        cls,
+        config: PeakGroundMotionConfig,
+        jma_config: JMAIntensityConfig | None = None,
+        gain: float | dict[str, float] = 1.0,
+    ) -> GroundMotionProcessor:
+        """Create a processor with the parameters a sensor uses.
+
+        Args:
+            config: The `PeakGroundMotionState.config` of a sensor.
+            jma_config: The `JMAIntensityState.config` of a sensor.
+            gain: Factor converting samples to m/s². Defaults to 1.0.
+
+        Returns:
+            GroundMotionProcessor: The configured processor.
+        """
+        jma_config = jma_config or JMAIntensityConfig()
+        return cls(
+            pga_lowpass=config.pga_lowpass,
+            pgv_highpass=config.pgv_highpass,
+            window_length_seconds=config.window_length_seconds,
+            jma_window_length_seconds=jma_config.window_length_seconds,
+            gain=gain,
+        )
+
+    def process(self, trace: TraceChunk) -> PGMMeasurement:
+        """Process a chunk and get the current peak ground motion.
+
+        Args:
+            trace: A decoded chunk as yielded by `WebsocketHandler.start`.
+
+        Returns:
+            PGMMeasurement: Peak values within the window ending with the chunk.
+        """
+        sensor = self._get_sensor(trace)
+        raw = trace.array * self._gains(trace.channels)
+        acceleration, velocity = self._filter(sensor, raw)
+
+        horizontal = [
+            not channel.endswith(self.vertical_suffixes) for channel in trace.channels
+        ]
+        pga = sensor.pga.update(trace.tmax, _peak_norm(acceleration))
+        pha = sensor.pha.update(trace.tmax, _peak_norm(acceleration[horizontal]))
+        pgv = sensor.pgv.update(trace.tmax, _peak_norm(velocity))
+        jma = self._jma_intensity(sensor, raw, trace.tmax)
+
+        return PGMMeasurement(
+            timestamp=trace.endtime,
+            tags={"uid": trace.uid} if trace.uid else {},
+            pga=pga,
+            pha=pha,
+            pgv=pgv,
+            mod_mercalli_intensity=mmi_from_pga_pgv(pga, pgv),
+            cwb_intensity=cwb_intensity(pga),
+            jma_intensity=jma,
+        )
+
+    def _gains(self, channels: tuple[str, ...]) -> np.ndarray | float:
+        if not isinstance(self.gain, dict):
+            return self.gain
+        return np.array([[self.gain.get(channel, 1.0)] for channel in channels])
+
+    def _get_sensor(self, trace: TraceChunk) -> _SensorState:
+        sensor = self._sensors.get(trace.uid)
+        if (
+            sensor is None
+            or sensor.delta_t != trace.delta_t
+            or sensor.channels != trace.channels
+        ):
+            jma_nsamples = int(round(self.jma_window_length_seconds / trace.delta_t))
+            sensor = self._sensors[trace.uid] = _SensorState(
+                trace.channels,
+                trace.delta_t,
+                self.window_length_seconds,
+                jma_nsamples,
+                # Keep float32 streams compact, integer counts are scaled to float64.
+                trace.array.dtype if trace.array.dtype.kind == "f" else np.float64,
+            )
+        return sensor
+
+    def _get_sos(self, delta_t: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get highpass, lowpass and their steady state for a sampling interval."""
+        if delta_t not in self._sos:
+            nyquist = 0.5 / delta_t
+            highpass = butter(
+                self.filter_order,
+                self.pgv_highpass,
+                "highpass",
+                fs=1.0 / delta_t,
+                output="sos",
+            )
+            lowpass = butter(
+                self.filter_order,
+                min(self.pga_lowpass, 0.9 * nyquist),
+                "lowpass",
+                fs=1.0 / delta_t,
+                output="sos",
+            )
+            self._sos[delta_t] = (highpass, lowpass, sosfilt_zi(highpass))
+        return self._sos[delta_t]
+
+    def _filter(
+        self, sensor: _SensorState, data: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Get filtered acceleration and velocity of all channels of a chunk."""
+        highpass, lowpass, highpass_zi = self._get_sos(sensor.delta_t)
+        if sensor.highpass is None:
+            nchannels = data.shape[0]
+            # Start in steady state for the sensor offset to avoid a step response.
+            sensor.highpass = highpass_zi[:, np.newaxis, :] * data[np.newaxis, :, :1]
+            sensor.lowpass = np.zeros((lowpass.shape[0], nchannels, 2))
+            sensor.velocity = np.zeros((nchannels, 1))
+            sensor.velocity_highpass = np.zeros((highpass.shape[0], nchannels, 2))
+
+        acceleration, sensor.highpass = sosfilt(highpass, data, zi=sensor.highpass)
+        velocity = np.cumsum(acceleration, axis=1) * sensor.delta_t + sensor.velocity
+        sensor.velocity = velocity[:, -1:]
+        velocity, sensor.velocity_highpass = sosfilt(
+            highpass, velocity, zi=sensor.velocity_highpass
+        )
+        acceleration, sensor.lowpass = sosfilt(lowpass, acceleration, zi=sensor.lowpass)
+        return acceleration, velocity
+
+    def _jma_intensity(
+        self, sensor: _SensorState, acceleration: np.ndarray, tmax: float
+    ) -> float:
+        """Update the JMA ring buffer with a chunk and get the intensity.
+
+        The intensity is only recomputed for the first chunk ending in a new
+        interval, otherwise the last value is returned.
+        """
+        buffer = sensor.jma_buffer
+        nsamples = buffer.shape[1]
+        data = acceleration[:, -nsamples:]
+        head = sensor.jma_head
+        split = min(data.shape[1], nsamples - head)
+        buffer[:, head : head + split] = data[:, :split]
+        buffer[:, : data.shape[1] - split] = data[:, split:]
+
+        sensor.jma_head = (head + data.shape[1]) % nsamples
+        sensor.jma_filled = min(nsamples, sensor.jma_filled + data.shape[1])
+
+        interval = self.jma_interval_seconds
+        slot = int(tmax // interval) if interval > 0.0 else None
+        if slot is not None and slot == sensor.jma_slot:
+            return sensor.jma
+        sensor.jma_slot = slot
+
+        # Oldest samples first: the part after the head, then the part before it.
+        head = sensor.jma_head
+        start = head - sensor.jma_filled
+        if start >= 0:
+            window = buffer[:, start:head]
+        else:
+            window = np.concatenate(
+                (buffer[:, nsamples + start :], buffer[:, :head]), axis=1
+            )
+        window = window - window.mean(axis=1, keepdims=True)
+        sensor.jma = jma_intensity(window, sensor.delta_t)
+        return sensor.jma
+
+
+def _peak_norm(components: np.ndarray) -> float:
+    """Peak of the vector norm over the rows of `components`."""
+    if not components.size:
+        return 0.0
+    return float(np.sqrt(np.einsum("ij,ij->j", components, components).max()))
@@ -0,0 +1,367 @@
+"""Sensor handle routing every query to the fastest of the LAN and the cloud."""
+
+from __future__ import annotations
+
+import logging
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional
+from urllib.parse import urlparse
+
+import requests
+from pydantic import BaseModel
+
+from quakesaver_client.errors import CorruptedDataError, NoDataError, UnknownError
+from quakesaver_client.models.cloud_sensor import CloudSensor
+from quakesaver_client.models.data_product_query import (
+    DataProductQuery,
+    EventRecordQueryResult,
+    HVSpectraQueryResult,
+    NoiseAutocorrelationQueryResult,
+)
+from quakesaver_client.models.local_sensor import LocalSensor
+from quakesaver_client.models.measurement import MeasurementQuery, MeasurementResult
+from quakesaver_client.sensor_actor import SENSOR_PORT
+
+logger = logging.getLogger(__name__)
+
+LOCAL = "local"
+CLOUD = "cloud"
+
+FALLBACK_ERRORS = (
+    requests.RequestException,
+    OSError,
+    CorruptedDataError,
+    NoDataError,
+    UnknownError,
+)
+
+
+def tcp_rtt(host: str, port: int, timeout: float = 1.0) -> Optional[float]:
+    """Measure the time to open a TCP connection.
+
+    Args:
+        host: Host to connect to.
+        port: Port to connect to.
+        timeout: Seconds to wait for the connection. Defaults to 1.0.
+
+    Returns:
+        Optional[float]: Seconds to connect, or None if the host is unreachable.
+    """
+    started = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return time.perf_counter() - started
+    except OSError:
+        return None
+
+
+class PathStats:
+    """Reachability and latency of one path to the sensor."""
+
+    def __init__(self, smoothing: float = 0.2) -> None:
+        """Initialize `PathStats`.
+
+        Args:
+            smoothing: Weight of a new call in the moving average of the call
+                latency. Defaults to 0.2.
+        """
+        self.smoothing = smoothing
+        self.reachable = False
+        self.rtt: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.calls = 0
+        self.failures = 0
+
+    @property
+    def estimate(self) -> float:
+        """Expected seconds per call, infinite if unreachable."""
+        if not self.reachable:
+            return float("inf")
+        if self.latency is not None:
+            return self.latency
+        return self.rtt if self.rtt is not None else float("inf")
+
+    def record(self, seconds: float) -> None:
+        """Record the duration of a successful call."""
+        self.calls += 1
+        self.reachable = True
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += self.smoothing * (seconds - self.latency)
+
+
+class CallRecord(BaseModel):
+    """A call of a `HybridSensor` and the path which served it."""
+
+    method: str
+    path: Optional[str]
+    seconds: float
+    fallback: bool = False
+    error: Optional[str]
+
+
+class HybridSensor:
+    """A sensor reached on the LAN when possible and through the cloud otherwise.
+
+    A background thread probes the TCP round trip time of the sensor's HTTP
+    server on the LAN and of the cloud API. Every query is sent to the path
+    with the lower expected latency, which is the moving average of the calls
+    served by the path, or its round trip time before the first call. If a
+    call fails, it is retried on the other path and the failed path is marked
+    unreachable until the next successful probe. `history` records which path
+    served each call.
+
+    Requests to the sensor on the LAN are bounded by `probe_timeout` when it
+    is connected and by `request_timeout` for queries, so an unresponsive
+    sensor falls back to the cloud instead of blocking. The path statistics
+    and `local` are shared with the probe thread and guarded by a lock.
+    """
+
+    def __init__(
+        self,
+        cloud: CloudSensor,
+        local_url: Optional[str] = None,
+        local: Optional[LocalSensor] = None,
+        probe_interval: float = 30.0,
+        probe_timeout: float = 1.0,
+        history_size: int = 1000,
+        request_timeout: float = 10.0,
+    ) -> None:
+        """Initialize `HybridSensor`.
+
+        Args:
+            cloud: The sensor in the cloud.
+            local_url: Hostname and port of the sensor on the LAN, e.g.
+                "192.168.1.10:5533". Defaults to the address of `local`.
+            local: The sensor on the LAN, if already connected. Otherwise it is
+                connected once a probe reaches `local_url`.
+            probe_interval: Seconds between two probes. Defaults to 30.
+            probe_timeout: Seconds to wait for a probe. Defaults to 1.
+            history_size: Number of calls kept in `history`. Defaults to 1000.
+            request_timeout: Seconds to wait for the sensor on the LAN to answer
+                a query connected by a probe. Defaults to 10.
+        """
+        self.cloud = cloud
+        self.local = local
+        self.local_url = local_url or (local._url if local is not None else None)
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.request_timeout = request_timeout
+
+        self.paths = {LOCAL: PathStats(), CLOUD: PathStats()}
+        self.paths[CLOUD].reachable = True
+        self.history: deque[CallRecord] = deque(maxlen=history_size)
+
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._prober: Optional[threading.Thread] = None
+
+    @property
+    def uid(self) -> str:
+        """UID of the sensor."""
+        return self.cloud.uid
+
+    def start(self) -> None:
+        """Probe both paths once and keep probing in a background thread."""
+        self.probe()
+        self._stopped.clear()
+        self._prober = threading.Thread(
+            target=self._probe_forever, name=f"probe-{self.uid}", daemon=True
+        )
+        self._prober.start()
+
+    def close(self) -> None:
+        """Stop probing and close the connections to the sensor on the LAN."""
+        self._stopped.set()
+        if self._prober is not None:
+            self._prober.join()
+            self._prober = None
+        if self.local is not None:
+            self.local.close()
+
+    def __enter__(self) -> HybridSensor:
+        """Start probing, see `start`."""
+        self.start()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        """Stop probing, see `close`."""
+        self.close()
+
+    def _probe_forever(self) -> None:
+        while not self._stopped.wait(self.probe_interval):
+            self.probe()
+
+    def probe(self) -> None:
+        """Measure the round trip times of both paths now."""
+        cloud_host = urlparse(self.cloud._api_base_url).hostname
+        cloud_rtt = tcp_rtt(cloud_host, 443, self.probe_timeout)
+
+        local_rtt = None
+        connected = None
+        if self.local_url is not None:
+            host, _, port = self.local_url.partition(":")
+            local_rtt = tcp_rtt(host, int(port or SENSOR_PORT), self.probe_timeout)
+        if local_rtt is not None and self.local is None:
+            try:
+                connected = LocalSensor.connect(
+                    self.local_url, trusted=True, timeout=self.probe_timeout
+                )
+                connected._timeout = self.request_timeout
+            except FALLBACK_ERRORS as e:
+                logger.info(f"Cannot connect to {self.uid} at {self.local_url}: {e}")
+                local_rtt = None
+
+        with self._lock:
+            cloud = self.paths[CLOUD]
+            cloud.rtt = cloud_rtt or cloud.rtt
+            if self.local_url is None:
+                return
+            local = self.paths[LOCAL]
+            local.rtt = local_rtt
+            local.reachable = local_rtt is not None
+            if connected is not None:
+                if self.local is None:
+                    self.local = connected
+                else:
+                    # Connected by a concurrent probe meanwhile.
+                    connected.close()
+
+    def route(self) -> list[str]:
+        """Get the paths in the order they are tried, fastest first."""
+        with self._lock:
+            return self._route()
+
+    def _route(self) -> list[str]:
+        """Get the paths in the order they are tried, called with the lock held."""
+        paths = [CLOUD]
+        if self.local is not None and self.paths[LOCAL].reachable:
+            paths.append(LOCAL)
+        return sorted(paths, key=lambda path: self.paths[path].estimate)
+
+    def _call(self, method: str, call: Callable[[Any], Any]) -> Any:
+        """Call `call` with the sensor of the fastest path, falling back on errors.
+
+        Args:
+            method: Name of the call in the history.
+            call: Function receiving the `LocalSensor` or `CloudSensor`.
+
+        Returns:
+            Any: The result of `call`.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            paths = self._route()
+            sensors = {LOCAL: self.local, CLOUD: self.cloud}
+        for i, path in enumerate(paths):
+            call_started = time.perf_counter()
+            try:
+                result = call(sensors[path])
+            except FALLBACK_ERRORS as e:
+                with self._lock:
+                    stats = self.paths[path]
+                    stats.failures += 1
+                    if path == LOCAL:
+                        stats.reachable = False
+                logger.info(f"{method} of {self.uid} failed via {path}: {e!r}")
+                if i == len(paths) - 1:
+                    self.history.append(
+                        CallRecord(
+                            method=method,
+                            seconds=time.perf_counter() - started,
+                            fallback=i > 0,
+                            error=repr(e),
+                        )
+                    )
+                    raise
+                continue
+            with self._lock:
+                self.paths[path].record(time.perf_counter() - call_started)
+            self.history.append(
+                CallRecord(
+                    method=method,
+                    path=path,
+                    seconds=time.perf_counter() - started,
+                    fallback=i > 0,
+                )
+            )
+            return result
+
+    def get_event_records(self, query: DataProductQuery) -> EventRecordQueryResult:
+        """Get Event Records of the sensor, see `CloudSensor.get_event_records`."""
+        return self._call(
+            "get_event_records", lambda sensor: sensor.get_event_records(query)
+        )
+
+    def get_hv_spectra(self, query: DataProductQuery) -> HVSpectraQueryResult:
+        """Get HV Spectra of the sensor, see `CloudSensor.get_hv_spectra`."""
+        return self._call("get_hv_spectra", lambda sensor: sensor.get_hv_spectra(query))
+
+    def get_noise_autocorrelations(
+        self, query: DataProductQuery
+    ) -> NoiseAutocorrelationQueryResult:
+        """Get Noise Autocorrelations, see `CloudSensor.get_noise_autocorrelations`."""
+        return self._call(
+            "get_noise_autocorrelations",
+            lambda sensor: sensor.get_noise_autocorrelations(query),
+        )
+
+    def _get_measurement(
+        self, method: str, query: MeasurementQuery
+    ) -> MeasurementResult:
+        return self._call(method, lambda sensor: getattr(sensor, method)(query))
+
+    def get_peak_horizontal_acceleration(
+        self, query: MeasurementQuery
+    ) -> MeasurementResult:
+        """Get the PGA measurement of the sensor."""
+        return self._get_measurement("get_peak_horizontal_acceleration", query)
+
+    def get_jma_intensity(self, query: MeasurementQuery) -> MeasurementResult:
+        """Get the JMA Intensity measurement of the sensor."""
+        return self._get_measurement("get_jma_intensity", query)
+
+    def get_rms_amplitude(self, query: MeasurementQuery) -> MeasurementResult:
+        """Get the RMS Amplitude measurement of the sensor."""
+        return self._get_measurement("get_rms_amplitude", query)
+
+    def get_spectral_intensity(self, query: MeasurementQuery) -> MeasurementResult:
+        """Get the Spectral Intensity measurement of the sensor."""
+        return self._get_measurement("get_spectral_intensity", query)
+
+    def get_rms_offset(self, query: MeasurementQuery) -> MeasurementResult:
+        """Get the RMS Offset measurement of the sensor."""
+        return self._get_measurement("get_rms_offset", query)
+
+    def get_waveform_data(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        location_to_store: Path | str | None = None,
+    ) -> Path:
+        """Download MiniSEED waveforms of the sensor into a directory.
+
+        Args:
+            start_time: Start of the time window.
+            end_time: End of the time window.
+            location_to_store: Directory to write the file to. Defaults to the
+                working directory.
+
+        Returns:
+            Path: The written MiniSEED file.
+        """
+        directory = Path(location_to_store or ".")
+
+        def download(sensor: LocalSensor | CloudSensor) -> Path:
+            if isinstance(sensor, LocalSensor):
+                directory.mkdir(parents=True, exist_ok=True)
+                return sensor.get_waveform_data(directory, start_time, end_time)
+            return sensor.get_waveform_data(start_time, end_time, directory)
+
+        return self._call("get_waveform_data", download)
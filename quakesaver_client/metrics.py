@@ -0,0 +1,256 @@
+"""Latency and throughput metrics of live streams."""
+
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+import numpy as np
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class LatencyHistogram:
+    """Log-linear histogram of durations with bounded relative error.
+
+    Values are recorded in microseconds into buckets whose width doubles with
+    every power of two, like an HDR histogram. The relative error of reported
+    quantiles is below 2^-(significant_bits - 1) regardless of magnitude, i.e.
+    about 1.6 % with the default of 7 bits.
+    """
+
+    def __init__(self, significant_bits: int = 7, max_seconds: float = 3600.0) -> None:
+        """Initialize `LatencyHistogram`.
+
+        Args:
+            significant_bits: Resolution of the buckets. Defaults to 7.
+            max_seconds: Largest value which can be recorded, larger values are
+                clipped. Defaults to 3600.
+        """
+        self._bits = significant_bits
+        self._half = 1 << (significant_bits - 1)
+        self._max = int(max_seconds * 1e6)
+        self.counts = np.zeros(self._index(self._max) + 1, dtype=np.int64)
+        self.count = 0
+        self.negative = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def _index(self, value: int) -> int:
+        magnitude = max(0, value.bit_length() - self._bits)
+        return magnitude * self._half + (value >> magnitude)
+
+    def _value(self, index: int) -> int:
+        """Get the upper bound in microseconds of the bucket `index`."""
+        if index < 2 * self._half:
+            return index
+        magnitude = index // self._half - 1
+        return (((index - magnitude * self._half) + 1) << magnitude) - 1
+
+    def record(self, seconds: float) -> None:
+        """Record a duration.
+
+        Negative durations, e.g. caused by unsynchronized clocks, are counted
+        separately and recorded as zero.
+
+        Args:
+            seconds: The duration in seconds.
+        """
+        if seconds < 0.0:
+            self.negative += 1
+        value = min(self._max, max(0, int(seconds * 1e6)))
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Get the `q` quantile in seconds.
+
+        Args:
+            q: The quantile between 0 and 1.
+
+        Returns:
+            float: The upper bound of the bucket containing the quantile.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, int(np.ceil(q * self.count)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(self._value(index) * 1e-6, max(self.max, 0.0))
+
+    def snapshot(self) -> dict:
+        """Get count, mean, extremes and quantiles in seconds."""
+        snapshot = {
+            "count": self.count,
+            "negative": self.negative,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max if self.count else 0.0,
+        }
+        for q in QUANTILES:
+            snapshot[f"p{q * 100:g}"] = self.quantile(q)
+        return snapshot
+
+
+class SensorStreamMetrics:
+    """Latencies and throughput of the stream of a single sensor.
+
+    `latency` is the age of the last sample when its frame was received,
+    `total_latency` its age once the frame was decoded. `parse` and `decode` are
+    the durations of the processing stages. `corrupted` counts the frames which
+    could not be decoded and were skipped.
+    """
+
+    STAGES = ("latency", "parse", "decode", "total_latency")
+
+    def __init__(self) -> None:
+        """Initialize `SensorStreamMetrics`."""
+        self.histograms = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.messages = 0
+        self.bytes = 0
+        self.corrupted = 0
+        self.started = time.time()
+
+    def record(
+        self,
+        tmax: float,
+        nbytes: int,
+        received: float,
+        parsed: float,
+        decoded: float,
+    ) -> None:
+        """Record the timestamps of a single frame.
+
+        Args:
+            tmax: POSIX timestamp after the last sample of the frame.
+            nbytes: Size of the frame.
+            received: Time the frame was received.
+            parsed: Time the frame's JSON was parsed.
+            decoded: Time the frame's samples were decoded.
+        """
+        self.messages += 1
+        self.bytes += nbytes
+        self.histograms["latency"].record(received - tmax)
+        self.histograms["parse"].record(parsed - received)
+        self.histograms["decode"].record(decoded - parsed)
+        self.histograms["total_latency"].record(decoded - tmax)
+
+    def snapshot(self) -> dict:
+        """Get throughput counters and latency statistics."""
+        elapsed = max(time.time() - self.started, 1e-9)
+        return {
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "corrupted": self.corrupted,
+            "messages_per_second": self.messages / elapsed,
+            "bytes_per_second": self.bytes / elapsed,
+            **{stage: hist.snapshot() for stage, hist in self.histograms.items()},
+        }
+
+
+class CompressionStats:
+    """Size and receive cost of websocket frames, with or without compression.
+
+    `raw_bytes` is the size of the frames as handed to the application,
+    `wire_bytes` the number of bytes read from the socket including websocket
+    framing. `cpu_seconds` is the CPU time spent parsing and, if negotiated,
+    inflating frames.
+    """
+
+    def __init__(self) -> None:
+        """Initialize `CompressionStats`."""
+        self.compress = 0
+        self.frames = 0
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        self.cpu_seconds = 0.0
+
+    @property
+    def ratio(self) -> float:
+        """Wire bytes per raw byte."""
+        return self.wire_bytes / self.raw_bytes if self.raw_bytes else 1.0
+
+    def snapshot(self) -> dict:
+        """Get the counters and the compression ratio."""
+        return {
+            "compress": self.compress,
+            "frames": self.frames,
+            "raw_bytes": self.raw_bytes,
+            "wire_bytes": self.wire_bytes,
+            "cpu_seconds": self.cpu_seconds,
+            "ratio": self.ratio,
+        }
+
+
+class StreamMetrics:
+    """Per-sensor stream metrics, e.g. shared by the handlers of a fleet.
+
+    Pass an instance as `metrics` to `WebsocketHandler` to enable the
+    instrumentation.
+    """
+
+    def __init__(self) -> None:
+        """Initialize `StreamMetrics`."""
+        self.sensors: dict[str, SensorStreamMetrics] = {}
+
+    def record(
+        self,
+        uid: Optional[str],
+        tmax: float,
+        nbytes: int,
+        received: float,
+        parsed: float,
+        decoded: float,
+    ) -> None:
+        """Record the timestamps of a single frame of sensor `uid`.
+
+        See `SensorStreamMetrics.record` for the arguments.
+        """
+        self._sensor(uid).record(tmax, nbytes, received, parsed, decoded)
+
+    def record_corrupted(self, uid: Optional[str]) -> None:
+        """Count a frame of sensor `uid` which could not be decoded."""
+        self._sensor(uid).corrupted += 1
+
+    def _sensor(self, uid: Optional[str]) -> SensorStreamMetrics:
+        uid = uid or "unknown"
+        sensor = self.sensors.get(uid)
+        if sensor is None:
+            sensor = self.sensors[uid] = SensorStreamMetrics()
+        return sensor
+
+    def snapshot(self) -> dict[str, dict]:
+        """Get the metrics of all sensors by UID."""
+        return {uid: sensor.snapshot() for uid, sensor in self.sensors.items()}
+
+    def prometheus(self, prefix: str = "qs_client_stream") -> str:
+        """Render all metrics in the Prometheus text exposition format.
+
+        Args:
+            prefix: Prefix of the metric names. Defaults to "qs_client_stream".
+
+        Returns:
+            str: The metrics payload.
+        """
+        lines = []
+        for stage in SensorStreamMetrics.STAGES:
+            name = f"{prefix}_{stage}_seconds"
+            lines.append(f"# TYPE {name} summary")
+            for uid, sensor in self.sensors.items():
+                hist = sensor.histograms[stage]
+                for q in QUANTILES:
+                    lines.append(
+                        f'{name}{{uid="{uid}",quantile="{q:g}"}} {hist.quantile(q):.6f}'
+                    )
+                lines.append(f'{name}_sum{{uid="{uid}"}} {hist.total:.6f}')
+                lines.append(f'{name}_count{{uid="{uid}"}} {hist.count}')
+
+        for counter in ("messages", "bytes", "corrupted"):
+            name = f"{prefix}_{counter}_total"
+            lines.append(f"# TYPE {name} counter")
+            for uid, sensor in self.sensors.items():
+                lines.append(f'{name}{{uid="{uid}"}} {getattr(sensor, counter)}')
+        return "\n".join(lines) + "\n"
@@ -16,19 +16,19 @@ from quakesaver_client.models.data_product_query import (
     HVSpectraQueryResult,
     NoiseAutocorrelationQueryResult,
 )
+from quakesaver_client.models.lazy_state import LazySensorState
 from quakesaver_client.models.measurement import (
     MeasurementQuery,
     MeasurementQueryFull,
     MeasurementResult,
 )
 from quakesaver_client.models.permission import Permission
-from quakesaver_client.models.sensor_state import SensorState
 from quakesaver_client.models.warnings import SensorWarnings
 from quakesaver_client.types import StationDetailLevel
 from quakesaver_client.util import assure_output_path, handle_response
 
 
-class CloudSensor(SensorState):
+class CloudSensor(LazySensorState):
     """A base schema for other schemas to derive from."""
 
     _headers: dict
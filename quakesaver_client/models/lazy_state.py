@@ -0,0 +1,84 @@
+"""Sensor state which validates its module states on first access."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from pydantic import BaseModel, PrivateAttr, ValidationError
+
+from quakesaver_client.models.sensor_state import SensorState
+
+MODULE_FIELDS = frozenset(
+    name
+    for name, field in SensorState.__fields__.items()
+    if isinstance(field.type_, type) and issubclass(field.type_, BaseModel)
+)
+
+
+class LazySensorState(SensorState):
+    """A `SensorState` which keeps its module states raw until they are used.
+
+    Only the top level fields like `uid` are validated on construction. The
+    sub-documents of the modules, e.g. `SystemInformation`, are kept as received
+    and validated when the attribute is first accessed, then cached. Invalid
+    module states therefore raise `ValidationError` on access instead of on
+    construction, or on `validate_modules`. Serialization validates all modules
+    first.
+    """
+
+    _raw_modules: dict = PrivateAttr(default_factory=dict)
+
+    def __init__(self, **data: Any) -> None:
+        """Create an instance of the class."""
+        raw_modules = {
+            name: data.pop(name)
+            for name in MODULE_FIELDS & data.keys()
+            if isinstance(data[name], dict)
+        }
+        super().__init__(**data)
+        for name in raw_modules:
+            del self.__dict__[name]
+        self.__fields_set__.update(raw_modules)
+        self._raw_modules = raw_modules
+
+    def __getattr__(self, name: str) -> Any:
+        """Validate a module state on first access."""
+        try:
+            raw_modules = object.__getattribute__(self, "_raw_modules")
+        except AttributeError:
+            raw_modules = {}
+        if name not in raw_modules:
+            raise AttributeError(
+                f"{type(self).__name__!r} object has no attribute {name!r}"
+            )
+        return self._validate_module(name)
+
+    def _validate_module(self, name: str) -> Any:
+        field = self.__fields__[name]
+        value, errors = field.validate(
+            self._raw_modules[name], self.__dict__, loc=name, cls=self.__class__
+        )
+        if errors:
+            raise ValidationError([errors], self.__class__)
+        del self._raw_modules[name]
+        self.__dict__.setdefault(name, value)
+        return self.__dict__[name]
+
+    @property
+    def pending_modules(self) -> frozenset[str]:
+        """Names of the module states which were not validated yet."""
+        return frozenset(self._raw_modules)
+
+    def validate_modules(self) -> None:
+        """Validate all module states which were not accessed yet."""
+        for name in tuple(self._raw_modules):
+            self._validate_module(name)
+
+    def _iter(self, *args: Any, **kwargs: Any) -> Any:
+        self.validate_modules()
+        return super()._iter(*args, **kwargs)
+
+    def __repr_args__(self) -> Any:
+        """Validate all modules before they are shown."""
+        self.validate_modules()
+        return super().__repr_args__()
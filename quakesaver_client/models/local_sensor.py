@@ -6,13 +6,14 @@ import logging
 from datetime import datetime, timezone
 from io import BytesIO
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
 from uuid import uuid4
 
 import requests
-from obspy import Stream, read
-from pydantic import Extra
+from pydantic import Extra, ValidationError
+from requests.adapters import HTTPAdapter
 
-from quakesaver_client.client_websocket import WebsocketHandler
+from quakesaver_client.errors import CorruptedDataError
 from quakesaver_client.fdsnws import FDSNWSDataselectQuery
 from quakesaver_client.fdsnws import dataselect as fdsnws_dataselect
 from quakesaver_client.models.data_product_query import (
@@ -21,39 +22,115 @@ from quakesaver_client.models.data_product_query import (
     HVSpectraQueryResult,
     NoiseAutocorrelationQueryResult,
 )
+from quakesaver_client.models.lazy_state import LazySensorState
 from quakesaver_client.models.measurement import (
     MeasurementQuery,
     MeasurementQueryFull,
     MeasurementResult,
 )
-from quakesaver_client.models.sensor_state import SensorState
+from quakesaver_client.models.trusted import construct_trusted
 from quakesaver_client.types import StationDetailLevel
+from quakesaver_client.util import handle_response
 
+if TYPE_CHECKING:
+    # Streaming pulls in aiohttp, NumPy and ObsPy. They are imported when the
+    # waveform methods are used, so `import quakesaver_client` stays light.
+    from obspy import Stream
 
-class LocalSensor(SensorState):
+    from quakesaver_client.broadcast import WaveformBroadcast
+    from quakesaver_client.client_websocket import WebsocketHandler
+    from quakesaver_client.seedlink import SeedLinkClient
+
+
+POOL_SIZE = 8
+REQUEST_TIMEOUT = 10.0
+
+
+def _pooled_session() -> requests.Session:
+    """Create a session keeping up to `POOL_SIZE` connections to the sensor."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount("http://", adapter)
+    return session
+
+
+class LocalSensor(LazySensorState):
     """A base schema for other schemas to derive from."""
 
+    _url: Optional[str] = None
+    _session: Optional[requests.Session] = None
+    _timeout: Optional[float] = REQUEST_TIMEOUT
+
     def __init__(self, **data: dict) -> None:
         """Create an instance of the class."""
         super().__init__(**data)
         self._url = None
 
     @classmethod
-    def connect(cls, sensor_url: str) -> LocalSensor:
-        """Get a sensor which is available at `sensor_url`."""
-        url = f"http://{sensor_url}/state"
-        response = requests.get(url)
-        sensor = LocalSensor.parse_raw(response.text)
+    def connect(
+        cls,
+        sensor_url: str,
+        trusted: bool = False,
+        timeout: Optional[float] = REQUEST_TIMEOUT,
+    ) -> LocalSensor:
+        """Get a sensor which is available at `sensor_url`.
+
+        The connection is kept open and reused by all queries of the sensor.
+
+        Args:
+            sensor_url: hostname and port of the sensor.
+            trusted: Skip the validation of the sensor's state, see
+                `construct_trusted`. Defaults to False.
+            timeout: Seconds to wait for the sensor in this and every later
+                request, or None to wait forever. Defaults to 10.
+        """
+        session = _pooled_session()
+        try:
+            state = handle_response(
+                session.get(f"http://{sensor_url}/state", timeout=timeout)
+            )
+            if not isinstance(state, dict):
+                raise CorruptedDataError(f"Invalid state of sensor at {sensor_url}")
+            if trusted:
+                sensor = construct_trusted(LocalSensor, state)
+            else:
+                sensor = LocalSensor.parse_obj(state)
+        except BaseException:
+            session.close()
+            raise
         sensor._url = sensor_url
+        sensor._session = session
+        sensor._timeout = timeout
         return sensor
 
+    @property
+    def session(self) -> requests.Session:
+        """The session holding the pooled connections to the sensor."""
+        if self._session is None:
+            self._session = _pooled_session()
+        return self._session
+
+    def close(self) -> None:
+        """Close the pooled connections to the sensor."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
     def _get_data_product(
         self,
         data_product_name: str,
         query: DataProductQuery,
     ) -> dict:
         """Request data products of the sensor."""
-        ...
+        logging.debug(
+            "requesting data product %s for sensor %s.", data_product_name, self.uid
+        )
+        response = self.session.post(
+            url=f"http://{self._url}/data_products/{data_product_name}",
+            params=query.dict(exclude_none=True),
+            timeout=self._timeout,
+        )
+        return handle_response(response)
 
     def get_event_records(self, query: DataProductQuery) -> EventRecordQueryResult:
         """Get Event Records of the sensor.
@@ -64,7 +141,13 @@ class LocalSensor(SensorState):
         Returns:
             EventRecordQueryResult: The queried data products.
         """
-        ...
+        result = self._get_data_product("EventRecord", query)
+
+        try:
+            result = EventRecordQueryResult.parse_obj(result)
+        except ValidationError as e:
+            raise CorruptedDataError() from e
+        return result
 
     def get_hv_spectra(self, query: DataProductQuery) -> HVSpectraQueryResult:
         """Get HV Spectres of the sensor.
@@ -75,7 +158,13 @@ class LocalSensor(SensorState):
         Returns:
             HVSpectraQueryResult: The queried data products.
         """
-        ...
+        result = self._get_data_product("HVSpectra", query)
+
+        try:
+            result = HVSpectraQueryResult.parse_obj(result)
+        except ValidationError as e:
+            raise CorruptedDataError() from e
+        return result
 
     def get_noise_autocorrelations(
         self, query: DataProductQuery
@@ -88,11 +177,29 @@ class LocalSensor(SensorState):
         Returns:
             NoiseAutocorrelationQueryResult: The queried data products.
         """
-        ...
+        result = self._get_data_product("NoiseAutocorrelation", query)
+
+        try:
+            result = NoiseAutocorrelationQueryResult.parse_obj(result)
+        except ValidationError as e:
+            raise CorruptedDataError() from e
+        return result
 
     def _get_measurement(self, query: MeasurementQueryFull) -> MeasurementResult:
         """Request measurements of the sensor."""
-        ...
+        logging.debug("requesting measurement for sensor %s.", self.uid)
+        response = self.session.post(
+            url=f"http://{self._url}/measurements",
+            data=query.json(),
+            headers={"Content-Type": "application/json"},
+            timeout=self._timeout,
+        )
+        response_data = handle_response(response)
+        try:
+            result = MeasurementResult(**response_data)
+        except ValidationError as e:
+            raise CorruptedDataError() from e
+        return result
 
     def get_peak_horizontal_acceleration(
         self, query: MeasurementQuery
@@ -105,7 +212,10 @@ class LocalSensor(SensorState):
         Returns:
             MeasurementQuery: The queried data (if exists) as time series.
         """
-        ...
+        full_query = MeasurementQueryFull(
+            **query.dict(), field="pga", measurement="rt_peak_ground_motion"
+        )
+        return self._get_measurement(query=full_query)
 
     def get_jma_intensity(self, query: MeasurementQuery) -> MeasurementResult:
         """Get the JMA Intensity measurement of the sensor.
@@ -116,7 +226,10 @@ class LocalSensor(SensorState):
         Returns:
             MeasurementQuery: The queried data (if exists) as time series.
         """
-        ...
+        full_query = MeasurementQueryFull(
+            **query.dict(), field="intensity", measurement="rt_jma_intensity"
+        )
+        return self._get_measurement(query=full_query)
 
     def get_rms_amplitude(self, query: MeasurementQuery) -> MeasurementResult:
         """Get the RMS Amplitude measurement of the sensor.
@@ -127,7 +240,10 @@ class LocalSensor(SensorState):
         Returns:
             MeasurementQuery: The queried data (if exists) as time series.
         """
-        ...
+        full_query = MeasurementQueryFull(
+            **query.dict(), field="rms_amplitude", measurement="rms_amplitude"
+        )
+        return self._get_measurement(query=full_query)
 
     def get_spectral_intensity(self, query: MeasurementQuery) -> MeasurementResult:
         """Get the Spectral Intensity measurement of the sensor.
@@ -138,7 +254,12 @@ class LocalSensor(SensorState):
         Returns:
             MeasurementQuery: The queried data (if exists) as time series.
         """
-        ...
+        full_query = MeasurementQueryFull(
+            **query.dict(),
+            field="spectral_intensity",
+            measurement="rt_spectral_intensity",
+        )
+        return self._get_measurement(query=full_query)
 
     def get_rms_offset(self, query: MeasurementQuery) -> MeasurementResult:
         """Get the RMS Offset measurement of the sensor.
@@ -149,12 +270,42 @@ class LocalSensor(SensorState):
         Returns:
             MeasurementQuery: The queried data (if exists) as time series.
         """
-        ...
+        full_query = MeasurementQueryFull(
+            **query.dict(), field="rms_offset", measurement="chrony"
+        )
+        return self._get_measurement(query=full_query)
 
     def get_waveform_stream(self) -> WebsocketHandler:
         """Get a `WebsocketHandler` to serve waveform data."""
+        from quakesaver_client.client_websocket import WebsocketHandler
+
         return WebsocketHandler(self._url)
 
+    def get_waveform_broadcast(self) -> WaveformBroadcast:
+        """Get the `WaveformBroadcast` sharing one websocket of this sensor."""
+        from quakesaver_client.broadcast import get_broadcast
+
+        return get_broadcast(self._url)
+
+    def get_seedlink_stream(self, **kwargs: Any) -> SeedLinkClient:
+        """Get a `SeedLinkClient` streaming from the sensor's SeedLink server.
+
+        The server must be enabled in the sensor's configuration.
+
+        Args:
+            **kwargs: Arguments of `SeedLinkClient`, e.g. `state_file`.
+        """
+        from quakesaver_client.seedlink import SEEDLINK_PORT, SeedLinkClient
+
+        port = SEEDLINK_PORT
+        server = self.SeedLinkServerState
+        if server is not None and server.config is not None:
+            if not server.config.enabled:
+                logging.warning("SeedLink server of sensor %s is disabled.", self.uid)
+            port = server.config.port or port
+        kwargs.setdefault("stations", [f"QS_{self.uid}"])
+        return SeedLinkClient(self._url.partition(":")[0], port, **kwargs)
+
     def get_waveform_data(
         self,
         file: Path,
@@ -191,6 +342,7 @@ class LocalSensor(SensorState):
                 uri=f"http://{self._url}",
                 params=params,
                 buffer=buffer,
+                timeout=self._timeout,
             )
 
         if file.is_dir():
@@ -213,6 +365,8 @@ class LocalSensor(SensorState):
         Returns:
             Stream: The retrieved waveform data as obspy.stream.
         """
+        from obspy import read
+
         logging.debug("requesting waveform data for sensor %s.", self.uid)
         if start_time and end_time and start_time > end_time:
             raise ValueError("start_time is before end_time")
@@ -225,6 +379,7 @@ class LocalSensor(SensorState):
             uri=f"http://{self._url}",
             params=params,
             buffer=buffer,
+            timeout=self._timeout,
         )
         buffer.flush()
         buffer.seek(0)
@@ -0,0 +1,117 @@
+"""Construct models from trusted data without validation."""
+
+from __future__ import annotations
+
+import os
+from datetime import date, time, timedelta
+from enum import Enum
+from typing import Any, TypeVar
+
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_DICT, SHAPE_LIST, SHAPE_SINGLETON
+
+Model = TypeVar("Model", bound=BaseModel)
+
+VALIDATE = os.environ.get("QS_CLIENT_VALIDATE", "") not in ("", "0")
+"""Validate trusted data anyway, e.g. while debugging. Set QS_CLIENT_VALIDATE=1
+in the environment or assign this attribute."""
+
+IMMUTABLE = (type(None), bool, int, float, str, bytes, Enum, date, time, timedelta)
+
+Plan = tuple[dict[str, Any], dict[str, Any], dict[str, tuple[type, int]]]
+_plans: dict[type[BaseModel], Plan] = {}
+
+
+def _get_plan(model: type[BaseModel]) -> Plan:
+    """Get the defaults and the sub-model fields of a model, computed once.
+
+    Immutable defaults are shared by all instances, mutable ones, e.g. models,
+    lists and dicts, are copied for every instance which lacks the field.
+    """
+    plan = _plans.get(model)
+    if plan is None:
+        defaults = {}
+        mutable_defaults = {}
+        submodels = {}
+        for name, field in model.__fields__.items():
+            if not field.required:
+                default = field.get_default()
+                if isinstance(default, IMMUTABLE):
+                    defaults[name] = default
+                else:
+                    mutable_defaults[name] = default
+            submodel = field.type_
+            if (
+                isinstance(submodel, type)
+                and issubclass(submodel, BaseModel)
+                and field.shape in (SHAPE_SINGLETON, SHAPE_LIST, SHAPE_DICT)
+            ):
+                submodels[name] = (submodel, field.shape)
+        plan = _plans[model] = (defaults, mutable_defaults, submodels)
+    return plan
+
+
+def _copy_default(value: Any) -> Any:
+    """Copy the models, lists and dicts in a default, sharing immutable values."""
+    if isinstance(value, BaseModel):
+        return value.copy(
+            update={
+                name: _copy_default(field)
+                for name, field in value.__dict__.items()
+                if not isinstance(field, IMMUTABLE)
+            }
+        )
+    if isinstance(value, list):
+        return [_copy_default(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _copy_default(item) for key, item in value.items()}
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+def _construct_value(model: type[BaseModel], shape: int, value: Any) -> Any:
+    """Construct the sub-models within the value of a field."""
+    if shape == SHAPE_SINGLETON:
+        return _construct(model, value) if isinstance(value, dict) else value
+    if shape == SHAPE_LIST and isinstance(value, list):
+        return [_construct(model, v) if isinstance(v, dict) else v for v in value]
+    if shape == SHAPE_DICT and isinstance(value, dict):
+        return {
+            k: _construct(model, v) if isinstance(v, dict) else v
+            for k, v in value.items()
+        }
+    return value
+
+
+def _construct(model: type[Model], data: dict) -> Model:
+    defaults, mutable_defaults, submodels = _get_plan(model)
+    values = dict(defaults)
+    for name, default in mutable_defaults.items():
+        if name not in data:
+            values[name] = _copy_default(default)
+    for name, value in data.items():
+        submodel = submodels.get(name)
+        values[name] = value if submodel is None else _construct_value(*submodel, value)
+    return model.construct(_fields_set=set(data), **values)
+
+
+def construct_trusted(model: type[Model], data: dict) -> Model:
+    """Create a model and its sub-models from trusted data without validation.
+
+    Meant for data of our own sensors, which was produced from the same models.
+    Values are taken as they are, e.g. times stay ISO strings and enums plain
+    values. The defaults of missing fields are computed once per model, mutable
+    defaults are copied for every instance. With `VALIDATE` set the data is
+    validated as usual.
+
+    Args:
+        model: The model to create.
+        data: The raw data, e.g. parsed JSON.
+
+    Returns:
+        Model: The model instance.
+    """
+    if VALIDATE:
+        return model.parse_obj(data)
+    return _construct(model, data)
@@ -0,0 +1,335 @@
+"""Health of a sensor fleet from concurrent state polls, rendered as a table."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import shutil
+from typing import AsyncIterator, Iterable, Optional, TextIO
+
+import aiohttp
+from pydantic import BaseModel
+
+from quakesaver_client.models.sensor_state import SensorState
+from quakesaver_client.poller import StatePoller
+
+logger = logging.getLogger(__name__)
+
+SAMPLERS = ("AD7779State", "ADXL355State", "BMA456State")
+
+DISK_ALERT_PERCENT = 90.0
+MEMORY_ALERT_PERCENT = 90.0
+RINGBUFFER_ALERT_PERCENT = 95.0
+TIME_OFFSET_ALERT_SECONDS = 0.01
+
+
+class SensorHealth(BaseModel):
+    """Health summary of a single sensor derived from its last states."""
+
+    host: str
+    uid: Optional[str]
+    online: bool = False
+    error: Optional[str]
+    cpu_percent: Optional[float]
+    memory_percent: Optional[float]
+    disk_percent: Optional[float]
+    ringbuffer_percent: Optional[float]
+    sampler: Optional[str]
+    sampling_rate: Optional[float]
+    crc_error_rate: Optional[float]
+    time_monitor: Optional[bool]
+    time_offset: Optional[float]
+    warnings: int = 0
+
+    @property
+    def alerts(self) -> list[str]:
+        """Names of the values which indicate saturation or faults."""
+        alerts = []
+        if not self.online:
+            alerts.append("offline")
+        if (self.disk_percent or 0.0) >= DISK_ALERT_PERCENT:
+            alerts.append("disk")
+        if (self.memory_percent or 0.0) >= MEMORY_ALERT_PERCENT:
+            alerts.append("memory")
+        if (self.ringbuffer_percent or 0.0) >= RINGBUFFER_ALERT_PERCENT:
+            alerts.append("ringbuffer")
+        if abs(self.time_offset or 0.0) >= TIME_OFFSET_ALERT_SECONDS:
+            alerts.append("time")
+        if self.crc_error_rate:
+            alerts.append("crc")
+        if self.sampling_rate == 0.0:
+            alerts.append("sampler")
+        if self.warnings:
+            alerts.append("warnings")
+        return alerts
+
+
+class _Counters:
+    """Sampler counters of the previous poll of a sensor."""
+
+    __slots__ = ("time", "nsamples", "crc_errors")
+
+    def __init__(self, time: float, nsamples: int, crc_errors: int) -> None:
+        self.time = time
+        self.nsamples = nsamples
+        self.crc_errors = crc_errors
+
+
+def _sampler(state: SensorState) -> tuple[Optional[str], Optional[BaseModel]]:
+    """Get the name and statistics of the active, else the first, sampler."""
+    fallback = (None, None)
+    for name in SAMPLERS:
+        module = getattr(state, name)
+        stats = module.stats if module is not None else None
+        if stats is None:
+            continue
+        if stats.active:
+            return name, stats
+        if fallback[0] is None:
+            fallback = (name, stats)
+    return fallback
+
+
+class FleetMonitor:
+    """Poll many sensors on an interval and summarize their health.
+
+    All sensors are polled concurrently through a `StatePoller` sharing one
+    session. Only the fields of the state which changed are validated again.
+    Sampling and CRC error rates are derived from the sampler counters of two
+    consecutive polls.
+    """
+
+    def __init__(
+        self,
+        hosts: Iterable[str],
+        interval: float = 5.0,
+        concurrency: int = 64,
+        timeout: float = 5.0,
+        session: aiohttp.ClientSession | None = None,
+    ) -> None:
+        """Initialize `FleetMonitor`.
+
+        Args:
+            hosts: Sensor hostnames with port, e.g. "192.168.1.10:5533".
+            interval: Seconds between two polls of the fleet. Defaults to 5.
+            concurrency: Requests in flight at the same time. Defaults to 64.
+            timeout: Seconds to wait for a sensor's state. Defaults to 5.
+            session: Session to send requests with. Defaults to a session owned
+                by the monitor.
+        """
+        self.poller = StatePoller(
+            hosts, interval=interval, concurrency=concurrency, timeout=timeout
+        )
+        self.interval = interval
+        self.session = session
+        self.health: dict[str, SensorHealth] = {
+            host: SensorHealth(host=host) for host in self.poller.hosts
+        }
+        self._counters: dict[str, _Counters] = {}
+
+    def _summarize(self, host: str, time: float) -> SensorHealth:
+        """Derive the health of a sensor from its last polled state."""
+        state = self.poller.state(host)
+        health = SensorHealth(host=host, uid=state.uid, online=True)
+
+        system = state.SystemInformation
+        if system is not None:
+            if system.cpu_stats is not None:
+                health.cpu_percent = system.cpu_stats.cpu_usage_percent
+            if system.memory_stats is not None:
+                health.memory_percent = system.memory_stats.percent
+            if system.disk_stats is not None:
+                health.disk_percent = system.disk_stats.percent
+            if system.chrony_stats is not None:
+                health.time_offset = system.chrony_stats.last_offset
+        if state.RingbufferState is not None and state.RingbufferState.stats:
+            health.ringbuffer_percent = state.RingbufferState.stats.percent_used
+        if state.TimeMonitorState is not None and state.TimeMonitorState.config:
+            health.time_monitor = state.TimeMonitorState.config.enabled
+
+        warnings = self.poller.raw_state(host).get("warnings") or {}
+        health.warnings = len(warnings.get("data") or {})
+
+        health.sampler, stats = _sampler(state)
+        if stats is not None:
+            counters = _Counters(time, stats.nsamples or 0, stats.crc_errors or 0)
+            previous = self._counters.get(host)
+            if previous is not None and counters.time > previous.time:
+                elapsed = counters.time - previous.time
+                health.sampling_rate = (
+                    max(counters.nsamples - previous.nsamples, 0) / elapsed
+                )
+                health.crc_error_rate = (
+                    max(counters.crc_errors - previous.crc_errors, 0) / elapsed
+                )
+            self._counters[host] = counters
+        return health
+
+    async def refresh(self, session: aiohttp.ClientSession) -> list[SensorHealth]:
+        """Poll all sensors once and update their health.
+
+        Args:
+            session: Session to send the requests with.
+
+        Returns:
+            list[SensorHealth]: The sensors whose health changed.
+        """
+        loop = asyncio.get_running_loop()
+        hosts = self.poller.hosts
+        results = await asyncio.gather(
+            *(self.poller.poll(session, host) for host in hosts),
+            return_exceptions=True,
+        )
+        changed = []
+        for host, result in zip(hosts, results):
+            previous = self.health[host]
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                health = previous.copy(
+                    update={"online": False, "error": str(result) or repr(result)}
+                )
+                self._counters.pop(host, None)
+            else:
+                health = self._summarize(host, loop.time())
+            if health != previous:
+                self.health[host] = health
+                changed.append(health)
+        return changed
+
+    async def run(self) -> AsyncIterator[list[SensorHealth]]:
+        """Refresh the fleet every `interval` seconds until cancelled.
+
+        Yields:
+            list[SensorHealth]: The sensors whose health changed.
+        """
+        loop = asyncio.get_running_loop()
+        session = self.session or aiohttp.ClientSession()
+        try:
+            while True:
+                started = loop.time()
+                yield await self.refresh(session)
+                await asyncio.sleep(max(0.0, started + self.interval - loop.time()))
+        finally:
+            if self.session is None:
+                await session.close()
+
+
+def _format(value: Optional[float], spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+class HealthTable:
+    """Render `SensorHealth` rows as a terminal table redrawn incrementally.
+
+    Rows keep the order of the hosts. After the first draw only rows whose
+    text changed are rewritten, using ANSI cursor movements, so refreshing a
+    fleet of hundreds of sensors writes a few lines per interval.
+
+    The table is limited to the height of the terminal. If there are more
+    hosts than fit, sensors with alerts are shown first and the last line
+    counts the hidden sensors.
+    """
+
+    COLUMNS = (
+        ("HOST", 21),
+        ("UID", 10),
+        ("CPU%", 5),
+        ("MEM%", 5),
+        ("DISK%", 6),
+        ("RB%", 5),
+        ("SAMPLER", 12),
+        ("RATE", 8),
+        ("CRC/S", 6),
+        ("OFFSET", 8),
+        ("TMON", 4),
+        ("WARN", 4),
+        ("ALERTS", 0),
+    )
+
+    def __init__(
+        self, hosts: Iterable[str], stream: TextIO, height: Optional[int] = None
+    ) -> None:
+        """Initialize `HealthTable`.
+
+        Args:
+            hosts: The hosts in the order of the rows.
+            stream: The terminal to write to.
+            height: Number of rows below the header. Defaults to the height of
+                the terminal minus the header and the cursor line.
+        """
+        self.rows = {host: i for i, host in enumerate(hosts)}
+        self.stream = stream
+        self.height = height
+        self._lines: dict[str, str] = {}
+        self._alerting: set[str] = set()
+        self._screen: list[str] = []
+        self._screen_height: Optional[int] = None
+
+    def format_row(self, health: SensorHealth) -> str:
+        """Format the health of a sensor as a line of the table."""
+        values = (
+            health.host,
+            health.uid or "-",
+            _format(health.cpu_percent, ".0f"),
+            _format(health.memory_percent, ".0f"),
+            _format(health.disk_percent, ".0f"),
+            _format(health.ringbuffer_percent, ".0f"),
+            (health.sampler or "-").replace("State", ""),
+            _format(health.sampling_rate, ".1f"),
+            _format(health.crc_error_rate, ".2f"),
+            _format(health.time_offset, ".1e"),
+            {None: "-", True: "on", False: "off"}[health.time_monitor],
+            str(health.warnings),
+            ",".join(health.alerts),
+        )
+        return self._join(values)
+
+    def _join(self, values: Iterable[str]) -> str:
+        return " ".join(
+            value.ljust(width) for value, (_, width) in zip(values, self.COLUMNS)
+        ).rstrip()
+
+    def draw(self, changed: Iterable[SensorHealth]) -> None:
+        """Redraw the rows of the changed sensors.
+
+        Args:
+            changed: Sensors whose health changed, e.g. as yielded by
+                `FleetMonitor.run`.
+        """
+        for health in changed:
+            self._lines[health.host] = self.format_row(health)
+            if health.alerts:
+                self._alerting.add(health.host)
+            else:
+                self._alerting.discard(health.host)
+
+        height = self.height or max(shutil.get_terminal_size().lines - 2, 1)
+        out = []
+        if height != self._screen_height:
+            # First draw or the terminal was resized.
+            out.append("\x1b[2J\x1b[H")
+            out.append(self._join(name for name, _ in self.COLUMNS))
+            self._screen = []
+            self._screen_height = height
+        screen = self._layout(height)
+        for i, line in enumerate(screen):
+            if i < len(self._screen) and self._screen[i] == line:
+                continue
+            # Row 1 is the header, rows are 1-based.
+            out.append(f"\x1b[{i + 2};1H{line}\x1b[K")
+        self._screen = screen
+        out.append(f"\x1b[{len(screen) + 2};1H")
+        self.stream.write("".join(out))
+        self.stream.flush()
+
+    def _layout(self, height: int) -> list[str]:
+        """Get the lines of the rows fitting into `height` lines."""
+        hosts = list(self.rows)
+        hidden = []
+        if len(hosts) > height:
+            hosts.sort(key=lambda host: host not in self._alerting)
+            shown = height - 1
+            hidden = [f"... {len(hosts) - shown} more sensors"]
+            hosts = hosts[:shown]
+        return [self._lines.get(host, host) for host in hosts] + hidden
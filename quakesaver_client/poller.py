@@ -0,0 +1,215 @@
+"""Poll the state of many sensors and publish what changed."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Iterable, Optional
+
+import aiohttp
+from pydantic import BaseModel
+
+from quakesaver_client.errors import CorruptedDataError
+from quakesaver_client.models.sensor_state import SensorState
+
+logger = logging.getLogger(__name__)
+
+
+class StateChange(BaseModel):
+    """A single value of a sensor's state which changed between two polls."""
+
+    path: str
+    old: Any
+    new: Any
+
+
+class StateUpdate(BaseModel):
+    """The changes of a sensor's state found by a poll."""
+
+    host: str
+    uid: Optional[str]
+    time: datetime
+    changes: list[StateChange]
+
+
+def diff_states(old: Any, new: Any, path: str = "") -> list[StateChange]:
+    """Compare two raw states and get the paths of all changed values.
+
+    Objects are compared key by key, everything else, including lists, as a
+    whole. Keys which are missing on one side are reported with None.
+
+    Args:
+        old: The previous raw state.
+        new: The current raw state.
+        path: Path of `old` and `new` within the state. Defaults to the root.
+
+    Returns:
+        list[StateChange]: Changes with dotted paths, e.g.
+            "RingbufferState.stats.percent_used".
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return [] if old == new else [StateChange(path=path, old=old, new=new)]
+
+    changes = []
+    prefix = f"{path}." if path else ""
+    for key, value in new.items():
+        previous = old.get(key)
+        if previous != value:
+            changes.extend(diff_states(previous, value, f"{prefix}{key}"))
+    for key in old.keys() - new.keys():
+        if old[key] is not None:
+            changes.append(StateChange(path=f"{prefix}{key}", old=old[key], new=None))
+    return changes
+
+
+class _PolledSensor:
+    """The last raw state of a sensor and the fields validated from it.
+
+    `validated` holds the raw value of every field in `fields`, so a field is
+    validated again whenever its raw value differs from the last valid one.
+    """
+
+    __slots__ = ("raw", "fields", "validated")
+
+    def __init__(self) -> None:
+        self.raw: dict = {}
+        self.fields: dict[str, Any] = {}
+        self.validated: dict[str, Any] = {}
+
+
+class StatePoller:
+    """Poll `/state` of many sensors concurrently and publish changed paths.
+
+    Every sensor is polled every `interval` seconds, randomly offset by up to
+    `jitter` of the interval, so a fleet does not answer in lockstep. The raw
+    state of every sensor is kept. Only the top level fields of `SensorState`
+    which changed since the last poll are validated again, `state` assembles the
+    model from the cached fields.
+    """
+
+    def __init__(
+        self,
+        hosts: Iterable[str],
+        interval: float = 10.0,
+        jitter: float = 0.1,
+        concurrency: int = 32,
+        timeout: float = 5.0,
+        session: aiohttp.ClientSession | None = None,
+    ) -> None:
+        """Initialize `StatePoller`.
+
+        Args:
+            hosts: Sensor hostnames with port, e.g. "192.168.1.10:5533".
+            interval: Seconds between two polls of a sensor. Defaults to 10.
+            jitter: Random variation of the interval as a fraction of it.
+                Defaults to 0.1.
+            concurrency: Requests in flight at the same time. Defaults to 32.
+            timeout: Seconds to wait for a sensor's state. Defaults to 5.
+            session: Session to send requests with. Defaults to a session owned
+                by the poller.
+        """
+        self.hosts = list(hosts)
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.session = session
+
+        self.concurrency = concurrency
+        self._semaphore: asyncio.Semaphore | None = None
+        self._sensors: dict[str, _PolledSensor] = {
+            host: _PolledSensor() for host in self.hosts
+        }
+
+    def raw_state(self, host: str) -> dict:
+        """Get the last raw state polled from `host`."""
+        return self._sensors[host].raw
+
+    def state(self, host: str) -> SensorState:
+        """Get the last state polled from `host` as `SensorState`."""
+        fields = self._sensors[host].fields
+        return SensorState.construct(_fields_set=set(fields), **fields)
+
+    async def poll(self, session: aiohttp.ClientSession, host: str) -> StateUpdate:
+        """Poll a sensor once and update its state.
+
+        Args:
+            session: Session to send the request with.
+            host: The sensor to poll.
+
+        Returns:
+            StateUpdate: The changes since the last poll.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            async with session.get(
+                f"http://{host}/state",
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            ) as response:
+                response.raise_for_status()
+                raw = await response.json()
+        if not isinstance(raw, dict):
+            raise CorruptedDataError(f"state of {host} is not an object")
+
+        sensor = self._sensors[host]
+        changes = diff_states(sensor.raw, raw)
+        self._validate(host, sensor, raw)
+        sensor.raw = raw
+        return StateUpdate(
+            host=host,
+            uid=raw.get("uid"),
+            time=datetime.now(tz=timezone.utc),
+            changes=changes,
+        )
+
+    def _validate(self, host: str, sensor: _PolledSensor, raw: dict) -> None:
+        """Validate the top level fields which differ from the last poll."""
+        for key, field in SensorState.__fields__.items():
+            if key not in raw:
+                sensor.fields.pop(key, None)
+                sensor.validated.pop(key, None)
+                continue
+            if key in sensor.validated and sensor.validated[key] == raw[key]:
+                continue
+            value, errors = field.validate(raw[key], {}, loc=key, cls=SensorState)
+            if errors:
+                logger.warning(f"Invalid {key} in state of {host}: {errors}")
+                continue
+            sensor.fields[key] = value
+            sensor.validated[key] = raw[key]
+
+    async def run(self) -> AsyncIterator[StateUpdate]:
+        """Poll all sensors until cancelled and yield updates with changes.
+
+        Sensors which cannot be reached or answer with an invalid state are
+        logged and polled again in the next interval.
+        """
+        updates: asyncio.Queue[StateUpdate] = asyncio.Queue()
+
+        async def poll_forever(session: aiohttp.ClientSession, host: str) -> None:
+            await asyncio.sleep(random.uniform(0, self.interval))
+            while True:
+                try:
+                    update = await self.poll(session, host)
+                    if update.changes:
+                        await updates.put(update)
+                except Exception as e:
+                    logger.warning(f"Cannot poll state of {host}: {e!r}")
+                spread = self.interval * self.jitter
+                await asyncio.sleep(self.interval + random.uniform(-spread, spread))
+
+        session = self.session or aiohttp.ClientSession()
+        tasks = [
+            asyncio.ensure_future(poll_forever(session, host)) for host in self.hosts
+        ]
+        try:
+            while True:
+                yield await updates.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.session is None:
+                await session.close()
@@ -0,0 +1,396 @@
+"""Record live websocket streams to MiniSEED files."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from typing import Any, BinaryIO, Iterable
+
+import numpy as np
+from obspy import Trace, UTCDateTime
+
+from quakesaver_client.client_websocket import TraceChunk, WebsocketHandler
+from quakesaver_client.models.sensor_state import RecordLength, WaveformArchiveConfig
+
+logger = logging.getLogger(__name__)
+
+ENCODINGS: dict[np.dtype, str] = {
+    np.dtype(np.int32): "STEIM2",
+    np.dtype(np.float32): "FLOAT32",
+    np.dtype(np.float64): "FLOAT64",
+}
+
+MAX_SEQUENCE_NUMBER = 999999
+
+
+class _ChannelBuffer:
+    """Samples of one channel which have not been written yet."""
+
+    def __init__(self, starttime: float, delta: float, samples_per_record: int) -> None:
+        self.starttime = starttime
+        self.delta = delta
+        self.chunks: list[np.ndarray] = []
+        self.nsamples = 0
+        self.samples_per_record = samples_per_record
+        self.sequence_number = 1
+        self.file: BinaryIO | None = None
+        self.file_window: int | None = None
+
+    @property
+    def endtime(self) -> float:
+        """Time of the next expected sample."""
+        return self.starttime + self.nsamples * self.delta
+
+    def append(self, data: np.ndarray) -> None:
+        # Copy, the chunk may live in a decode buffer which is reused.
+        self.chunks.append(data.copy())
+        self.nsamples += data.size
+
+
+class MiniSEEDRecorder:
+    """Write `TraceChunk` instances into rotating MiniSEED files.
+
+    Samples are buffered per channel and only encoded once enough data for
+    several full records is available. Encoded records are appended to the
+    channel's file in one write, so the number of syscalls is independent of the
+    websocket message rate. Files are rotated every `time_length` seconds,
+    aligned to multiples of `time_length` since the epoch.
+    """
+
+    def __init__(
+        self,
+        directory: Path | str,
+        record_length: RecordLength = RecordLength.integer_4096,
+        time_length: int = 600,
+        network: str = "QS",
+        location: str = "",
+        batch_records: int = 8,
+    ) -> None:
+        """Initialize `MiniSEEDRecorder`.
+
+        Args:
+            directory: Directory to write the MiniSEED files to.
+            record_length: Size of the MiniSEED records in bytes.
+                Defaults to 4096.
+            time_length: Length of a single file in seconds. Defaults to 600.
+            network: Network code written into the records. Defaults to "QS".
+            location: Location code written into the records. Defaults to "".
+            batch_records: Number of full records to buffer per channel before
+                encoding and writing them. Defaults to 8.
+        """
+        self.directory = Path(directory)
+        self.record_length = RecordLength(record_length).value
+        self.time_length = time_length
+        self.network = network
+        self.location = location
+        self.batch_records = batch_records
+
+        self._buffers: dict[tuple[str, str], _ChannelBuffer] = {}
+
+    @classmethod
+    def from_archive_config(
+        cls, config: WaveformArchiveConfig, directory: Path | str | None = None
+    ) -> MiniSEEDRecorder:
+        """Create a recorder matching a sensor's `WaveformArchiveConfig`.
+
+        Args:
+            config: The waveform archive configuration of a sensor.
+            directory: Directory to write to. Defaults to `config.data_path`.
+
+        Returns:
+            MiniSEEDRecorder: The configured recorder.
+        """
+        return cls(
+            directory=directory or config.data_path,
+            record_length=config.record_length,
+            time_length=config.time_length,
+        )
+
+    def write(self, trace: TraceChunk) -> None:
+        """Buffer a chunk and write all full records which became available.
+
+        Args:
+            trace: A decoded chunk as yielded by `WebsocketHandler.start`.
+        """
+        starttime = trace.tmin
+        for channel, data in zip(trace.channels, trace.array):
+            key = (trace.uid or "", channel)
+            buffer = self._buffers.get(key)
+
+            if buffer is None:
+                buffer = self._buffers[key] = _ChannelBuffer(
+                    starttime, trace.delta_t, self.record_length // 4
+                )
+            elif abs(starttime - buffer.endtime) > buffer.delta / 2:
+                logger.info(f"gap in {key[0]}.{channel}, starting a new segment.")
+                self._encode(key, buffer, final=True)
+                buffer.starttime = starttime
+                buffer.delta = trace.delta_t
+
+            # Split the chunk at file rotation boundaries.
+            window_end = self._window(buffer.starttime) + self.time_length
+            while data.size:
+                nsplit = int(
+                    np.ceil((window_end - buffer.endtime) / buffer.delta - 1e-6)
+                )
+                buffer.append(data[:nsplit])
+                data = data[nsplit:]
+                if data.size:
+                    self._encode(key, buffer, final=True)
+                    window_end += self.time_length
+
+            if buffer.nsamples >= self.batch_records * buffer.samples_per_record:
+                self._encode(key, buffer, final=False)
+
+    def flush(self) -> None:
+        """Write all buffered samples, including partial records, and close files."""
+        for key, buffer in self._buffers.items():
+            self._encode(key, buffer, final=True)
+            if buffer.file is not None:
+                buffer.file.close()
+                buffer.file = None
+        self._buffers.clear()
+
+    async def record(self, handler: WebsocketHandler) -> None:
+        """Record everything `handler` yields until cancelled.
+
+        Args:
+            handler: The websocket handler to record from.
+        """
+        try:
+            async for trace in handler.start():
+                self.write(trace)
+        finally:
+            self.flush()
+
+    def __enter__(self) -> MiniSEEDRecorder:
+        """Use the recorder as a context manager which flushes on exit."""
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        """Flush all buffers."""
+        self.flush()
+
+    def _window(self, time: float) -> int:
+        """Get the start of the rotation window containing `time`."""
+        return int(time // self.time_length * self.time_length)
+
+    def _get_file(self, key: tuple[str, str], buffer: _ChannelBuffer) -> BinaryIO:
+        """Get the open file for the buffer's current rotation window."""
+        window = self._window(buffer.starttime)
+        if buffer.file is not None and buffer.file_window == window:
+            return buffer.file
+        if buffer.file is not None:
+            buffer.file.close()
+
+        station, channel = key
+        start = datetime.fromtimestamp(window, tz=timezone.utc)
+        path = self.directory / station
+        path.mkdir(parents=True, exist_ok=True)
+        filename = path / (
+            f"{self.network}.{station}.{self.location}.{channel}."
+            f"{start:%Y%m%dT%H%M%S}.mseed"
+        )
+        logger.debug(f"writing {filename}")
+        buffer.file = filename.open("ab")
+        buffer.file_window = window
+        return buffer.file
+
+    def _encode(
+        self, key: tuple[str, str], buffer: _ChannelBuffer, final: bool
+    ) -> None:
+        """Encode buffered samples and append the records to the channel file.
+
+        Unless `final` is set, the last record is usually only partially filled.
+        It is dropped and its samples stay in the buffer to be encoded into a
+        full record later.
+        """
+        if not buffer.nsamples:
+            return
+
+        data = np.concatenate(buffer.chunks)
+        station, channel = key
+        trace = Trace(data)
+        trace.stats.network = self.network
+        trace.stats.station = station
+        trace.stats.location = self.location
+        trace.stats.channel = channel
+        trace.stats.delta = buffer.delta
+        trace.stats.starttime = UTCDateTime(buffer.starttime)
+
+        encoded = BytesIO()
+        trace.write(
+            encoded,
+            format="MSEED",
+            reclen=self.record_length,
+            encoding=ENCODINGS[data.dtype],
+            byteorder=">",
+            sequence_number=buffer.sequence_number,
+        )
+        records = encoded.getbuffer()
+        nrecords = len(records) // self.record_length
+
+        if final:
+            nwritten = data.size
+        else:
+            if nrecords < 2:
+                buffer.samples_per_record *= 2
+                return
+            last = (nrecords - 1) * self.record_length
+            nlast = int.from_bytes(records[last + 30 : last + 32], "big")
+            nwritten = data.size - nlast
+            nrecords -= 1
+            buffer.samples_per_record = max(
+                buffer.samples_per_record, nwritten // nrecords
+            )
+
+        self._get_file(key, buffer).write(records[: nrecords * self.record_length])
+        buffer.sequence_number = (
+            buffer.sequence_number + nrecords - 1
+        ) % MAX_SEQUENCE_NUMBER + 1
+        buffer.chunks = [data[nwritten:].copy()] if nwritten < data.size else []
+        buffer.nsamples = data.size - nwritten
+        buffer.starttime += nwritten * buffer.delta
+
+
+class RecordingStats:
+    """Rate, lag and gaps of the stream of one sensor.
+
+    Only counters are kept, so the memory used does not grow with the duration
+    of a recording. `rate` is the number of samples per channel and second
+    received since the previous snapshot, `lag` the age of the last sample when
+    it was received.
+    """
+
+    def __init__(self) -> None:
+        """Initialize `RecordingStats`."""
+        self.chunks = 0
+        self.samples = 0
+        self.gaps = 0
+        self.gap_seconds = 0.0
+        self.lag: float | None = None
+        self.tmax: float | None = None
+        self._snapshot_samples = 0
+        self._snapshot_time = time.monotonic()
+
+    def record(self, trace: TraceChunk) -> None:
+        """Count a received chunk.
+
+        Args:
+            trace: The chunk as yielded by `WebsocketHandler.start`.
+        """
+        self.chunks += 1
+        self.samples += trace.nsamples
+        self.lag = time.time() - trace.tmax
+        if self.tmax is not None:
+            gap = trace.tmin - self.tmax
+            if gap > trace.delta_t / 2:
+                self.gaps += 1
+                self.gap_seconds += gap
+        self.tmax = trace.tmax
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get the counters and the sample rate since the previous snapshot."""
+        now = time.monotonic()
+        elapsed = max(now - self._snapshot_time, 1e-9)
+        rate = (self.samples - self._snapshot_samples) / elapsed
+        self._snapshot_samples = self.samples
+        self._snapshot_time = now
+        return {
+            "chunks": self.chunks,
+            "samples": self.samples,
+            "rate": rate,
+            "lag": self.lag,
+            "gaps": self.gaps,
+            "gap_seconds": self.gap_seconds,
+        }
+
+
+class FleetRecorder:
+    """Record the streams of many sensors into one `MiniSEEDRecorder`.
+
+    All websockets are served by tasks of the running event loop. Chunks are
+    decoded into reused buffers and copied into the recorder's bounded channel
+    buffers, so memory stays constant while recording for weeks. The statistics
+    of every sensor are logged every `stats_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        recorder: MiniSEEDRecorder,
+        stats_interval: float | None = 60.0,
+    ) -> None:
+        """Initialize `FleetRecorder`.
+
+        Args:
+            recorder: The recorder to write all streams to.
+            stats_interval: Seconds between two statistics reports, or None to
+                disable them. Defaults to 60.
+        """
+        self.recorder = recorder
+        self.stats_interval = stats_interval
+        self.stats: dict[str, RecordingStats] = {}
+
+    @staticmethod
+    def handler(host: str, **kwargs: Any) -> WebsocketHandler:
+        """Create a handler suited for recording, see `record`.
+
+        Args:
+            host: Hostname and port of the sensor.
+            **kwargs: Passed on to `WebsocketHandler`.
+        """
+        kwargs.setdefault("reuse_buffers", True)
+        return WebsocketHandler(host, **kwargs)
+
+    async def _record_sensor(self, handler: WebsocketHandler) -> None:
+        stats = self.stats[handler.url]
+        async for trace in handler.start():
+            stats.record(trace)
+            self.recorder.write(trace)
+        logger.warning(f"Stream of {handler.url} ended")
+
+    def report(self) -> None:
+        """Log the statistics of all sensors."""
+        for url, stats in self.stats.items():
+            snapshot = stats.snapshot()
+            lag = "-" if snapshot["lag"] is None else f"{snapshot['lag']:.2f} s"
+            logger.info(
+                f"{url}: {snapshot['rate']:.1f} Hz, lag {lag}, "
+                f"{snapshot['gaps']} gaps ({snapshot['gap_seconds']:.1f} s), "
+                f"{snapshot['chunks']} chunks"
+            )
+
+    async def _report_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            self.report()
+
+    async def record(self, handlers: Iterable[WebsocketHandler]) -> None:
+        """Record all handlers until cancelled or all streams ended.
+
+        Args:
+            handlers: One handler per sensor, e.g. created by `handler`.
+        """
+        handlers = list(handlers)
+        for handler in handlers:
+            self.stats[handler.url] = RecordingStats()
+
+        loop = asyncio.get_running_loop()
+        tasks = [loop.create_task(self._record_sensor(h)) for h in handlers]
+        background = list(tasks)
+        if self.stats_interval is not None:
+            background.append(loop.create_task(self._report_forever()))
+        try:
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(result, Exception):
+                    logger.error(f"Recording failed: {result!r}")
+        finally:
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            self.recorder.flush()
+            self.report()
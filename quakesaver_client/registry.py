@@ -0,0 +1,192 @@
+"""Persistent registry of the sensors found on the local network."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from enum import Enum
+from ipaddress import IPv4Address, ip_address
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Optional
+
+from pydantic import BaseModel
+
+from quakesaver_client.discovery import DiscoveredSensor, discover
+from quakesaver_client.sensor_actor import SENSOR_PORT
+
+logger = logging.getLogger(__name__)
+
+
+class RegisteredSensor(BaseModel):
+    """A sensor known to the registry."""
+
+    uid: str
+    ip_address: IPv4Address
+    software_version: Optional[str]
+    last_seen: datetime
+    rtt: Optional[float]
+    online: bool = True
+
+
+class SensorEventType(Enum):
+    appeared = "appeared"
+    disappeared = "disappeared"
+    moved = "moved"
+
+
+class SensorEvent(BaseModel):
+    """A change of the sensors on the network found by a scan."""
+
+    type: SensorEventType
+    sensor: RegisteredSensor
+    previous_ip_address: Optional[IPv4Address]
+
+
+class _RegistryFile(BaseModel):
+    sensors: list[RegisteredSensor] = []
+
+
+class SensorRegistry:
+    """Sensors found on the network, persisted as JSON between scans.
+
+    A scan first re-probes the addresses of all known sensors, which usually
+    finds the whole fleet within one connect timeout. Only then the rest of the
+    range is swept with lower parallelism. Sensors are never removed, sensors
+    not found by a scan are marked offline.
+    """
+
+    def __init__(self, path: Path | str = "sensors.json") -> None:
+        """Initialize `SensorRegistry` and load the registry file if it exists.
+
+        Args:
+            path: The registry file. Defaults to "sensors.json".
+        """
+        self.path = Path(path)
+        self.sensors: dict[str, RegisteredSensor] = {}
+        if self.path.exists():
+            registry = _RegistryFile.parse_file(self.path)
+            self.sensors = {sensor.uid: sensor for sensor in registry.sensors}
+
+    @property
+    def online(self) -> list[RegisteredSensor]:
+        """Sensors found by the last scan."""
+        return [sensor for sensor in self.sensors.values() if sensor.online]
+
+    def save(self) -> None:
+        """Write the registry file."""
+        registry = _RegistryFile(sensors=list(self.sensors.values()))
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        tmp.write_text(registry.json(indent=2))
+        tmp.replace(self.path)
+
+    def export_csv(self, path: Path | str = "sensors-alive.csv") -> None:
+        """Write the online sensors in the format of `qs-client detect`.
+
+        Args:
+            path: The file to write. Defaults to "sensors-alive.csv".
+        """
+        with open(path, "w") as f:
+            f.write("uid,ip_address\n")
+            for sensor in self.online:
+                f.write(f"{sensor.uid},{sensor.ip_address}\n")
+
+    async def scan(
+        self,
+        hosts: Iterable[IPv4Address | str] = (),
+        concurrency: int = 256,
+        sweep_concurrency: int = 64,
+        port: int = SENSOR_PORT,
+        connect_timeout: float = 0.3,
+    ) -> list[SensorEvent]:
+        """Probe known addresses, then sweep `hosts`, and update the registry.
+
+        Args:
+            hosts: The range to sweep for new sensors. Defaults to none.
+            concurrency: Known addresses probed in parallel. Defaults to 256.
+            sweep_concurrency: Other addresses probed in parallel.
+                Defaults to 64.
+            port: Port of the sensors' HTTP server. Defaults to 5533.
+            connect_timeout: Seconds to wait for a TCP connection to a host.
+                Defaults to 0.3.
+
+        Returns:
+            list[SensorEvent]: Sensors which appeared, disappeared or moved.
+        """
+        known = {sensor.ip_address for sensor in self.sensors.values()}
+        found: dict[str, DiscoveredSensor] = {}
+        async for sensor in discover(
+            known, concurrency, port=port, connect_timeout=connect_timeout
+        ):
+            found.setdefault(sensor.uid, sensor)
+
+        sweep = (host for host in hosts if ip_address(host) not in known)
+        async for sensor in discover(
+            sweep, sweep_concurrency, port=port, connect_timeout=connect_timeout
+        ):
+            found.setdefault(sensor.uid, sensor)
+
+        events = self._update(found)
+        self.save()
+        return events
+
+    async def watch(
+        self, hosts: Iterable[IPv4Address | str] = (), interval: float = 60.0, **kwargs
+    ) -> AsyncIterator[SensorEvent]:
+        """Scan continuously and yield the changes.
+
+        Args:
+            hosts: The range to sweep for new sensors, e.g. an
+                `IPv4Network`, which can be iterated more than once.
+            interval: Seconds between the start of two scans. Defaults to 60.
+            **kwargs: Passed on to `scan`.
+
+        Yields:
+            SensorEvent: Sensors which appeared, disappeared or moved.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            for event in await self.scan(hosts, **kwargs):
+                yield event
+            await asyncio.sleep(max(0.0, started + interval - loop.time()))
+
+    def _update(self, found: dict[str, DiscoveredSensor]) -> list[SensorEvent]:
+        """Merge the sensors found by a scan and get the resulting events."""
+        now = datetime.now(tz=timezone.utc)
+        events = []
+        for uid, discovered in found.items():
+            previous = self.sensors.get(uid)
+            sensor = self.sensors[uid] = RegisteredSensor(
+                uid=uid,
+                ip_address=discovered.ip_address,
+                software_version=discovered.software_version,
+                last_seen=now,
+                rtt=discovered.rtt,
+            )
+            previous_ip = previous.ip_address if previous is not None else None
+            if previous is None or not previous.online:
+                event_type = SensorEventType.appeared
+            elif previous_ip != sensor.ip_address:
+                event_type = SensorEventType.moved
+            else:
+                continue
+            events.append(
+                SensorEvent(
+                    type=event_type, sensor=sensor, previous_ip_address=previous_ip
+                )
+            )
+
+        for uid, sensor in self.sensors.items():
+            if uid not in found and sensor.online:
+                sensor.online = False
+                events.append(
+                    SensorEvent(type=SensorEventType.disappeared, sensor=sensor)
+                )
+
+        for event in events:
+            logger.info(
+                f"Sensor {event.sensor.uid}@{event.sensor.ip_address} "
+                f"{event.type.value}"
+            )
+        return events
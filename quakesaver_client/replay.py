@@ -0,0 +1,160 @@
+"""Record raw websocket sessions and replay them for offline benchmarks."""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import logging
+import struct
+from pathlib import Path
+from typing import IO, Any, AsyncIterator, Iterator
+
+from quakesaver_client.client_websocket import TraceChunk, WebsocketHandler
+from quakesaver_client.errors import CorruptedDataError
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"QSWS\x01"
+FRAME_HEADER = struct.Struct(">dBI")
+
+TEXT = 0
+BINARY = 1
+
+
+def _open(path: Path, mode: str) -> IO[bytes]:
+    """Open a session file, gzip compressed if its name ends with `.gz`."""
+    if path.suffix == ".gz":
+        return gzip.open(path, mode)
+    return path.open(mode)
+
+
+class SessionRecorder:
+    """Capture raw websocket frames with their receive time to a compact file.
+
+    Every frame is stored as its POSIX receive timestamp, its type and its
+    length followed by the unmodified frame. Files whose name ends with `.gz`
+    are gzip compressed. Pass an instance as `session_recorder` to
+    `WebsocketHandler` and replay the file with `ReplayHandler`.
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        """Initialize `SessionRecorder` and create the file.
+
+        Args:
+            path: The file to write, an existing file is overwritten.
+        """
+        self.path = Path(path)
+        self.frames = 0
+        self._file = _open(self.path, "wb")
+        self._file.write(MAGIC)
+
+    def write(self, received: float, frame: str | bytes) -> None:
+        """Append a frame.
+
+        Args:
+            received: POSIX timestamp at which the frame was received.
+            frame: The raw text or binary frame.
+        """
+        if isinstance(frame, str):
+            kind, frame = TEXT, frame.encode()
+        else:
+            kind = BINARY
+        self._file.write(FRAME_HEADER.pack(received, kind, len(frame)))
+        self._file.write(frame)
+        self.frames += 1
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        if not self._file.closed:
+            self._file.close()
+            logger.debug(f"recorded {self.frames} frames to {self.path}")
+
+    def __enter__(self) -> SessionRecorder:
+        """Use the recorder as a context manager which closes the file on exit."""
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        """Close the file."""
+        self.close()
+
+
+def read_session(path: Path | str) -> Iterator[tuple[float, str | bytes]]:
+    """Read the frames of a session recorded by `SessionRecorder`.
+
+    Args:
+        path: The session file.
+
+    Raises:
+        CorruptedDataError: If the file is not a session file or truncated.
+
+    Yields:
+        tuple[float, str | bytes]: Receive timestamp and raw frame.
+    """
+    path = Path(path)
+    with _open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise CorruptedDataError(f"{path} is not a recorded websocket session")
+        while True:
+            header = file.read(FRAME_HEADER.size)
+            if not header:
+                return
+            if len(header) < FRAME_HEADER.size:
+                raise CorruptedDataError(f"{path} is truncated")
+            received, kind, length = FRAME_HEADER.unpack(header)
+            frame = file.read(length)
+            if len(frame) < length:
+                raise CorruptedDataError(f"{path} is truncated")
+            yield received, frame.decode() if kind == TEXT else frame
+
+
+class ReplayHandler(WebsocketHandler):
+    """Feed a recorded session through the `WebsocketHandler` consumer API.
+
+    Frames are decoded exactly like live frames, so anything consuming
+    `WebsocketHandler.start` can be benchmarked reproducibly without a sensor.
+    The original timing is kept at `speed` 1, scaled by `speed` otherwise, or
+    dropped entirely at maximum speed. When `metrics` are passed, the parse and
+    decode stages are meaningful while latencies refer to the replay clock.
+    """
+
+    def __init__(
+        self, path: Path | str, speed: float | None = 1.0, **kwargs: Any
+    ) -> None:
+        """Initialize `ReplayHandler`.
+
+        Args:
+            path: The session file written by `SessionRecorder`.
+            speed: Replay speed relative to the recording, or None to replay as
+                fast as possible. Defaults to 1.0.
+            **kwargs: Passed on to `WebsocketHandler`, e.g. `reuse_buffers` or
+                `metrics`. Backfilling is always disabled.
+        """
+        if speed is not None and speed <= 0.0:
+            raise ValueError("speed has to be positive")
+        kwargs["backfill"] = False
+        super().__init__(url=str(path), **kwargs)
+        self.path = Path(path)
+        self.speed = speed
+
+    async def _receive(self, session: Any) -> AsyncIterator[str | bytes]:
+        """Yield the recorded frames, paced according to `speed`."""
+        loop = asyncio.get_running_loop()
+        speed = self.speed
+        first = start = None
+        for received, frame in read_session(self.path):
+            if speed is not None:
+                if first is None:
+                    first, start = received, loop.time()
+                delay = start + (received - first) / speed - loop.time()
+                if delay > 0.0:
+                    await asyncio.sleep(delay)
+            yield frame
+
+    async def start(self) -> AsyncIterator[TraceChunk]:
+        """Replay the session once."""
+        async for trace in self.create_websocket(None):
+            self._track(trace)
+            yield trace
+
+    async def stop(self) -> None:
+        """Do nothing, there is no sensor to stop."""
@@ -0,0 +1,507 @@
+"""Stream waveforms from the SeedLink server of a sensor."""
+
+from __future__ import annotations
+
+import asyncio
+import calendar
+import json
+import logging
+import random
+import struct
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Optional
+
+import numpy as np
+
+from quakesaver_client.client_websocket import TraceChunk
+from quakesaver_client.errors import CorruptedDataError, NoDataError
+
+logger = logging.getLogger(__name__)
+
+SEEDLINK_PORT = 18000
+
+HEADER_SIZE = 8
+RECORD_SIZE = 512
+INFO_SIGNATURE = b"SLINFO"
+MAX_SEQUENCE = 0xFFFFFF
+
+INT16 = 1
+INT32 = 3
+FLOAT32 = 4
+FLOAT64 = 5
+STEIM1 = 10
+STEIM2 = 11
+ENCODINGS = {INT16: "i2", INT32: "i4", FLOAT32: "f4", FLOAT64: "f8"}
+
+_FIXED_HEADER = "6sss5s2s3s2sHHBBBxHHhhBBBBiHH"
+_FIXED_HEADER_SIZE = 48
+_TIME_CORRECTION_APPLIED = 0x02
+
+# Differences per word and their width in bits by the 2-bit code of the word,
+# and for Steim2 by the 2-bit sub-code in the word's top bits (code * 4 + dnib).
+_STEIM1_COUNTS = np.array([0, 4, 2, 1])
+_STEIM1_BITS = np.array([32, 8, 16, 32])
+_STEIM2_COUNTS = np.array([0, 0, 0, 0, 4, 4, 4, 4, 0, 1, 2, 3, 5, 6, 7, 0])
+_STEIM2_BITS = np.array([32, 32, 32, 32, 8, 8, 8, 8, 32, 30, 15, 10, 6, 5, 4, 32])
+_STEIM_SLOTS = np.arange(7)
+_NIBBLE_SHIFTS = np.arange(30, -2, -2, dtype=np.uint32)
+
+
+class MiniSEEDRecord:
+    """A decoded MiniSEED record of a single channel."""
+
+    __slots__ = (
+        "network",
+        "station",
+        "location",
+        "channel",
+        "starttime",
+        "delta",
+        "data",
+    )
+
+    def __init__(
+        self,
+        network: str,
+        station: str,
+        location: str,
+        channel: str,
+        starttime: float,
+        delta: float,
+        data: np.ndarray,
+    ) -> None:
+        """Initialize `MiniSEEDRecord`.
+
+        Args:
+            network: Network code.
+            station: Station code.
+            location: Location code.
+            channel: Channel code.
+            starttime: POSIX timestamp of the first sample.
+            delta: Sampling interval in seconds.
+            data: The samples.
+        """
+        self.network = network
+        self.station = station
+        self.location = location
+        self.channel = channel
+        self.starttime = starttime
+        self.delta = delta
+        self.data = data
+
+    @property
+    def endtime(self) -> float:
+        """POSIX timestamp after the last sample."""
+        return self.starttime + self.delta * self.data.size
+
+    def to_chunk(self) -> TraceChunk:
+        """Convert the record to a single channel `TraceChunk`."""
+        return TraceChunk(
+            uid=self.station,
+            channels=(self.channel,),
+            array=self.data.reshape(1, -1),
+            tmax=self.endtime,
+            delta_t=self.delta,
+        )
+
+
+def _sampling_rate(factor: int, multiplier: int) -> float:
+    """Get the sampling rate from the factor and multiplier of a record header."""
+    if factor == 0 or multiplier == 0:
+        return 0.0
+    if factor > 0:
+        return factor * multiplier if multiplier > 0 else -factor / multiplier
+    return -multiplier / factor if multiplier > 0 else 1.0 / (factor * multiplier)
+
+
+def decode_steim(
+    data: bytes, nsamples: int, steim2: bool = True, byteorder: str = ">"
+) -> np.ndarray:
+    """Decode Steim1 or Steim2 compressed samples with vectorized NumPy.
+
+    Args:
+        data: The data section of a record, a sequence of 64 byte frames.
+        nsamples: Number of samples in the record.
+        steim2: Whether the data is Steim2, else Steim1, compressed.
+            Defaults to True.
+        byteorder: Byte order of the words, ">" or "<". Defaults to ">".
+
+    Returns:
+        np.ndarray: The int32 samples.
+    """
+    nframes = len(data) // 64
+    if nframes == 0:
+        raise CorruptedDataError("Steim record without data frames")
+    words = np.frombuffer(data, dtype=f"{byteorder}u4", count=nframes * 16)
+    words = words.astype(np.uint32).reshape(nframes, 16)
+    first, last = words[0, 1:3].view(np.int32)
+
+    codes = ((words[:, :1] >> _NIBBLE_SHIFTS) & 3).ravel()
+    words = words.ravel()
+    if byteorder == "<":
+        # Only whole differences are swapped, 8-bit differences keep their
+        # order and the two 16-bit differences of Steim1 their places.
+        words = words.copy()
+        words[codes == 1] = words[codes == 1].byteswap()
+        if not steim2:
+            halves = words[codes == 2]
+            words[codes == 2] = (halves << 16) | (halves >> 16)
+    words = words.astype(np.int64)
+    if steim2:
+        kinds = codes * 4 + (words >> 30)
+        counts, bits = _STEIM2_COUNTS[kinds], _STEIM2_BITS[kinds]
+    else:
+        counts, bits = _STEIM1_COUNTS[codes], _STEIM1_BITS[codes]
+
+    # Differences are packed from the most significant end of every word,
+    # unpack all of them into the slots of a (words, 7) array at once.
+    counts, bits = counts[:, None], bits[:, None]
+    used = _STEIM_SLOTS < counts
+    shifts = np.where(used, bits * (counts - 1 - _STEIM_SLOTS), 0)
+    values = (words[:, None] >> shifts) & ((1 << bits) - 1)
+    values -= (values >> (bits - 1)) << bits
+    diffs = values[used]
+    if diffs.size < nsamples:
+        raise CorruptedDataError(
+            f"Steim record holds {diffs.size} of {nsamples} samples"
+        )
+
+    # The first difference refers to the previous record, start with `first`.
+    diffs[0] = first
+    samples = np.cumsum(diffs[:nsamples]).astype(np.int32)
+    if nsamples and samples[-1] != last:
+        raise CorruptedDataError("Steim integration constant does not match")
+    return samples
+
+
+def _blockettes(record: bytes, offset: int, byteorder: str) -> dict[int, int]:
+    """Get the offsets of the blockettes of a record by their type."""
+    found = {}
+    while offset and offset + 4 <= len(record) and len(found) < 16:
+        kind, following = struct.unpack_from(f"{byteorder}HH", record, offset)
+        found[kind] = offset
+        if following <= offset:
+            break
+        offset = following
+    return found
+
+
+def decode_record(record: bytes) -> MiniSEEDRecord:
+    """Decode a MiniSEED record into NumPy without ObsPy.
+
+    Supports the INT16, INT32, FLOAT32, FLOAT64, Steim1 and Steim2 encodings.
+    The record must contain blockette 1000.
+
+    Args:
+        record: The record.
+
+    Returns:
+        MiniSEEDRecord: The decoded record.
+    """
+    if len(record) < _FIXED_HEADER_SIZE:
+        raise CorruptedDataError(f"MiniSEED record of {len(record)} bytes")
+    # Records are big endian by convention, unless the year makes no sense.
+    (year,) = struct.unpack_from(">H", record, 20)
+    byteorder = ">" if 1900 <= year <= 2500 else "<"
+    (
+        _,
+        _,
+        _,
+        station,
+        location,
+        channel,
+        network,
+        year,
+        day,
+        hour,
+        minute,
+        second,
+        fraction,
+        nsamples,
+        factor,
+        multiplier,
+        activity,
+        _,
+        _,
+        _,
+        correction,
+        data_offset,
+        blockette_offset,
+    ) = struct.unpack_from(byteorder + _FIXED_HEADER, record)
+
+    blockettes = _blockettes(record, blockette_offset, byteorder)
+    if 1000 not in blockettes:
+        raise CorruptedDataError("MiniSEED record without blockette 1000")
+    encoding, word_order, length = struct.unpack_from(
+        "BBB", record, blockettes[1000] + 4
+    )
+    data_byteorder = ">" if word_order else "<"
+
+    starttime = (
+        calendar.timegm((year, 1, 1, hour, minute, second))
+        + (day - 1) * 86400
+        + fraction * 1e-4
+    )
+    if 1001 in blockettes:
+        (microseconds,) = struct.unpack_from("b", record, blockettes[1001] + 5)
+        starttime += microseconds * 1e-6
+    if not activity & _TIME_CORRECTION_APPLIED:
+        starttime += correction * 1e-4
+    rate = _sampling_rate(factor, multiplier)
+
+    data = record[data_offset : 1 << length]
+    if encoding in (STEIM1, STEIM2):
+        samples = decode_steim(data, nsamples, encoding == STEIM2, data_byteorder)
+    elif encoding in ENCODINGS:
+        dtype = np.dtype(data_byteorder + ENCODINGS[encoding])
+        if len(data) < nsamples * dtype.itemsize:
+            raise CorruptedDataError(f"MiniSEED record holds less than {nsamples}")
+        samples = np.frombuffer(data, dtype=dtype, count=nsamples)
+        samples = samples.astype(dtype.newbyteorder("="))
+    else:
+        raise CorruptedDataError(f"Unsupported MiniSEED encoding {encoding}")
+
+    return MiniSEEDRecord(
+        network=network.decode().strip(),
+        station=station.decode().strip(),
+        location=location.decode().strip(),
+        channel=channel.decode().strip(),
+        starttime=starttime,
+        delta=1.0 / rate if rate else 0.0,
+        data=samples,
+    )
+
+
+class SequenceStore:
+    """The sequence number of the last packet received from every station.
+
+    Written atomically to a JSON file, so a restarted client asks the server
+    for the packets after the last one it received.
+    """
+
+    def __init__(self, path: Path | str | None = None) -> None:
+        """Initialize `SequenceStore`.
+
+        Args:
+            path: The JSON file. Defaults to keeping the sequences in memory.
+        """
+        self.path = Path(path) if path is not None else None
+        self.sequences: dict[str, int] = {}
+        self._dirty = False
+        if self.path is not None and self.path.exists():
+            self.sequences = {
+                station: int(sequence)
+                for station, sequence in json.loads(self.path.read_text()).items()
+            }
+
+    def get(self, station: str) -> Optional[int]:
+        """Get the last sequence number of a station, e.g. "QS_SUB54I40"."""
+        return self.sequences.get(station)
+
+    def update(self, station: str, sequence: int) -> None:
+        """Set the last sequence number of a station."""
+        self.sequences[station] = sequence
+        self._dirty = True
+
+    def save(self) -> None:
+        """Write the sequences to the file if they changed."""
+        if self.path is None or not self._dirty:
+            return
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        tmp.write_text(json.dumps(self.sequences, indent=2, sort_keys=True))
+        tmp.replace(self.path)
+        self._dirty = False
+
+
+def _station_key(network: str, station: str) -> str:
+    return f"{network}_{station}"
+
+
+class SeedLinkClient:
+    """Stream waveforms from a SeedLink server as `TraceChunk` instances.
+
+    An alternative to the `WebsocketHandler` speaking the SeedLink 3 protocol
+    over plain TCP. Every packet is a 512 byte MiniSEED record of one channel,
+    it is decoded with NumPy into a single channel chunk. The sequence number
+    of the last packet of every station is kept in a `SequenceStore`. After a
+    reconnect, or a restart with the same `state_file`, the server resumes
+    after that packet, without gaps or duplicates as long as it still has the
+    packet in its buffer.
+    """
+
+    def __init__(
+        self,
+        host: str = "qssensor.local",
+        port: int = SEEDLINK_PORT,
+        stations: Iterable[str] = (),
+        selectors: Iterable[str] = (),
+        state_file: Path | str | None = None,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 60.0,
+        timeout: float = 30.0,
+        save_interval: float = 1.0,
+    ) -> None:
+        """Initialize `SeedLinkClient`.
+
+        Args:
+            host: Hostname of the SeedLink server.
+            port: Port of the SeedLink server. Defaults to 18000.
+            stations: Stations to stream as network and station code, e.g.
+                "QS_SUB54I40".
+            selectors: SeedLink selectors of the channels to stream, e.g.
+                "HN?" or "00HNZ.D". Defaults to all channels.
+            state_file: JSON file to keep the sequence numbers in. Defaults to
+                keeping them in memory, which resumes after reconnects only.
+            reconnect_delay: Base delay in seconds of the exponential reconnect
+                backoff. Defaults to 1.0.
+            max_reconnect_delay: Upper limit of the reconnect delay in seconds.
+                Defaults to 60.0.
+            timeout: Seconds to wait for the server during the handshake and
+                for a packet while streaming. Defaults to 30.0.
+            save_interval: Seconds between two writes of the `state_file`.
+                Defaults to 1.0.
+        """
+        self.host = host
+        self.port = port
+        self.stations: list[tuple[str, str]] = []
+        for station in stations:
+            network, _, code = station.partition("_")
+            if not network or not code:
+                raise ValueError(f"station {station!r} is not NET_STA")
+            self.stations.append((network, code))
+        if not self.stations:
+            raise ValueError("no stations to stream")
+        self.selectors = tuple(selectors)
+        self.sequences = SequenceStore(state_file)
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.timeout = timeout
+        self.save_interval = save_interval
+        self._reconnect_attempts = 0
+
+    async def _command(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        command: str,
+    ) -> str:
+        """Send a command and read the line of the response."""
+        writer.write(f"{command}\r\n".encode())
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), self.timeout)
+        if not line:
+            raise ConnectionResetError(f"{self.host} closed the connection")
+        return line.decode(errors="replace").strip()
+
+    async def _handshake(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Select the stations and channels and resume after the last packets."""
+        version = await self._command(reader, writer, "HELLO")
+        organization = await asyncio.wait_for(reader.readline(), self.timeout)
+        logger.info(f"connected to {version} ({organization.decode().strip()})")
+
+        for network, station in self.stations:
+            commands = [f"STATION {station} {network}"]
+            commands.extend(f"SELECT {selector}" for selector in self.selectors)
+            sequence = self.sequences.get(_station_key(network, station))
+            if sequence is None:
+                commands.append("DATA")
+            else:
+                commands.append(f"DATA {(sequence + 1) & MAX_SEQUENCE:06X}")
+            for command in commands:
+                response = await self._command(reader, writer, command)
+                if response != "OK":
+                    raise NoDataError(
+                        f"{self.host} refused {command!r} for "
+                        f"{network}_{station}: {response}"
+                    )
+        writer.write(b"END\r\n")
+        await writer.drain()
+
+    async def _receive(
+        self, reader: asyncio.StreamReader
+    ) -> AsyncIterator[tuple[Optional[int], bytes]]:
+        """Yield the sequence number and the record of every packet."""
+        while True:
+            try:
+                header = await asyncio.wait_for(
+                    reader.readexactly(HEADER_SIZE), self.timeout
+                )
+                record = await reader.readexactly(RECORD_SIZE)
+            except asyncio.IncompleteReadError as e:
+                if e.partial:
+                    raise ConnectionResetError("packet cut short") from e
+                return
+            if header.startswith(INFO_SIGNATURE):
+                continue
+            if not header.startswith(b"SL"):
+                raise CorruptedDataError(f"invalid SeedLink header {header!r}")
+            try:
+                sequence = int(header[2:], 16)
+            except ValueError:
+                sequence = None
+            yield sequence, record
+
+    async def records(self) -> AsyncIterator[MiniSEEDRecord]:
+        """Connect once and yield the decoded records until the server closes.
+
+        A record counts as received once it is yielded. The sequence numbers
+        are saved when the iteration stops, and every `save_interval` seconds
+        meanwhile.
+        """
+        loop = asyncio.get_running_loop()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        saved = loop.time()
+        try:
+            await self._handshake(reader, writer)
+            async for sequence, raw in self._receive(reader):
+                try:
+                    record = decode_record(raw)
+                except CorruptedDataError as e:
+                    logger.warning(f"Skipping packet {sequence} of {self.host}: {e}")
+                    continue
+                if sequence is not None:
+                    self.sequences.update(
+                        _station_key(record.network, record.station), sequence
+                    )
+                if loop.time() - saved >= self.save_interval:
+                    self.sequences.save()
+                    saved = loop.time()
+                yield record
+        finally:
+            self.sequences.save()
+            writer.close()
+
+    def _reconnect_backoff(self) -> float:
+        """Get the jittered exponential delay before the next reconnect attempt."""
+        delay = min(
+            self.max_reconnect_delay,
+            self.reconnect_delay * 2**self._reconnect_attempts,
+        )
+        self._reconnect_attempts += 1
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def start(self) -> AsyncIterator[TraceChunk]:
+        """Stream the selected channels, see `WebsocketHandler.start`.
+
+        Reconnects with a jittered exponential backoff whenever the connection
+        is lost, resuming after the last received packet of every station.
+        """
+        while True:
+            records = self.records()
+            try:
+                async for record in records:
+                    self._reconnect_attempts = 0
+                    yield record.to_chunk()
+                logger.warning("SeedLink connection closed. Trying to reconnect.")
+            except (OSError, asyncio.TimeoutError) as e:
+                logger.warning(f"{e!r}. Trying to reconnect.")
+            except Exception as e:
+                logger.exception(f"{e}")
+            finally:
+                # Save the sequences now, also when the consumer stops early.
+                await records.aclose()
+            await asyncio.sleep(self._reconnect_backoff())
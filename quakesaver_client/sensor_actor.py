@@ -1,31 +1,215 @@
+from __future__ import annotations
+
 import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager
 from ipaddress import IPv4Address
-from typing import Any
+from typing import TYPE_CHECKING, Any, AsyncIterator, Optional
 
 import aiohttp
-from aiohttp import ClientSession
+from aiohttp import ClientSession, ClientWebSocketResponse, WSMsgType
+
+if TYPE_CHECKING:
+    from quakesaver_client.metrics import LatencyHistogram
 
 logger = logging.getLogger(__name__)
 
+SENSOR_PORT = 5533
+
 
 class SensorActor:
-    def __init__(self, ip_address: IPv4Address) -> None:
-        """A SensorActor interfaces a sensor on the local network."""
+    def __init__(
+        self,
+        ip_address: IPv4Address,
+        port: int = SENSOR_PORT,
+        session: Optional[ClientSession] = None,
+        ping_interval: float = 5.0,
+        ping_timeout: float = 1.0,
+    ) -> None:
+        """A SensorActor interfaces a sensor on the local network.
+
+        Used as an async context manager, the actor keeps its session and a
+        control websocket open. Liveness is then checked with ping frames over
+        that websocket every `ping_interval` seconds and their round trip times
+        are recorded in `rtt_histogram`. Otherwise every request sets up its own
+        connection.
+
+        Args:
+            ip_address: Address of the sensor.
+            port: Port of the sensor's HTTP server. Defaults to 5533.
+            session: Session to share, e.g. between many actors. Defaults to a
+                new session per request, or per context when used as a context
+                manager.
+            ping_interval: Seconds between keep-alive pings. Defaults to 5.0.
+            ping_timeout: Seconds to wait for a pong. Defaults to 1.0.
+        """
         self.ip_address = ip_address
+        self.port = port
+        self.session = session
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
 
-    async def ping(self) -> None:
-        """Retrieve state from sensor's websocket."""
+        self.alive = False
+        self.rtt: Optional[float] = None
+        self._rtt_histogram: Optional[LatencyHistogram] = None
+
+        self._owns_session = False
+        self._ws: Optional[ClientWebSocketResponse] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._keepalive: Optional[asyncio.Task] = None
+        self._pongs: dict[bytes, asyncio.Future] = {}
+        self._pings = 0
+
+    @property
+    def rtt_histogram(self) -> LatencyHistogram:
+        """Histogram of the measured round trip times."""
+        if self._rtt_histogram is None:
+            from quakesaver_client.metrics import LatencyHistogram
+
+            self._rtt_histogram = LatencyHistogram()
+        return self._rtt_histogram
+
+    @property
+    def url(self) -> str:
+        """URL of the sensor's HTTP server."""
+        return f"http://{self.ip_address}:{self.port}"
+
+    @property
+    def connected(self) -> bool:
+        """Whether the control websocket is open."""
+        return self._ws is not None and not self._ws.closed
+
+    async def open(self) -> None:
+        """Open the session and the control websocket and start the keep-alive."""
+        if self.session is None or self.session.closed:
+            self.session = ClientSession()
+            self._owns_session = True
+        try:
+            await self._connect()
+        except BaseException:
+            await self.close()
+            raise
+        self._keepalive = asyncio.get_running_loop().create_task(self._keep_alive())
+
+    async def close(self) -> None:
+        """Stop the keep-alive and close the control websocket and own session."""
+        for task in (self._keepalive, self._reader):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._keepalive = self._reader = None
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+            self._owns_session = False
+        self.alive = False
+
+    async def __aenter__(self) -> "SensorActor":
+        """Open the actor, see `open`."""
+        await self.open()
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        """Close the actor, see `close`."""
+        await self.close()
+
+    @asynccontextmanager
+    async def _get_session(self) -> AsyncIterator[ClientSession]:
+        if self.session is not None:
+            yield self.session
+            return
         async with ClientSession() as session:
-            async with session.ws_connect(f"http://{self.ip_address}:5533/ws") as ws:
-                await ws.ping()
-                await ws.close()
+            yield session
+
+    async def _connect(self) -> None:
+        """Open the control websocket and start reading from it."""
+        self._ws = await self.session.ws_connect(f"{self.url}/ws", autoping=False)
+        self._reader = asyncio.get_running_loop().create_task(self._read(self._ws))
+
+    async def _read(self, ws: ClientWebSocketResponse) -> None:
+        """Answer pings and resolve pongs of the control websocket until closed."""
+        loop = asyncio.get_running_loop()
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.PING:
+                    await ws.pong(msg.data)
+                elif msg.type == WSMsgType.PONG:
+                    pong = self._pongs.pop(msg.data, None)
+                    if pong is not None and not pong.done():
+                        pong.set_result(loop.time())
+        finally:
+            self.alive = False
+            for pong in self._pongs.values():
+                if not pong.done():
+                    pong.set_exception(ConnectionError("control websocket closed"))
+            self._pongs.clear()
+
+    async def _keep_alive(self) -> None:
+        """Ping the sensor periodically and reconnect the control websocket."""
+        while True:
+            if not self.connected:
+                try:
+                    await self._connect()
+                except (aiohttp.ClientError, OSError) as e:
+                    logger.debug(f"Cannot connect to {self.ip_address}: {e}")
+                    self.alive = False
+            if self.connected:
+                await self.is_alive()
+            await asyncio.sleep(self.ping_interval)
+
+    async def ping(self) -> float:
+        """Measure the round trip time of a websocket ping.
+
+        The control websocket is used if it is open. Otherwise a websocket is
+        opened for this single ping.
+
+        Returns:
+            float: The round trip time in seconds.
+        """
+        loop = asyncio.get_running_loop()
+        if self.connected:
+            self._pings += 1
+            payload = self._pings.to_bytes(8, "big")
+            pong = self._pongs[payload] = loop.create_future()
+            started = loop.time()
+            try:
+                await self._ws.ping(payload)
+                rtt = await pong - started
+            finally:
+                self._pongs.pop(payload, None)
+        else:
+            async with self._get_session() as session:
+                async with session.ws_connect(f"{self.url}/ws", autoping=False) as ws:
+                    started = time.perf_counter()
+                    await ws.ping()
+                    msg = await ws.receive()
+                    while msg.type != WSMsgType.PONG:
+                        if msg.type in (
+                            WSMsgType.CLOSE,
+                            WSMsgType.CLOSED,
+                            WSMsgType.ERROR,
+                        ):
+                            raise ConnectionError("websocket closed before pong")
+                        msg = await ws.receive()
+                    rtt = time.perf_counter() - started
+                    await ws.close()
+
+        self.rtt = rtt
+        self.rtt_histogram.record(rtt)
+        return rtt
 
     async def get_state(self) -> Any:
         """Retrieve state from sensor's websocket."""
-        async with ClientSession() as session:
-            response = await session.get(f"http://{self.ip_address}:5533/state")
-            return await response.json()
+        async with self._get_session() as session:
+            async with session.get(f"{self.url}/state") as response:
+                return await response.json()
 
     async def is_alive(self) -> bool:
         """Check if sensor is alive.
@@ -34,13 +218,15 @@ class SensorActor:
             bool: Alive state.
         """
         try:
-            await asyncio.wait_for(self.ping(), timeout=1.0)
-            return True
+            await asyncio.wait_for(self.ping(), timeout=self.ping_timeout)
+            self.alive = True
         except aiohttp.client_exceptions.ClientConnectorError as e:
             logger.debug(e)
-        except TimeoutError as e:
+            self.alive = False
+        except (TimeoutError, asyncio.TimeoutError) as e:
             logger.info(e)
-            return False
+            self.alive = False
         except Exception as e:
             logger.debug(e)
-            return False
+            self.alive = False
+        return self.alive
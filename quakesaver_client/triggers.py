@@ -0,0 +1,180 @@
+"""Streaming event triggers on live waveform data."""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from pydantic import BaseModel
+from scipy.signal import lfilter
+
+from quakesaver_client.client_websocket import TraceChunk, _datetime
+from quakesaver_client.models.sensor_state import STALTAConfig
+
+logger = logging.getLogger(__name__)
+
+
+class TriggerEvent(BaseModel):
+    """A trigger switching on or off on a single channel."""
+
+    uid: Optional[str]
+    channel: str
+    time: datetime
+    triggered: bool
+    ratio: float
+
+
+class _STALTAChannelState:
+    """Filter and trigger state of a single channel."""
+
+    __slots__ = ("sta", "lta", "nsamples", "triggered")
+
+    def __init__(self) -> None:
+        self.sta = np.zeros(1)
+        self.lta = np.zeros(1)
+        self.nsamples = 0
+        self.triggered = False
+
+
+class RecursiveSTALTA:
+    """Recursive STA/LTA trigger which keeps its filter state across chunks.
+
+    The short and long term averages of the squared signal are first order IIR
+    filters. Each chunk is filtered as a whole with the filter state of the
+    previous chunk, so results do not depend on how the stream was chunked.
+    Triggers switch on when the ratio exceeds `trigger_threshold` and off when it
+    falls below `detrigger_threshold`.
+    """
+
+    def __init__(
+        self,
+        nsta: int = 50,
+        nlta: int = 300,
+        trigger_threshold: float = 1.2,
+        detrigger_threshold: float | None = None,
+    ) -> None:
+        """Initialize `RecursiveSTALTA`.
+
+        Args:
+            nsta: Length of the short term average in samples. Defaults to 50.
+            nlta: Length of the long term average in samples. Defaults to 300.
+            trigger_threshold: Ratio above which a trigger switches on.
+                Defaults to 1.2.
+            detrigger_threshold: Ratio below which a trigger switches off.
+                Defaults to `trigger_threshold`.
+        """
+        if nsta >= nlta:
+            raise ValueError("nsta has to be shorter than nlta")
+        self.nsta = nsta
+        self.nlta = nlta
+        self.trigger_threshold = trigger_threshold
+        self.detrigger_threshold = (
+            trigger_threshold if detrigger_threshold is None else detrigger_threshold
+        )
+
+        csta = 1.0 / nsta
+        clta = 1.0 / nlta
+        self._sta_coefficients = (np.array([csta]), np.array([1.0, csta - 1.0]))
+        self._lta_coefficients = (np.array([clta]), np.array([1.0, clta - 1.0]))
+        self._channels: dict[tuple[Optional[str], str], _STALTAChannelState] = {}
+
+    @classmethod
+    def from_config(
+        cls, config: STALTAConfig, detrigger_threshold: float | None = None
+    ) -> RecursiveSTALTA:
+        """Create a trigger with the parameters a sensor uses.
+
+        `overlap_percent` has no meaning for the recursive filter and is ignored.
+
+        Args:
+            config: The `STALTAState.config` of a sensor.
+            detrigger_threshold: Ratio below which a trigger switches off.
+                Defaults to `config.trigger_threshold`.
+
+        Returns:
+            RecursiveSTALTA: The configured trigger.
+        """
+        return cls(
+            nsta=config.nsta,
+            nlta=config.nlta,
+            trigger_threshold=config.trigger_threshold,
+            detrigger_threshold=detrigger_threshold,
+        )
+
+    def characteristic_function(
+        self, key: tuple[Optional[str], str], data: np.ndarray
+    ) -> np.ndarray:
+        """Compute the STA/LTA ratio of a chunk and advance the channel state.
+
+        The ratio is zero until `nlta` samples of the channel were processed.
+
+        Args:
+            key: The (uid, channel) the chunk belongs to.
+            data: The samples of the chunk.
+
+        Returns:
+            np.ndarray: The STA/LTA ratio for every sample.
+        """
+        state = self._channels.get(key)
+        if state is None:
+            state = self._channels[key] = _STALTAChannelState()
+
+        energy = np.square(data, dtype=np.float64)
+        sta, state.sta = lfilter(*self._sta_coefficients, energy, zi=state.sta)
+        lta, state.lta = lfilter(*self._lta_coefficients, energy, zi=state.lta)
+
+        ratio = np.divide(sta, lta, out=np.zeros_like(sta), where=lta > 0.0)
+        warmup = self.nlta - state.nsamples
+        if warmup > 0:
+            ratio[:warmup] = 0.0
+        state.nsamples += data.size
+        return ratio
+
+    def process(self, trace: TraceChunk) -> list[TriggerEvent]:
+        """Process all channels of a chunk.
+
+        Args:
+            trace: A decoded chunk as yielded by `WebsocketHandler.start`.
+
+        Returns:
+            list[TriggerEvent]: Triggers switching on or off within the chunk.
+        """
+        events = []
+        starttime = trace.tmin
+        for channel, data in zip(trace.channels, trace.array):
+            key = (trace.uid, channel)
+            ratio = self.characteristic_function(key, data)
+            for index, triggered in self._edges(self._channels[key], ratio):
+                events.append(
+                    TriggerEvent(
+                        uid=trace.uid,
+                        channel=channel,
+                        time=_datetime(starttime + trace.delta_t * index),
+                        triggered=triggered,
+                        ratio=ratio[index],
+                    )
+                )
+        for event in events:
+            logger.debug(f"trigger {event}")
+        return events
+
+    def _edges(
+        self, state: _STALTAChannelState, ratio: np.ndarray
+    ) -> list[tuple[int, bool]]:
+        """Find the samples at which the trigger state of a channel changes."""
+        above = ratio > self.trigger_threshold
+        below = ratio < self.detrigger_threshold
+        edges = []
+        position = 0
+        while position < ratio.size:
+            candidates = below if state.triggered else above
+            index = int(np.argmax(candidates[position:]))
+            if not candidates[position + index]:
+                break
+            position += index
+            state.triggered = not state.triggered
+            edges.append((position, state.triggered))
+            position += 1
+        return edges
@@ -1,4 +1,19 @@
+import base64
+import gzip
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Awaitable, Callable, Iterator, Optional
+
 import pytest
+from aiohttp import web
+
+from quakesaver_client import QSCloudClient
+from quakesaver_client.models import sensor_state
+from quakesaver_client.models.lazy_state import MODULE_FIELDS
+from quakesaver_client.models.local_sensor import LocalSensor
+from quakesaver_client.models.sensor_state import SensorState
 
 
 def pytest_addoption(parser) -> None:
@@ -8,16 +23,233 @@ def pytest_addoption(parser) -> None:
         default=False,
         help="run tests that connect to local sensor",
     )
+    parser.addoption(
+        "--runbenchmark",
+        action="store_true",
+        default=False,
+        help="run timing benchmarks",
+    )
 
 
 def pytest_configure(config) -> None:
     config.addinivalue_line("markers", "local: mark test as dependent on local sensor")
+    config.addinivalue_line("markers", "benchmark: mark test as timing benchmark")
 
 
 def pytest_collection_modifyitems(config, items):
-    if config.getoption("--runlocal"):
-        return
-    skip_local = pytest.mark.skip(reason="need --runlocal option to run")
-    for item in items:
-        if "local" in item.keywords:
-            item.add_marker(skip_local)
+    for marker, option in (("local", "--runlocal"), ("benchmark", "--runbenchmark")):
+        if config.getoption(option):
+            continue
+        skip = pytest.mark.skip(reason=f"need {option} option to run")
+        for item in items:
+            if marker in item.keywords:
+                item.add_marker(skip)
+
+
+@pytest.fixture
+def make_payload() -> Callable[..., dict]:
+    """Get a factory of waveform payloads as sent by the sensor websocket."""
+
+    def make(data: dict, compressed: bool = False) -> dict:
+        encode = gzip.compress if compressed else bytes
+        return {
+            "uid": "TEST",
+            "endtime": "2023-03-07T09:00:01Z",
+            "delta_t": 0.01,
+            "data": {
+                channel: base64.b64encode(encode(samples.tobytes())).decode()
+                for channel, samples in data.items()
+            },
+            "data_unit": "counts",
+            "compressed": compressed,
+        }
+
+    return make
+
+
+@pytest.fixture
+def stand_in_sensor() -> Callable[..., Awaitable[web.AppRunner]]:
+    """Get a factory of stand-in sensors serving a state and a websocket.
+
+    The returned runner has to be cleaned up by the test.
+    """
+
+    async def start(
+        requests: Optional[list] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        state: object = None,
+    ) -> web.AppRunner:
+        if state is None:
+            state = {"uid": "TEST", "software_version": "1.2.3"}
+        websockets = set()
+
+        async def websocket(request: web.Request) -> web.WebSocketResponse:
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            websockets.add(ws)
+            async for _ in ws:
+                pass
+            websockets.discard(ws)
+            return ws
+
+        async def get_state(request: web.Request) -> web.Response:
+            return web.json_response(state)
+
+        @web.middleware
+        async def log_request(request: web.Request, handler):
+            if requests is not None:
+                requests.append(request.path)
+            return await handler(request)
+
+        async def close_websockets(app: web.Application) -> None:
+            for ws in set(websockets):
+                await ws.close()
+
+        app = web.Application(middlewares=[log_request])
+        app.router.add_get("/ws", websocket)
+        app.router.add_get("/state", get_state)
+        app.on_shutdown.append(close_websockets)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+    return start
+
+
+@pytest.fixture
+def stand_in_fleet() -> Callable[..., Awaitable[web.AppRunner]]:
+    """Get a factory of stand-in sensors serving `state`, which may change.
+
+    The returned runner has to be cleaned up by the test.
+    """
+
+    async def start(state: object) -> web.AppRunner:
+        async def handler(request: web.Request) -> web.Response:
+            return web.json_response(state)
+
+        app = web.Application()
+        app.router.add_get("/state", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        return runner
+
+    return start
+
+
+@pytest.fixture
+def state_payload() -> dict:
+    """Get a full sensor state, made of the module defaults recorded from a sensor."""
+    state = {"uid": "TEST", "software_version": "1.2.3"}
+    for name in MODULE_FIELDS:
+        model = SensorState.__fields__[name].type_
+        if model is sensor_state.RingbufferState:
+            module = model(window="hann", window_size=1024, filter_length=64)
+        else:
+            module = model()
+        state[name] = json.loads(module.json())
+    return state
+
+
+QUERY_RESULT = {"count": 0, "ttl_seconds": 60, "limit": 100, "skip": 0}
+
+
+class StandInLocalSensor(BaseHTTPRequestHandler):
+    """Serves the sensor state, data products and measurements.
+
+    Requests and client addresses are recorded on the server.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one segment, the client keeps the connection.
+    wbufsize = -1
+
+    def log_message(self, *args) -> None:
+        """Keep the test output free of access logs."""
+
+    def reply(self, payload) -> None:
+        """Send `payload` as JSON response."""
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        """Answer every GET request with the sensor state."""
+        self.server.connections.add(self.client_address)
+        self.server.requests.append(self.path)
+        self.reply(self.server.state)
+
+    def do_POST(self) -> None:
+        """Answer data product and measurement queries."""
+        self.server.connections.add(self.client_address)
+        self.server.requests.append(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.startswith("/data_products/"):
+            name = self.path.split("/")[2].split("?")[0]
+            if name == "HVSpectra":
+                self.reply({"count": 1})
+            else:
+                self.reply(
+                    {**QUERY_RESULT, "query_time_seconds": 0.1, "data_products": []}
+                )
+        elif self.path == "/measurements":
+            query = json.loads(body)
+            self.reply(
+                {
+                    "sensor_uid": "TEST",
+                    "query_time_seconds": 0.1,
+                    "query": query,
+                    "data": {"times": [query["start_time"]], "values": [1.5]},
+                }
+            )
+        else:
+            self.send_error(404)
+
+
+@pytest.fixture
+def local_sensor_server(state_payload: dict) -> Iterator[ThreadingHTTPServer]:
+    """Run a stand-in local sensor HTTP server."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInLocalSensor)
+    server.state = state_payload
+    server.requests = []
+    server.connections = set()
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def local_sensor(local_sensor_server: ThreadingHTTPServer) -> Iterator[LocalSensor]:
+    """Get a local sensor connected to the stand-in server."""
+    sensor = LocalSensor.connect(f"127.0.0.1:{local_sensor_server.server_address[1]}")
+    yield sensor
+    sensor.close()
+
+
+@pytest.fixture
+def client() -> QSCloudClient:
+    """Get a set-up client."""
+    email = os.environ.get("TEST_CLIENT_EMAIL")
+    password = os.environ.get("TEST_CLIENT_PASSWORD")
+    base_domain = os.environ.get("TEST_CLIENT_DOMAIN")
+    if any([email is None, password is None, base_domain is None]):
+        raise Exception(
+            "TEST_CLIENT_EMAIL, TEST_CLIENT_PASSWORD, TEST_CLIENT_DOMAIN "
+            "environment variables required."
+        )
+
+    client = QSCloudClient(
+        email,
+        password,
+        base_domain,
+    )
+    yield client
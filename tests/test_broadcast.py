@@ -0,0 +1,116 @@
+"""Websocket broadcast tests."""
+
+import asyncio
+
+import numpy as np
+
+from quakesaver_client import broadcast as broadcast_module
+from quakesaver_client.broadcast import WaveformBroadcast, get_broadcast
+from quakesaver_client.client_websocket import TraceChunk
+
+
+class FakeHandler:
+    """Upstream yielding a fixed number of chunks."""
+
+    reuse_buffers = False
+
+    def __init__(self, nchunks: int) -> None:
+        """Initialize `FakeHandler` yielding `nchunks` chunks."""
+        self.nchunks = nchunks
+        self.started = 0
+
+    async def start(self):
+        """Count the start and yield the chunks."""
+        self.started += 1
+        for ichunk in range(self.nchunks):
+            yield object() if ichunk else ichunk
+            await asyncio.sleep(0)
+
+
+async def test_subscribers_share_upstream_and_chunks() -> None:
+    handler = FakeHandler(nchunks=20)
+    broadcast = WaveformBroadcast(handler)
+    first = broadcast.subscribe(maxsize=100)
+    second = broadcast.subscribe(maxsize=100)
+
+    received_first = [chunk async for chunk in first]
+    received_second = [chunk async for chunk in second]
+
+    assert handler.started == 1
+    assert len(received_first) == 20
+    assert all(a is b for a, b in zip(received_first, received_second))
+
+
+async def test_chunks_of_reused_buffers_are_copied() -> None:
+    class ReusingHandler(FakeHandler):
+        reuse_buffers = True
+
+        async def start(self):
+            """Yield the same chunk, overwriting its samples every time."""
+            chunk = TraceChunk("TEST", ("HHZ",), np.zeros((1, 10)), 1.0, 0.1)
+            for ichunk in range(self.nchunks):
+                chunk.array[:] = ichunk
+                yield chunk
+                await asyncio.sleep(0)
+
+    broadcast = WaveformBroadcast(ReusingHandler(nchunks=5))
+    subscription = broadcast.subscribe(maxsize=10)
+    await asyncio.sleep(0.05)
+    received = [chunk async for chunk in subscription]
+    assert [chunk.array[0, 0] for chunk in received] == [0, 1, 2, 3, 4]
+
+
+async def test_drop_oldest_and_block() -> None:
+    broadcast = WaveformBroadcast(FakeHandler(nchunks=50))
+    dropping = broadcast.subscribe(maxsize=5, overflow="drop_oldest")
+    blocking = broadcast.subscribe(maxsize=5, overflow="block")
+
+    received_blocking = [chunk async for chunk in blocking]
+    received_dropping = [chunk async for chunk in dropping]
+
+    assert len(received_blocking) == 50
+    assert blocking.dropped == 0
+    assert dropping.dropped > 0
+    assert len(received_dropping) + dropping.dropped == 50
+    assert received_dropping[-1] is received_blocking[-1]
+
+
+async def test_last_unsubscribe_stops_upstream() -> None:
+    broadcast = WaveformBroadcast(FakeHandler(nchunks=10**6))
+    async with broadcast.subscribe() as subscription:
+        await subscription.__anext__()
+        assert broadcast.subscribers == 1
+    assert broadcast.subscribers == 0
+    assert broadcast._task is None
+
+
+async def test_blocked_subscriber_unsubscribing_releases_upstream() -> None:
+    broadcast = WaveformBroadcast(FakeHandler(nchunks=50))
+    blocking = broadcast.subscribe(maxsize=1, overflow="block")
+    other = broadcast.subscribe(maxsize=100)
+
+    # The pump blocks on the full queue of `blocking` after the first chunk.
+    first = await other.__anext__()
+    await asyncio.sleep(0.01)
+    await blocking.close()
+    rest = await asyncio.wait_for(_collect(other), timeout=5)
+
+    assert len(rest) + 1 == 50 and first == 0
+    assert [chunk async for chunk in blocking] == []
+    assert broadcast.subscribers == 1
+
+
+async def _collect(subscription) -> list:
+    return [chunk async for chunk in subscription]
+
+
+def test_get_broadcast_is_shared_per_event_loop() -> None:
+    async def get_twice():
+        return get_broadcast("sensor.test"), get_broadcast("sensor.test")
+
+    first, same = asyncio.run(get_twice())
+    second, _ = asyncio.run(get_twice())
+
+    assert first is same
+    assert second is not first
+    assert len(broadcast_module._broadcasts) == 1
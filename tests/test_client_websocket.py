@@ -0,0 +1,211 @@
+"""Websocket handler tests."""
+
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+import numpy as np
+import pytest
+from obspy import Stream, Trace, UTCDateTime
+
+from quakesaver_client.client_websocket import (
+    TraceChunk,
+    TraceDecoder,
+    TraceModel,
+    WebsocketHandler,
+    batch_chunks,
+)
+from quakesaver_client.errors import CorruptedDataError
+from quakesaver_client.metrics import StreamMetrics
+from quakesaver_client.models.data_products import DataUnit
+
+T0 = datetime(2023, 3, 7, 9, 0, 0, tzinfo=timezone.utc)
+DELTA_T = 0.01
+
+
+def make_trace(start: datetime, npts: int, channels=("HHZ", "HHN")) -> TraceChunk:
+    return TraceChunk(
+        uid="TEST",
+        channels=channels,
+        array=np.tile(np.arange(npts, dtype=np.int32), (len(channels), 1)),
+        tmax=start.timestamp() + npts * DELTA_T,
+        delta_t=DELTA_T,
+    )
+
+
+def test_decoder_decodes_channels_into_one_array(make_payload: Callable) -> None:
+    data = {
+        "HHZ": np.arange(100, dtype=np.int32),
+        "HHN": -np.arange(100, dtype=np.int32),
+    }
+    for compressed in (False, True):
+        chunk = TraceDecoder().decode(make_payload(data, compressed))
+        assert chunk.channels == ("HHZ", "HHN")
+        assert chunk.array.shape == (2, 100)
+        assert chunk.endtime == T0 + timedelta(seconds=1)
+        assert chunk.tmin == pytest.approx(T0.timestamp())
+        np.testing.assert_array_equal(chunk.data["HHN"], data["HHN"])
+        assert chunk.as_stream()[0].stats.starttime == UTCDateTime(T0)
+
+
+def test_trace_model_as_stream(make_payload: Callable) -> None:
+    data = np.arange(100, dtype=np.int32)
+    for compressed in (False, True):
+        model = TraceModel.parse_obj(make_payload({"HHZ": data}, compressed))
+        (trace,) = model.as_stream()
+        assert trace.stats.starttime == UTCDateTime(T0)
+        np.testing.assert_array_equal(trace.data, data)
+
+
+def test_decoder_reuses_buffers(make_payload: Callable) -> None:
+    decoder = TraceDecoder(reuse_buffers=True)
+    payload = make_payload({"HHZ": np.arange(100, dtype=np.int32)})
+    first = decoder.decode(payload).array
+    assert decoder.decode(payload).array is first
+    assert TraceDecoder().decode(payload).array is not first
+
+
+def test_decoder_rejects_invalid_payload() -> None:
+    with pytest.raises(CorruptedDataError):
+        TraceDecoder().decode({"data": {"HHZ": "AAA="}})
+
+
+async def test_corrupted_frame_is_skipped(make_payload: Callable) -> None:
+    good = json.dumps(
+        {"payload": make_payload({"HHZ": np.arange(100, dtype=np.int32)})}
+    )
+    corrupted = json.dumps({"payload": {"uid": "TEST", "data": {"HHZ": "AAA="}}})
+
+    malformed = ("[]", "null", '"payload"', "{not json")
+
+    class StandInHandler(WebsocketHandler):
+        async def _receive(self, session):
+            """Yield corrupted and malformed frames between two valid ones."""
+            for frame in (good, corrupted, *malformed, good):
+                yield frame
+
+    metrics = StreamMetrics()
+    handler = StandInHandler(metrics=metrics)
+    traces = [trace async for trace in handler.create_websocket(None)]
+
+    assert len(traces) == 2
+    snapshot = metrics.snapshot()["TEST"]
+    assert (snapshot["messages"], snapshot["corrupted"]) == (2, 1)
+
+
+def test_decoder_decodes_subscribed_channels_only(make_payload: Callable) -> None:
+    payload = make_payload({"HHZ": np.arange(100, dtype=np.int32)})
+    payload["data"]["HHN"] = "not base64"
+    chunk = TraceDecoder(channels=("??Z",)).decode(payload)
+    assert chunk.channels == ("HHZ",)
+    np.testing.assert_array_equal(chunk.data["HHZ"], np.arange(100))
+
+    chunk = TraceDecoder(channels=("HHE",)).decode(payload)
+    assert chunk.channels == ()
+
+
+def test_decoder_float32_mode(make_payload: Callable) -> None:
+    data = {"HNZ": np.linspace(-1.0, 1.0, 100)}
+    payload = make_payload(data)
+    payload["data_unit"] = "m/s2"
+    assert TraceDecoder().decode(payload).array.dtype == np.float64
+
+    chunk = TraceDecoder(float_dtype=np.float32).decode(payload)
+    assert chunk.array.dtype == np.float32
+    np.testing.assert_allclose(chunk.data["HNZ"], data["HNZ"], rtol=1e-7)
+
+    payload = make_payload({"HNZ": np.arange(100, dtype=np.int32)})
+    assert TraceDecoder(float_dtype=np.float32).decode(payload).array.dtype == np.int32
+    with pytest.raises(ValueError):
+        TraceDecoder(float_dtype=np.int16)
+
+
+def test_reconnect_backoff_is_capped() -> None:
+    handler = WebsocketHandler(reconnect_delay=1.0, max_reconnect_delay=8.0)
+    delays = [handler._reconnect_backoff() for _ in range(10)]
+    assert 0.5 <= delays[0] <= 1.0
+    assert all(delay <= 8.0 for delay in delays)
+    assert delays[-1] >= 4.0
+
+
+async def test_backfill_splices_gap() -> None:
+    handler = WebsocketHandler()
+    handler._track(make_trace(T0, 100))
+
+    gap_start = T0 + timedelta(seconds=1)
+    after_gap = make_trace(gap_start + timedelta(seconds=2), 100)
+
+    def request_backfill(starttime: float, endtime: float) -> Stream:
+        assert starttime == gap_start.timestamp()
+        traces = []
+        for channel in ("HHZ", "HHN"):
+            trace = Trace(np.arange(400, dtype=np.int32))
+            trace.stats.channel = channel
+            trace.stats.delta = DELTA_T
+            trace.stats.starttime = UTCDateTime(T0)
+            traces.append(trace)
+        return Stream(traces)
+
+    handler._request_backfill = request_backfill
+    backfilled = await handler._backfill(after_gap)
+
+    assert len(backfilled) == 1
+    chunk = backfilled[0]
+    assert chunk.endtime == after_gap.endtime - timedelta(seconds=1)
+    for channel in ("HHZ", "HHN"):
+        np.testing.assert_array_equal(chunk.data[channel], np.arange(100, 300))
+
+
+async def test_backfill_skips_archive_in_other_unit() -> None:
+    handler = WebsocketHandler()
+    handler._track(make_trace(T0, 100))
+    after_gap = make_trace(T0 + timedelta(seconds=3), 100)
+    after_gap.data_unit = DataUnit.m_s2
+    after_gap.array = after_gap.array.astype(np.float64)
+
+    def request_backfill(starttime: float, endtime: float) -> Stream:
+        trace = Trace(np.arange(400, dtype=np.int32))
+        trace.stats.channel = "HHZ"
+        trace.stats.delta = DELTA_T
+        trace.stats.starttime = UTCDateTime(T0)
+        return Stream([trace])
+
+    handler._request_backfill = request_backfill
+    assert await handler._backfill(after_gap) == []
+
+
+async def test_no_backfill_without_gap() -> None:
+    handler = WebsocketHandler()
+    handler._track(make_trace(T0, 100))
+    assert await handler._backfill(make_trace(T0 + timedelta(seconds=1), 100)) == []
+
+
+async def stream(chunks, pause_after=None, pause=0.0):
+    for i, chunk in enumerate(chunks):
+        if i == pause_after:
+            await asyncio.sleep(pause)
+        yield chunk
+
+
+async def test_batches_join_contiguous_chunks() -> None:
+    chunks = [make_trace(T0 + timedelta(seconds=i), 100) for i in range(7)]
+    batches = [b async for b in batch_chunks(stream(chunks), max_messages=3)]
+
+    assert [b.nsamples for b in batches] == [300, 300, 100]
+    assert batches[0].tmin == pytest.approx(T0.timestamp())
+    assert batches[-1].tmax == chunks[-1].tmax
+    np.testing.assert_array_equal(
+        batches[1].array, np.concatenate([c.array for c in chunks[3:6]], axis=1)
+    )
+
+
+async def test_batches_split_at_gaps_and_timeouts() -> None:
+    chunks = [make_trace(T0 + timedelta(seconds=i), 100) for i in (0, 1, 3, 4, 5)]
+    batches = [
+        b
+        async for b in batch_chunks(
+            stream(chunks, pause_after=4, pause=0.3), max_seconds=0.1
+        )
+    ]
+    assert [b.nsamples for b in batches] == [200, 200, 100]
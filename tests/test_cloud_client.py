@@ -1,6 +1,6 @@
 """Tests for the QuakeSaver client."""
+
 import logging
-import os
 from datetime import datetime, timedelta
 from pathlib import PosixPath
 
@@ -14,26 +14,6 @@ from quakesaver_client.models.measurement import (
 )
 
 
-@pytest.fixture
-def client() -> QSCloudClient:
-    email = os.environ.get("TEST_CLIENT_EMAIL")
-    password = os.environ.get("TEST_CLIENT_PASSWORD")
-    base_domain = os.environ.get("TEST_CLIENT_DOMAIN")
-    if any([email is None, password is None, base_domain is None]):
-        raise Exception(
-            "TEST_CLIENT_EMAIL, TEST_CLIENT_PASSWORD, TEST_CLIENT_DOMAIN "
-            "environment variables required."
-        )
-
-    """Get a set-up client."""
-    client = QSCloudClient(
-        email,
-        password,
-        base_domain,
-    )
-    yield client
-
-
 @pytest.fixture
 def sensor(client: QSCloudClient) -> CloudSensor:
     """Get the first available sensor."""
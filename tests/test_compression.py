@@ -0,0 +1,79 @@
+"""Websocket compression tests and benchmark against a stand-in sensor."""
+
+import json
+import logging
+from typing import Callable
+
+import aiohttp
+import numpy as np
+import pytest
+from aiohttp import web
+
+from quakesaver_client.client_websocket import WebsocketHandler
+from quakesaver_client.metrics import CompressionStats
+
+logger = logging.getLogger(__name__)
+
+
+def make_frames(
+    make_payload: Callable, sampling_rate: int, nframes: int = 100, seconds: float = 0.1
+) -> list:
+    rng = np.random.default_rng(0)
+    nsamples = int(sampling_rate * seconds)
+    frames = []
+    for _ in range(nframes):
+        data = {
+            channel: rng.normal(0, 1000, nsamples).astype(np.int32)
+            for channel in ("HNZ", "HNN", "HNE")
+        }
+        frames.append(json.dumps({"payload": make_payload(data)}))
+    return frames
+
+
+async def stand_in_sensor(frames: list) -> web.AppRunner:
+    async def websocket(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.receive()
+        for frame in frames:
+            await ws.send_str(frame)
+        await ws.close()
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/ws", websocket)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+async def receive(runner: web.AppRunner, compress: int) -> CompressionStats:
+    port = runner.addresses[0][1]
+    stats = CompressionStats()
+    handler = WebsocketHandler(
+        url=f"127.0.0.1:{port}", compress=compress, compression_stats=stats
+    )
+    async with aiohttp.ClientSession() as session:
+        chunks = [chunk async for chunk in handler.create_websocket(session)]
+    assert len(chunks) == stats.frames
+    return stats
+
+
+@pytest.mark.parametrize("sampling_rate", [100, 200, 1000])
+async def test_compression_benchmark(make_payload: Callable, sampling_rate) -> None:
+    frames = make_frames(make_payload, sampling_rate)
+    runner = await stand_in_sensor(frames)
+    try:
+        plain = await receive(runner, compress=0)
+        deflate = await receive(runner, compress=15)
+    finally:
+        await runner.cleanup()
+
+    assert plain.compress == 0
+    assert deflate.compress == 15
+    assert plain.raw_bytes == deflate.raw_bytes == sum(len(f) for f in frames)
+    assert plain.wire_bytes >= plain.raw_bytes
+    assert deflate.wire_bytes < plain.wire_bytes
+    for name, stats in (("plain", plain), ("deflate", deflate)):
+        logger.info(f"{sampling_rate} Hz {name}: {stats.snapshot()}")
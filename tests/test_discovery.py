@@ -0,0 +1,62 @@
+"""LAN discovery tests."""
+
+import time
+from typing import Callable
+
+import pytest
+
+from quakesaver_client import discovery
+from quakesaver_client.discovery import discover, max_concurrency, tcp_probe
+
+
+async def test_discover_streams_sensors(stand_in_sensor: Callable) -> None:
+    runner = await stand_in_sensor()
+    port = runner.addresses[0][1]
+    try:
+        assert await tcp_probe("127.0.0.1", port, timeout=0.3)
+        assert not await tcp_probe("127.0.0.2", port, timeout=0.3)
+
+        started = time.monotonic()
+        hosts = ["127.0.0.1"] + [
+            f"127.0.{i}.{j}" for i in range(1, 5) for j in range(255)
+        ]
+        sensors = [sensor async for sensor in discover(hosts, port=port)]
+        assert time.monotonic() - started < 5.0
+    finally:
+        await runner.cleanup()
+
+    assert len(sensors) == 1
+    assert sensors[0].uid == "TEST"
+    assert str(sensors[0].ip_address) == "127.0.0.1"
+    assert sensors[0].software_version == "1.2.3"
+
+
+async def test_discover_skips_malformed_hosts(stand_in_sensor: Callable) -> None:
+    malformed = await stand_in_sensor(host="127.0.0.2", state=["TEST"])
+    port = malformed.addresses[0][1]
+    runner = await stand_in_sensor(port=port)
+    try:
+        hosts = ["127.0.0.2", "127.0.0.1", "127.0.0.3"]
+        sensors = [sensor async for sensor in discover(hosts, port=port)]
+    finally:
+        await runner.cleanup()
+        await malformed.cleanup()
+
+    assert [str(sensor.ip_address) for sensor in sensors] == ["127.0.0.1"]
+
+
+@pytest.mark.skipif(discovery.resource is None, reason="needs the resource module")
+async def test_discover_stays_below_open_file_limit(
+    stand_in_sensor: Callable, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(discovery.resource, "getrlimit", lambda _: (100, 100))
+    assert max_concurrency() == 100 - discovery.RESERVED_FILES
+
+    runner = await stand_in_sensor()
+    port = runner.addresses[0][1]
+    try:
+        hosts = ["127.0.0.1"] + [f"127.0.1.{j}" for j in range(255)]
+        sensors = [sensor async for sensor in discover(hosts, port=port)]
+    finally:
+        await runner.cleanup()
+    assert [sensor.uid for sensor in sensors] == ["TEST"]
@@ -0,0 +1,181 @@
+"""Tests for the parallel bulk download of cloud sensors."""
+
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from quakesaver_client.fetch import BulkFetcher, FetchStatus
+from quakesaver_client.models.measurement import (
+    InfluxData,
+    MeasurementQuery,
+    MeasurementQueryFull,
+    MeasurementResult,
+)
+
+START = datetime(2023, 1, 1)
+END = datetime(2023, 1, 1, 1)
+
+
+class StandInSensor:
+    """A cloud sensor writing fixed files instead of downloading them."""
+
+    def __init__(self, client: "StandInClient", uid: str) -> None:
+        """Initialize `StandInSensor` of sensor `uid` belonging to `client`."""
+        self.client = client
+        self.uid = uid
+
+    def _write(self, location_to_store: Path, name: str) -> Path:
+        self.client.enter()
+        try:
+            if self.uid in self.client.broken:
+                raise ConnectionError("sensor unreachable")
+            path = location_to_store / name
+            path.write_bytes(b"\0" * 1000)
+            return path
+        finally:
+            self.client.leave()
+
+    def get_waveform_data(self, start_time, end_time, location_to_store) -> Path:
+        """Write a fixed MiniSEED file."""
+        return self._write(location_to_store, f"{self.uid}.mseed")
+
+    def get_stationxml(self, start_time, end_time, location_to_store) -> Path:
+        """Write a fixed StationXML file."""
+        return self._write(location_to_store, f"{self.uid}.xml")
+
+    def get_peak_horizontal_acceleration(
+        self, query: MeasurementQuery
+    ) -> MeasurementResult:
+        """Get a single PGA value at the start of the query."""
+        return MeasurementResult(
+            sensor_uid=self.uid,
+            query_time_seconds=0.1,
+            query=MeasurementQueryFull(
+                start_time=query.start_time,
+                end_time=query.end_time,
+                measurement="pga",
+                field="pga",
+            ),
+            data=InfluxData(times=[query.start_time], values=[0.5]),
+        )
+
+
+class StandInClient:
+    """A `QSCloudClient` counting downloads running at the same time."""
+
+    def __init__(self, broken: tuple[str, ...] = ()) -> None:
+        """Initialize `StandInClient` whose `broken` sensors are unreachable."""
+        self.broken = set(broken)
+        self.requested: list[str] = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def enter(self) -> None:
+        """Count a starting download and let it take some time."""
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.02)
+
+    def leave(self) -> None:
+        """Count a finished download."""
+        with self._lock:
+            self.running -= 1
+
+    def get_sensor(self, sensor_uid: str) -> StandInSensor:
+        """Record the request and get the sensor."""
+        self.requested.append(sensor_uid)
+        return StandInSensor(self, sensor_uid)
+
+
+def test_fetch_runs_downloads_in_parallel(tmp_path: Path):
+    """Test that all products of all sensors are downloaded by the workers."""
+    client = StandInClient()
+    fetcher = BulkFetcher(
+        client, tmp_path, START, END, products=("waveforms", "pga"), workers=4
+    )
+    uids = [f"SENSOR{i}" for i in range(8)]
+    reported = []
+
+    progress = fetcher.run(uids, on_progress=lambda p, e: reported.append(p.done))
+
+    assert progress.done == 16
+    assert progress.bytes > 8000
+    assert progress.throughput > 0
+    assert reported == list(range(1, 17))
+    assert 1 < client.max_running <= 4
+    assert sorted(client.requested) == uids
+    assert (tmp_path / "SENSOR0" / "SENSOR0.mseed").exists()
+    result = MeasurementResult.parse_file(tmp_path / "SENSOR0" / "pga.json")
+    assert result.data.values == [0.5]
+
+
+def test_fetch_resumes_from_manifest(tmp_path: Path):
+    """Test that a second run only retries the tasks which failed."""
+    uids = ["SENSOR0", "SENSOR1", "SENSOR2"]
+    first = BulkFetcher(StandInClient(broken=("SENSOR1",)), tmp_path, START, END)
+    progress = first.run(uids)
+    assert (progress.done, progress.failed) == (2, 1)
+    assert first.entries["SENSOR1", "waveforms"].status == FetchStatus.failed
+
+    client = StandInClient()
+    second = BulkFetcher(client, tmp_path, START, END)
+    progress = second.run(uids)
+
+    assert (progress.done, progress.failed, progress.skipped) == (1, 0, 2)
+    assert client.requested == ["SENSOR1"]
+    assert all(second.is_done(uid, "waveforms") for uid in uids)
+
+
+def test_fetch_resumes_from_other_directory(tmp_path: Path, monkeypatch):
+    """Test that finished files are found when resuming from elsewhere."""
+    monkeypatch.chdir(tmp_path)
+    BulkFetcher(StandInClient(), "data", START, END).run(["SENSOR0"])
+    entry = BulkFetcher(StandInClient(), "data", START, END).entries[
+        "SENSOR0", "waveforms"
+    ]
+    assert entry.path == Path("SENSOR0", "SENSOR0.mseed")
+
+    monkeypatch.chdir(tmp_path / "data")
+    client = StandInClient()
+    progress = BulkFetcher(client, tmp_path / "data", START, END).run(["SENSOR0"])
+    assert progress.skipped == 1
+    assert client.requested == []
+
+
+def test_fetch_interrupt_keeps_finished_downloads(tmp_path: Path):
+    """Test that an interrupt cancels queued downloads and keeps finished ones."""
+    client = StandInClient()
+    fetcher = BulkFetcher(client, tmp_path, START, END, workers=2)
+    uids = [f"SENSOR{i}" for i in range(20)]
+
+    def interrupt(progress, entry) -> None:
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        fetcher.run(uids, on_progress=interrupt)
+
+    assert len(client.requested) < len(uids)
+    written = sorted(path.parent.name for path in tmp_path.glob("*/*.mseed"))
+    resumed = BulkFetcher(StandInClient(), tmp_path, START, END)
+    assert sorted(uid for uid in uids if resumed.is_done(uid, "waveforms")) == written
+
+
+def test_fetch_ignores_manifest_of_other_window(tmp_path: Path):
+    """Test that a manifest of another time window does not skip downloads."""
+    BulkFetcher(StandInClient(), tmp_path, START, END).run(["SENSOR0"])
+
+    client = StandInClient()
+    other = BulkFetcher(client, tmp_path, START, datetime(2023, 1, 2))
+    assert other.run(["SENSOR0"]).done == 1
+    assert client.requested == ["SENSOR0"]
+
+
+def test_fetch_rejects_unknown_products(tmp_path: Path):
+    """Test that products are checked before anything is downloaded."""
+    with pytest.raises(ValueError, match="spectrogram"):
+        BulkFetcher(StandInClient(), tmp_path, START, END, products=("spectrogram",))
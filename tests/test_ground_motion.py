@@ -0,0 +1,112 @@
+"""Peak ground motion tests."""
+
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from quakesaver_client import ground_motion
+from quakesaver_client.client_websocket import TraceChunk
+from quakesaver_client.ground_motion import (
+    GroundMotionProcessor,
+    cwb_intensity,
+    jma_intensity,
+    mmi_from_pga_pgv,
+)
+from quakesaver_client.models.sensor_state import PeakGroundMotionConfig
+
+T0 = datetime(2023, 3, 7, 9, 0, 0, tzinfo=timezone.utc)
+DELTA_T = 0.01
+AMPLITUDE = 0.1  # m/s²
+
+
+def sine_chunks(duration: float, npts: int = 50, offset: float = 9.81):
+    times = np.arange(int(duration / DELTA_T)) * DELTA_T
+    signal = AMPLITUDE * np.sin(2 * np.pi * 1.0 * times)
+    for ichunk, chunk in enumerate(np.split(signal, signal.size // npts)):
+        yield TraceChunk(
+            uid="TEST",
+            channels=("HNE", "HNN", "HNZ"),
+            array=np.stack([chunk, np.zeros_like(chunk), chunk + offset]),
+            tmax=T0.timestamp() + (ichunk + 1) * npts * DELTA_T,
+            delta_t=DELTA_T,
+        )
+
+
+def test_peak_ground_motion_of_sine() -> None:
+    processor = GroundMotionProcessor.from_config(PeakGroundMotionConfig())
+    for trace in sine_chunks(90.0):
+        measurement = processor.process(trace)
+
+    assert measurement.timestamp == trace.endtime
+    assert measurement.tags == {"uid": "TEST"}
+    assert measurement.pha == pytest.approx(AMPLITUDE, rel=0.05)
+    assert measurement.pga == pytest.approx(np.sqrt(2) * AMPLITUDE, rel=0.05)
+    assert measurement.pgv == pytest.approx(
+        np.sqrt(2) * AMPLITUDE / (2 * np.pi), rel=0.05
+    )
+    assert measurement.cwb_intensity == cwb_intensity(measurement.pga)
+
+
+def test_results_do_not_depend_on_chunking() -> None:
+    chunked = GroundMotionProcessor()
+    for trace in sine_chunks(20.0, npts=25):
+        chunked_result = chunked.process(trace)
+    whole = GroundMotionProcessor()
+    for trace in sine_chunks(20.0, npts=2000):
+        whole_result = whole.process(trace)
+
+    assert chunked_result.pga == pytest.approx(whole_result.pga)
+    assert chunked_result.pgv == pytest.approx(whole_result.pgv)
+    assert chunked_result.jma_intensity == pytest.approx(whole_result.jma_intensity)
+
+
+def test_jma_intensity_over_wrapped_ring_buffer() -> None:
+    # 1007 samples, so the ring buffer wraps in the middle of a chunk.
+    processor = GroundMotionProcessor(
+        jma_window_length_seconds=10.07, jma_interval_seconds=0.0
+    )
+    traces = list(sine_chunks(25.0, npts=25))
+    for trace in traces:
+        measurement = processor.process(trace)
+
+    window = np.concatenate([trace.array for trace in traces], axis=1)[:, -1007:]
+    window = window - window.mean(axis=1, keepdims=True)
+    assert measurement.jma_intensity == pytest.approx(jma_intensity(window, DELTA_T))
+
+
+def test_jma_intensity_is_updated_once_per_interval(monkeypatch) -> None:
+    computed = []
+
+    def count_jma_intensity(acceleration: np.ndarray, delta_t: float) -> float:
+        computed.append(acceleration.shape[1])
+        return float(len(computed))
+
+    monkeypatch.setattr(ground_motion, "jma_intensity", count_jma_intensity)
+    processor = GroundMotionProcessor(jma_interval_seconds=1.0)
+    results = [
+        processor.process(trace).jma_intensity for trace in sine_chunks(10.0, npts=25)
+    ]
+
+    # The first chunk, then the chunks ending at each of the 10 full seconds.
+    assert len(computed) == 11
+    assert results[-1] == 11.0
+    assert computed[-1] == 1000
+
+
+def test_jma_intensity_of_sine() -> None:
+    times = np.arange(6000) * DELTA_T
+    acceleration = np.zeros((3, times.size))
+    acceleration[0] = AMPLITUDE * np.sin(2 * np.pi * times)
+    # 1 Hz passes the JMA filter chain almost unchanged
+    expected = 2 * np.log10(AMPLITUDE * 100) + 0.94
+    assert jma_intensity(acceleration, DELTA_T) == pytest.approx(expected, abs=0.02)
+
+
+def test_intensity_scales() -> None:
+    assert mmi_from_pga_pgv(0.0, 0.0) == 1.0
+    assert mmi_from_pga_pgv(0.2, 0.0) == pytest.approx(1.78 + 1.55 * np.log10(20.0))
+    assert mmi_from_pga_pgv(1.0, 0.0) == pytest.approx(-1.60 + 3.70 * 2.0)
+    assert cwb_intensity(0.0) == 0
+    assert cwb_intensity(0.1) == 3
+    assert cwb_intensity(5.0) == 7
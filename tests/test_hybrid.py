@@ -0,0 +1,128 @@
+"""Hybrid LAN and cloud sensor tests."""
+
+import socket
+import time
+
+import pytest
+
+from quakesaver_client.errors import CorruptedDataError
+from quakesaver_client.hybrid import CLOUD, LOCAL, HybridSensor
+from quakesaver_client.models.local_sensor import LocalSensor
+from quakesaver_client.models.measurement import (
+    InfluxData,
+    MeasurementQuery,
+    MeasurementQueryFull,
+    MeasurementResult,
+)
+
+QUERY = MeasurementQuery(
+    start_time="2023-03-07T09:00:00Z", end_time="2023-03-07T10:00:00Z"
+)
+
+
+class StandInCloudSensor:
+    """A cloud sensor answering measurement queries after a delay."""
+
+    uid = "TEST"
+    _api_base_url = "https://127.0.0.1:1/api/v1"
+
+    def __init__(self, delay: float = 0.02) -> None:
+        """Initialize `StandInCloudSensor` answering after `delay` seconds."""
+        self.delay = delay
+        self.calls = 0
+
+    def get_jma_intensity(self, query: MeasurementQuery) -> MeasurementResult:
+        """Count the call and get an empty result after the delay."""
+        self.calls += 1
+        time.sleep(self.delay)
+        return MeasurementResult(
+            sensor_uid=self.uid,
+            query_time_seconds=self.delay,
+            query=MeasurementQueryFull(
+                **query.dict(), field="intensity", measurement="rt_jma_intensity"
+            ),
+            data=InfluxData(times=[], values=[]),
+        )
+
+
+def test_queries_use_faster_lan(local_sensor: LocalSensor) -> None:
+    cloud = StandInCloudSensor()
+    with HybridSensor(cloud, local=local_sensor, probe_interval=60) as hybrid:
+        assert hybrid.paths[LOCAL].reachable
+        for _ in range(5):
+            assert hybrid.get_jma_intensity(QUERY).data.values == [1.5]
+
+    assert cloud.calls == 0
+    assert [record.path for record in hybrid.history] == [LOCAL] * 5
+    assert hybrid.paths[LOCAL].calls == 5
+    assert hybrid.paths[LOCAL].latency < cloud.delay
+
+
+def test_probe_connects_lan_sensor(local_sensor: LocalSensor) -> None:
+    hybrid = HybridSensor(StandInCloudSensor(), local_url=local_sensor._url)
+    assert hybrid.route() == [CLOUD]
+    hybrid.probe()
+    assert isinstance(hybrid.local, LocalSensor)
+    assert hybrid.local._timeout == hybrid.request_timeout
+    assert hybrid.route() == [LOCAL, CLOUD]
+
+
+def test_probe_gives_up_on_silent_lan_sensor() -> None:
+    # Accepts connections but never answers.
+    with socket.create_server(("127.0.0.1", 0)) as silent:
+        port = silent.getsockname()[1]
+        hybrid = HybridSensor(
+            StandInCloudSensor(), local_url=f"127.0.0.1:{port}", probe_timeout=0.2
+        )
+        started = time.perf_counter()
+        hybrid.probe()
+        assert time.perf_counter() - started < 2
+    assert hybrid.local is None
+    assert not hybrid.paths[LOCAL].reachable
+    assert hybrid.route() == [CLOUD]
+
+
+def test_failed_lan_falls_back_to_cloud(state_payload: dict) -> None:
+    local = LocalSensor.parse_obj(state_payload)
+    local._url = "127.0.0.1:1"
+    cloud = StandInCloudSensor()
+    hybrid = HybridSensor(cloud, local=local)
+    # A stale probe still claims the sensor is close.
+    hybrid.paths[LOCAL].reachable = True
+    hybrid.paths[LOCAL].rtt = 0.001
+
+    hybrid.get_jma_intensity(QUERY)
+    hybrid.get_jma_intensity(QUERY)
+
+    first, second = hybrid.history
+    assert (first.path, first.fallback) == (CLOUD, True)
+    assert (second.path, second.fallback) == (CLOUD, False)
+    assert hybrid.paths[LOCAL].failures == 1
+    assert not hybrid.paths[LOCAL].reachable
+    assert cloud.calls == 2
+
+
+def test_route_prefers_lower_latency(state_payload: dict) -> None:
+    hybrid = HybridSensor(
+        StandInCloudSensor(), local=LocalSensor.parse_obj(state_payload)
+    )
+    hybrid.paths[LOCAL].reachable = True
+    hybrid.paths[LOCAL].record(0.5)
+    hybrid.paths[CLOUD].record(0.1)
+    assert hybrid.route() == [CLOUD, LOCAL]
+    for _ in range(20):
+        hybrid.paths[LOCAL].record(0.01)
+    assert hybrid.route() == [LOCAL, CLOUD]
+
+
+def test_error_of_last_path_is_raised() -> None:
+    class BrokenCloudSensor(StandInCloudSensor):
+        def get_jma_intensity(self, query: MeasurementQuery) -> MeasurementResult:
+            raise CorruptedDataError("broken")
+
+    hybrid = HybridSensor(BrokenCloudSensor())
+    with pytest.raises(CorruptedDataError):
+        hybrid.get_jma_intensity(QUERY)
+    (record,) = hybrid.history
+    assert record.path is None and "broken" in record.error
+    assert hybrid.paths[CLOUD].failures == 1
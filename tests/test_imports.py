@@ -0,0 +1,57 @@
+"""Tests for the import time dependencies of the package."""
+
+import subprocess
+import sys
+
+HEAVY_MODULES = ("aiohttp", "numpy", "obspy", "scipy")
+
+
+def loaded_modules(statement: str) -> set[str]:
+    """Run `statement` in a fresh interpreter and get the loaded top modules."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys; {statement}; print(' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return {name.partition(".")[0] for name in result.stdout.split()}
+
+
+def test_import_package_without_streaming_dependencies():
+    """Test that importing the package loads no streaming dependencies."""
+    loaded = loaded_modules("import quakesaver_client")
+    assert not loaded & set(HEAVY_MODULES)
+
+
+def test_import_local_sensor_without_streaming_dependencies():
+    """Test that connecting to a sensor does not need the streaming stack."""
+    loaded = loaded_modules("from quakesaver_client import CloudSensor, LocalSensor")
+    assert not loaded & set(HEAVY_MODULES)
+
+
+def test_streaming_imports_its_dependencies():
+    """Test that the streaming dependencies are loaded once they are used."""
+    loaded = loaded_modules("from quakesaver_client.client_websocket import *")
+    assert {"aiohttp", "numpy", "obspy"} <= loaded
+
+
+def test_sensor_actor_without_numpy():
+    """Test that a sensor actor needs numpy only once it measures round trips."""
+    loaded = loaded_modules("from quakesaver_client.sensor_actor import SensorActor")
+    assert "numpy" not in loaded
+
+
+def test_fetch_without_streaming_dependencies():
+    """Test that the CLI can read the fetch products without the streaming stack."""
+    loaded = loaded_modules("from quakesaver_client.fetch import PRODUCTS")
+    assert not loaded & set(HEAVY_MODULES)
+
+
+def test_cli_without_streaming_dependencies():
+    """Test that the CLI loads the dependencies of a command only when it runs."""
+    loaded = loaded_modules("import quakesaver_client.cli")
+    assert not loaded & set(HEAVY_MODULES)
@@ -0,0 +1,66 @@
+"""Lazy sensor state tests and construction benchmark."""
+
+import json
+import logging
+import time
+import tracemalloc
+
+import pytest
+from pydantic import ValidationError
+
+from quakesaver_client.models.lazy_state import MODULE_FIELDS
+from quakesaver_client.models.local_sensor import LocalSensor
+from quakesaver_client.models.sensor_state import SensorState
+
+logger = logging.getLogger(__name__)
+
+
+def test_modules_are_validated_on_access(state_payload: dict) -> None:
+    payload = json.dumps(state_payload)
+    eager = SensorState.parse_raw(payload)
+    lazy = LocalSensor.parse_raw(payload)
+    assert lazy.uid == "TEST"
+    assert lazy.pending_modules == MODULE_FIELDS
+
+    assert lazy.SystemInformation == eager.SystemInformation
+    assert lazy.SystemInformation is lazy.SystemInformation
+    assert "SystemInformation" not in lazy.pending_modules
+
+    assert lazy.dict(exclude={"_url"}) == eager.dict()
+    assert not lazy.pending_modules
+
+
+def test_invalid_module_raises_on_access(state_payload: dict) -> None:
+    state_payload["RingbufferState"] = {"window_size": "large"}
+    sensor = LocalSensor.parse_obj(state_payload)
+    with pytest.raises(ValidationError):
+        assert sensor.RingbufferState is None
+    with pytest.raises(AttributeError):
+        assert sensor.NoSuchState is None
+
+
+def measure(parse, payload: str, repeat: int = 20) -> tuple[float, int]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parse(payload)
+    elapsed = (time.perf_counter() - started) / repeat
+
+    tracemalloc.start()
+    kept = [parse(payload) for _ in range(repeat)]
+    memory = tracemalloc.get_traced_memory()[0] // repeat
+    tracemalloc.stop()
+    del kept
+    return elapsed, memory
+
+
+@pytest.mark.benchmark
+def test_benchmark_lazy_construction(state_payload: dict) -> None:
+    payload = json.dumps(state_payload)
+    eager_time, eager_memory = measure(SensorState.parse_raw, payload)
+    lazy_time, lazy_memory = measure(LocalSensor.parse_raw, payload)
+    logger.info(
+        f"SensorState.parse_raw: {eager_time * 1e3:.2f} ms, {eager_memory} B; "
+        f"LocalSensor.parse_raw: {lazy_time * 1e3:.2f} ms, {lazy_memory} B"
+    )
+    assert lazy_time < eager_time / 3
+    assert lazy_memory < eager_memory
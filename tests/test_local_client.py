@@ -1,11 +1,18 @@
 """local sensor tests."""
+
 import datetime
+import logging
+import statistics
+import time
 from typing import Callable
 
 import numpy as np
 import pytest
 
-from quakesaver_client import LocalSensor
+from quakesaver_client import LocalSensor, QSCloudClient
+from quakesaver_client.models.measurement import MeasurementQuery
+
+logger = logging.getLogger(__name__)
 
 
 @pytest.fixture()
@@ -55,3 +62,29 @@ async def test_waveform_obspy(local_test_sensor: Callable) -> None:
     tmin = tmax - datetime.timedelta(minutes=1)
     data = local_test_sensor.get_waveforms_obspy(tmin, tmax)
     assert data
+
+
+@pytest.mark.local
+def test_benchmark_lan_and_cloud_latency(
+    local_test_sensor: LocalSensor, client: QSCloudClient
+) -> None:
+    """Compare the latency of the same query on the LAN and in the cloud."""
+    cloud_sensor = client.get_sensor(local_test_sensor.uid)
+    tmax = datetime.datetime.now(tz=datetime.timezone.utc)
+    query = MeasurementQuery(
+        start_time=tmax - datetime.timedelta(hours=1), end_time=tmax
+    )
+
+    latencies = {}
+    for name, sensor in (("lan", local_test_sensor), ("cloud", cloud_sensor)):
+        durations = []
+        for _ in range(20):
+            started = time.perf_counter()
+            sensor.get_peak_horizontal_acceleration(query)
+            durations.append(time.perf_counter() - started)
+        latencies[name] = statistics.median(durations)
+    logger.info(
+        f"median latency LAN: {latencies['lan'] * 1e3:.1f} ms, "
+        f"cloud: {latencies['cloud'] * 1e3:.1f} ms"
+    )
+    assert latencies["lan"] < latencies["cloud"]
@@ -0,0 +1,95 @@
+"""Local sensor query tests against a stand-in sensor HTTP server."""
+
+import socket
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+from quakesaver_client.errors import CorruptedDataError
+from quakesaver_client.models import local_sensor as local_sensor_module
+from quakesaver_client.models.data_product_query import DataProductQuery
+from quakesaver_client.models.local_sensor import LocalSensor
+from quakesaver_client.models.measurement import MeasurementQuery
+
+
+def test_data_products_use_cloud_result_models(
+    local_sensor: LocalSensor, local_sensor_server: ThreadingHTTPServer
+) -> None:
+    result = local_sensor.get_event_records(DataProductQuery(limit=10))
+    assert result.count == 0 and result.data_products == []
+    assert local_sensor.get_noise_autocorrelations(DataProductQuery()).ttl_seconds == 60
+    assert local_sensor_server.requests[-2].startswith("/data_products/EventRecord?")
+    assert "limit=10" in local_sensor_server.requests[-2]
+
+    with pytest.raises(CorruptedDataError):
+        local_sensor.get_hv_spectra(DataProductQuery())
+
+
+def test_measurements_query_the_sensor(local_sensor: LocalSensor) -> None:
+    query = MeasurementQuery(
+        start_time="2023-03-07T09:00:00Z", end_time="2023-03-07T10:00:00Z"
+    )
+    result = local_sensor.get_jma_intensity(query)
+    assert result.query.measurement == "rt_jma_intensity"
+    assert result.query.field == "intensity"
+    assert result.data.values == [1.5]
+    assert local_sensor.get_rms_offset(query).query.measurement == "chrony"
+
+
+def test_queries_reuse_pooled_connection(
+    local_sensor: LocalSensor, local_sensor_server: ThreadingHTTPServer
+) -> None:
+    query = MeasurementQuery(
+        start_time="2023-03-07T09:00:00Z", end_time="2023-03-07T10:00:00Z"
+    )
+    for _ in range(20):
+        local_sensor.get_peak_horizontal_acceleration(query)
+        local_sensor.get_event_records(DataProductQuery())
+    assert len(local_sensor_server.requests) == 41
+    assert len(local_sensor_server.connections) == 1
+
+
+@pytest.fixture
+def closed_sessions(monkeypatch) -> list:
+    """Record the pooled sessions of local sensors which are closed."""
+    closed = []
+    pooled_session = local_sensor_module._pooled_session
+
+    def recording_session() -> requests.Session:
+        session = pooled_session()
+        close = session.close
+
+        def recording_close() -> None:
+            closed.append(session)
+            close()
+
+        session.close = recording_close
+        return session
+
+    monkeypatch.setattr(local_sensor_module, "_pooled_session", recording_session)
+    return closed
+
+
+def test_connect_rejects_invalid_state(
+    local_sensor_server: ThreadingHTTPServer, closed_sessions: list
+) -> None:
+    local_sensor_server.state = ["not", "a", "state"]
+    url = f"127.0.0.1:{local_sensor_server.server_address[1]}"
+    for trusted in (False, True):
+        with pytest.raises(CorruptedDataError):
+            LocalSensor.connect(url, trusted=trusted)
+    assert len(closed_sessions) == 2
+
+
+def test_connect_times_out(closed_sessions: list) -> None:
+    with socket.socket() as silent:
+        # Accepts connections, but never answers.
+        silent.bind(("127.0.0.1", 0))
+        silent.listen()
+        started = time.monotonic()
+        with pytest.raises(requests.Timeout):
+            LocalSensor.connect(f"127.0.0.1:{silent.getsockname()[1]}", timeout=0.1)
+    assert time.monotonic() - started < 2.0
+    assert len(closed_sessions) == 1
@@ -0,0 +1,43 @@
+"""Stream metrics tests."""
+
+import numpy as np
+import pytest
+
+from quakesaver_client.metrics import LatencyHistogram, StreamMetrics
+
+
+def test_histogram_quantiles_are_accurate() -> None:
+    rng = np.random.default_rng(0)
+    values = rng.exponential(0.2, size=10000)
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    assert histogram.count == values.size
+    for q in (0.5, 0.9, 0.99):
+        assert histogram.quantile(q) == pytest.approx(np.quantile(values, q), rel=0.02)
+    assert histogram.quantile(1.0) == histogram.max
+
+
+def test_histogram_counts_negative_values() -> None:
+    histogram = LatencyHistogram()
+    histogram.record(-0.1)
+    assert histogram.negative == 1
+    assert histogram.quantile(0.5) == 0.0
+
+
+def test_snapshot_and_prometheus() -> None:
+    metrics = StreamMetrics()
+    for i in range(10):
+        metrics.record("TEST", 100.0 + i, 1000, 100.5 + i, 100.501 + i, 100.503 + i)
+
+    snapshot = metrics.snapshot()["TEST"]
+    assert snapshot["messages"] == 10
+    assert snapshot["bytes"] == 10000
+    assert snapshot["latency"]["p50"] == pytest.approx(0.5, rel=0.01)
+    assert snapshot["decode"]["max"] == pytest.approx(0.002, rel=0.01)
+
+    payload = metrics.prometheus()
+    assert "# TYPE qs_client_stream_latency_seconds summary" in payload
+    assert 'qs_client_stream_messages_total{uid="TEST"} 10' in payload
+    assert 'qs_client_stream_latency_seconds_count{uid="TEST"} 10' in payload
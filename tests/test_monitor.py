@@ -0,0 +1,90 @@
+"""Fleet health monitor tests."""
+
+import asyncio
+import io
+from typing import Callable
+
+import aiohttp
+
+from quakesaver_client.monitor import FleetMonitor, HealthTable, SensorHealth
+
+
+async def test_monitor_summarizes_health_and_rates(
+    stand_in_fleet: Callable, state_payload: dict
+) -> None:
+    state_payload["SystemInformation"]["disk_stats"]["percent"] = 97.0
+    state_payload["AD7779State"]["stats"].update(active=True, nsamples=0, crc_errors=0)
+    runner = await stand_in_fleet(state_payload)
+    host = f"127.0.0.1:{runner.addresses[0][1]}"
+    offline = "127.0.0.1:1"
+    monitor = FleetMonitor([host, offline], timeout=1.0)
+    try:
+        async with aiohttp.ClientSession() as session:
+            first = await monitor.refresh(session)
+            assert {health.host for health in first} == {host, offline}
+            health = monitor.health[host]
+            assert health.online and health.uid == "TEST"
+            assert health.disk_percent == 97.0
+            assert health.sampler == "AD7779State"
+            assert health.sampling_rate is None
+            assert health.alerts == ["disk"]
+            assert monitor.health[offline].alerts == ["offline"]
+            assert monitor.health[offline].error
+
+            await asyncio.sleep(0.1)
+            state_payload["AD7779State"]["stats"].update(nsamples=100, crc_errors=2)
+            second = await monitor.refresh(session)
+            assert [health.host for health in second] == [host]
+            health = monitor.health[host]
+            assert 100 < health.sampling_rate < 1000
+            assert health.crc_error_rate > 0
+            assert health.alerts == ["disk", "crc"]
+
+            await asyncio.sleep(0.1)
+            third = await monitor.refresh(session)
+            assert monitor.health[host].sampling_rate == 0.0
+            assert "sampler" in monitor.health[host].alerts
+            assert [health.host for health in third] == [host]
+    finally:
+        await runner.cleanup()
+
+
+def test_table_redraws_changed_rows_only() -> None:
+    stream = io.StringIO()
+    table = HealthTable(["a:5533", "b:5533"], stream)
+    rows = [SensorHealth(host="a:5533"), SensorHealth(host="b:5533")]
+    table.draw(rows)
+    first = stream.getvalue()
+    assert first.startswith("\x1b[2J")
+    assert "HOST" in first and "offline" in first
+
+    stream.seek(0)
+    stream.truncate()
+    table.draw([rows[0], SensorHealth(host="b:5533", online=True, cpu_percent=42)])
+    second = stream.getvalue()
+    assert "a:5533" not in second
+    assert "\x1b[3;1Hb:5533" in second and "42" in second
+
+
+def test_table_fits_terminal_height_with_alerts_first() -> None:
+    stream = io.StringIO()
+    hosts = [f"10.0.0.{i}:5533" for i in range(10)]
+    table = HealthTable(hosts, stream, height=4)
+    healthy = {"online": True, "time_monitor": True, "sampling_rate": 100.0}
+    rows = [SensorHealth(host=host, **healthy) for host in hosts]
+    rows[7] = SensorHealth(host=hosts[7], **healthy, disk_percent=99)
+    table.draw(rows)
+    first = stream.getvalue()
+    # Four rows and the cursor line below them.
+    assert first.count(";1H") == 5
+    assert "\x1b[2;1H10.0.0.7" in first and "disk" in first
+    assert "\x1b[3;1H10.0.0.0" in first and "\x1b[4;1H10.0.0.1" in first
+    assert "\x1b[5;1H... 7 more sensors" in first
+    assert first.endswith("\x1b[6;1H")
+
+    stream.seek(0)
+    stream.truncate()
+    table.draw([SensorHealth(host=hosts[7], **healthy)])
+    second = stream.getvalue()
+    assert "\x1b[2;1H10.0.0.0" in second and "\x1b[4;1H10.0.0.2" in second
+    assert "more sensors" not in second
@@ -0,0 +1,144 @@
+"""Fleet state poller tests."""
+
+import asyncio
+import copy
+from typing import Callable
+
+import aiohttp
+import pytest
+
+from quakesaver_client.errors import CorruptedDataError
+from quakesaver_client.poller import StatePoller, diff_states
+
+STATE = {
+    "uid": "TEST",
+    "software_version": "1.2.3",
+    "RingbufferState": {
+        "stats": {"percent_used": 10.0, "nsamples": 100},
+        "window": "hann",
+        "window_size": 1024,
+        "filter_length": 64,
+    },
+    "STALTAState": {"config": {"nsta": 50, "nlta": 300, "trigger_threshold": 1.2}},
+}
+
+
+def test_diff_states_reports_changed_paths() -> None:
+    new = copy.deepcopy(STATE)
+    new["RingbufferState"]["stats"]["percent_used"] = 20.0
+    new["TimeMonitorState"] = {"synchronized": True}
+    del new["STALTAState"]
+
+    changes = {
+        change.path: (change.old, change.new) for change in diff_states(STATE, new)
+    }
+    assert changes == {
+        "RingbufferState.stats.percent_used": (10.0, 20.0),
+        "TimeMonitorState": (None, {"synchronized": True}),
+        "STALTAState": (STATE["STALTAState"], None),
+    }
+    assert diff_states(STATE, copy.deepcopy(STATE)) == []
+
+
+async def test_poller_publishes_changes_only(stand_in_fleet: Callable) -> None:
+    state = copy.deepcopy(STATE)
+    runner = await stand_in_fleet(state)
+    host = f"127.0.0.1:{runner.addresses[0][1]}"
+    poller = StatePoller([host])
+    try:
+        async with aiohttp.ClientSession() as session:
+            first = await poller.poll(session, host)
+            stalta = poller.state(host).STALTAState
+
+            state["RingbufferState"]["stats"]["percent_used"] = 11.0
+            second = await poller.poll(session, host)
+            third = await poller.poll(session, host)
+    finally:
+        await runner.cleanup()
+
+    assert first.uid == "TEST"
+    assert len(first.changes) == len(STATE)
+    assert [(c.path, c.new) for c in second.changes] == [
+        ("RingbufferState.stats.percent_used", 11.0)
+    ]
+    assert third.changes == []
+
+    sensor_state = poller.state(host)
+    assert sensor_state.RingbufferState.stats.percent_used == 11.0
+    assert sensor_state.STALTAState is stalta
+    assert sensor_state.STALTAState.config.nsta == 50
+
+
+async def test_poller_runs_concurrently(stand_in_fleet: Callable) -> None:
+    state = copy.deepcopy(STATE)
+    runner = await stand_in_fleet(state)
+    poller = StatePoller([f"127.0.0.1:{runner.addresses[0][1]}"], interval=0.05)
+    try:
+        updates = poller.run()
+        first = await asyncio.wait_for(updates.__anext__(), 1.0)
+        state["uid"] = "CHANGED"
+        second = await asyncio.wait_for(updates.__anext__(), 1.0)
+        await updates.aclose()
+    finally:
+        await runner.cleanup()
+
+    assert first.uid == "TEST"
+    assert [(c.path, c.new) for c in second.changes] == [("uid", "CHANGED")]
+
+
+async def test_poll_rejects_state_which_is_not_an_object(
+    stand_in_fleet: Callable,
+) -> None:
+    runner = await stand_in_fleet([STATE])
+    host = f"127.0.0.1:{runner.addresses[0][1]}"
+    try:
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises(CorruptedDataError):
+                await StatePoller([host]).poll(session, host)
+    finally:
+        await runner.cleanup()
+
+
+async def test_poller_keeps_polling_after_errors(stand_in_fleet: Callable) -> None:
+    runner = await stand_in_fleet(copy.deepcopy(STATE))
+    poller = StatePoller([f"127.0.0.1:{runner.addresses[0][1]}"], interval=0.05)
+    poll = poller.poll
+    calls = []
+
+    async def failing_once(session: aiohttp.ClientSession, host: str):
+        calls.append(host)
+        if len(calls) == 1:
+            raise AttributeError("'list' object has no attribute 'get'")
+        return await poll(session, host)
+
+    poller.poll = failing_once
+    try:
+        updates = poller.run()
+        update = await asyncio.wait_for(updates.__anext__(), 2.0)
+        await updates.aclose()
+    finally:
+        await runner.cleanup()
+
+    assert update.uid == "TEST"
+    assert len(calls) >= 2
+
+
+async def test_invalid_field_is_validated_again(
+    caplog, stand_in_fleet: Callable
+) -> None:
+    state = copy.deepcopy(STATE)
+    runner = await stand_in_fleet(state)
+    host = f"127.0.0.1:{runner.addresses[0][1]}"
+    poller = StatePoller([host])
+    try:
+        async with aiohttp.ClientSession() as session:
+            await poller.poll(session, host)
+            state["RingbufferState"]["window_size"] = "large"
+            await poller.poll(session, host)
+            await poller.poll(session, host)
+    finally:
+        await runner.cleanup()
+
+    invalid = [r for r in caplog.records if "Invalid RingbufferState" in r.message]
+    assert len(invalid) == 2
+    assert poller.state(host).RingbufferState.window_size == 1024
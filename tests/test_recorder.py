@@ -0,0 +1,136 @@
+"""MiniSEED recorder tests."""
+
+import asyncio
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from obspy import read
+
+from quakesaver_client.client_websocket import TraceChunk
+from quakesaver_client.recorder import FleetRecorder, MiniSEEDRecorder
+
+T0 = datetime(2023, 3, 7, 9, 4, 0, tzinfo=timezone.utc)
+DELTA_T = 0.01
+NPTS = 50
+
+
+def chunks(nchunks: int, rng: np.random.Generator):
+    for ichunk in range(nchunks):
+        yield TraceChunk(
+            uid="TEST",
+            channels=("HHZ",),
+            array=rng.integers(-5000, 5000, (1, NPTS), dtype=np.int32),
+            tmax=T0.timestamp() + (ichunk + 1) * NPTS * DELTA_T,
+            delta_t=DELTA_T,
+        )
+
+
+def test_recorder_rotates_and_keeps_samples(tmp_path: Path) -> None:
+    rng = np.random.default_rng(0)
+    written = []
+    # 6 minutes and 5 seconds of data crossing the 09:05 and 09:10 rotation boundaries
+    with MiniSEEDRecorder(tmp_path, record_length=512, time_length=300) as recorder:
+        for trace in chunks(730, rng):
+            written.append(trace.data["HHZ"])
+            recorder.write(trace)
+
+    files = sorted((tmp_path / "TEST").iterdir())
+    assert [file.name for file in files] == [
+        "QS.TEST..HHZ.20230307T090000.mseed",
+        "QS.TEST..HHZ.20230307T090500.mseed",
+        "QS.TEST..HHZ.20230307T091000.mseed",
+    ]
+    for file in files:
+        assert file.stat().st_size % 512 == 0
+
+    stream = read(str(tmp_path / "TEST" / "*.mseed"))
+    stream.merge()
+    assert len(stream) == 1
+    assert stream[0].stats.starttime == T0
+    np.testing.assert_array_equal(stream[0].data, np.concatenate(written))
+
+
+def test_recorder_writes_full_records_only(tmp_path: Path) -> None:
+    rng = np.random.default_rng(1)
+    recorder = MiniSEEDRecorder(tmp_path, record_length=512, batch_records=4)
+    for trace in chunks(200, rng):
+        recorder.write(trace)
+
+    (file,) = (tmp_path / "TEST").iterdir()
+    nrecords = file.stat().st_size // 512
+    records = read(str(file), details=True)
+    assert len(records) >= 1
+    assert nrecords >= 4
+    recorder.flush()
+    assert file.stat().st_size // 512 > nrecords
+
+
+def test_recorder_keeps_float32(tmp_path: Path) -> None:
+    rng = np.random.default_rng(0)
+    written = []
+    with MiniSEEDRecorder(tmp_path, record_length=512) as recorder:
+        for trace in chunks(20, rng):
+            trace.array = trace.array.astype(np.float32) * 1e-6
+            written.append(trace.data["HHZ"])
+            recorder.write(trace)
+
+    (file,) = (tmp_path / "TEST").iterdir()
+    stream = read(str(file))
+    assert stream[0].data.dtype == np.float32
+    np.testing.assert_array_equal(stream[0].data, np.concatenate(written))
+
+
+class FakeHandler:
+    """A sensor stream yielding fixed chunks, optionally with a gap."""
+
+    def __init__(self, uid: str, nchunks: int, gap_after: int = -1, forever=False):
+        """Initialize `FakeHandler` of sensor `uid`, gapped after `gap_after`."""
+        self.url = f"{uid.lower()}:5533"
+        self.uid = uid
+        self.nchunks = nchunks
+        self.gap_after = gap_after
+        self.forever = forever
+
+    async def start(self):
+        """Yield the chunks, then idle if the stream runs `forever`."""
+        rng = np.random.default_rng(0)
+        for ichunk, chunk in enumerate(chunks(self.nchunks, rng)):
+            chunk.uid = self.uid
+            if ichunk > self.gap_after >= 0:
+                chunk.tmax += 10.0
+            yield chunk
+            await asyncio.sleep(0)
+        while self.forever:
+            await asyncio.sleep(1)
+
+
+async def test_fleet_recorder_records_all_sensors(tmp_path: Path) -> None:
+    handlers = [FakeHandler("FIRST", 20), FakeHandler("SECOND", 20, gap_after=9)]
+    fleet = FleetRecorder(MiniSEEDRecorder(tmp_path), stats_interval=None)
+    await fleet.record(handlers)
+
+    first = read(str(tmp_path / "FIRST" / "*.mseed"))
+    assert len(first) == 1 and first[0].stats.npts == 20 * NPTS
+    second = read(str(tmp_path / "SECOND" / "*.mseed"))
+    assert len(second) == 2
+    assert sum(trace.stats.npts for trace in second) == 20 * NPTS
+
+    stats = {url: s.snapshot() for url, s in fleet.stats.items()}
+    assert stats["first:5533"]["chunks"] == 20
+    assert stats["first:5533"]["gaps"] == 0
+    assert stats["second:5533"]["gaps"] == 1
+    assert abs(stats["second:5533"]["gap_seconds"] - 10.0) < 1e-6
+    assert stats["second:5533"]["lag"] > 0
+
+
+async def test_fleet_recorder_flushes_when_cancelled(tmp_path: Path) -> None:
+    handler = FakeHandler("FIRST", 5, forever=True)
+    fleet = FleetRecorder(MiniSEEDRecorder(tmp_path), stats_interval=0.01)
+    task = asyncio.ensure_future(fleet.record([handler]))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert fleet.stats["first:5533"].chunks == 5
+    assert read(str(tmp_path / "FIRST" / "*.mseed"))[0].stats.npts == 5 * NPTS
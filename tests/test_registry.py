@@ -0,0 +1,48 @@
+"""Sensor registry tests."""
+
+from typing import Callable
+
+from quakesaver_client.registry import SensorEventType, SensorRegistry
+
+HOSTS = [f"127.0.0.{i}" for i in range(1, 20)]
+
+
+async def test_registry_tracks_sensors(tmp_path, stand_in_sensor: Callable) -> None:
+    path = tmp_path / "sensors.json"
+    runner = await stand_in_sensor()
+    port = runner.addresses[0][1]
+    try:
+        registry = SensorRegistry(path)
+        (event,) = await registry.scan(HOSTS, port=port)
+        assert event.type == SensorEventType.appeared
+        assert str(event.sensor.ip_address) == "127.0.0.1"
+        assert event.sensor.rtt > 0.0
+
+        registry = SensorRegistry(path)
+        assert list(registry.sensors) == ["TEST"]
+        assert await registry.scan(port=port) == []
+    finally:
+        await runner.cleanup()
+
+    (event,) = await registry.scan(HOSTS, port=port)
+    assert event.type == SensorEventType.disappeared
+    assert not registry.online
+
+    runner = await stand_in_sensor(host="127.0.0.2", port=port)
+    try:
+        (event,) = await registry.scan(HOSTS, port=port)
+        assert event.type == SensorEventType.appeared
+        assert str(event.previous_ip_address) == "127.0.0.1"
+
+        await runner.cleanup()
+        runner = await stand_in_sensor(host="127.0.0.3", port=port)
+        (event,) = await registry.scan(HOSTS, port=port)
+        assert event.type == SensorEventType.moved
+        assert str(event.sensor.ip_address) == "127.0.0.3"
+    finally:
+        await runner.cleanup()
+
+    registry.export_csv(tmp_path / "sensors-alive.csv")
+    assert (tmp_path / "sensors-alive.csv").read_text() == (
+        "uid,ip_address\nTEST,127.0.0.3\n"
+    )
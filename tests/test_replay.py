@@ -0,0 +1,77 @@
+"""Session record and replay tests."""
+
+import json
+import time
+from typing import Callable
+
+import numpy as np
+import pytest
+
+from quakesaver_client.client_websocket import WebsocketHandler
+from quakesaver_client.errors import CorruptedDataError
+from quakesaver_client.replay import ReplayHandler, SessionRecorder, read_session
+
+
+@pytest.fixture
+def frames(make_payload: Callable) -> list[str]:
+    return [
+        json.dumps(
+            {"payload": make_payload({"HHZ": np.arange(100, dtype=np.int32) + i})}
+        )
+        for i in range(5)
+    ]
+
+
+class FakeSensorHandler(WebsocketHandler):
+    def __init__(self, frames: list[str], **kwargs) -> None:
+        """Initialize `FakeSensorHandler` sending `frames` after a status."""
+        super().__init__(**kwargs)
+        self.frames = frames
+
+    async def _receive(self, session):
+        """Yield a status message, then the frames."""
+        yield json.dumps({"payload": {"status": "ok"}})
+        for frame in self.frames:
+            yield frame
+
+
+@pytest.mark.parametrize("suffix", [".qsws", ".qsws.gz"])
+async def test_record_and_replay(tmp_path, suffix, frames: list[str]) -> None:
+    path = tmp_path / f"session{suffix}"
+    with SessionRecorder(path) as recorder:
+        handler = FakeSensorHandler(frames, session_recorder=recorder)
+        live = [trace.array.copy() async for trace in handler.create_websocket(None)]
+
+    recorded = list(read_session(path))
+    assert [frame for _, frame in recorded[1:]] == frames
+    assert all(a <= b for (a, _), (b, _) in zip(recorded, recorded[1:]))
+
+    replayed = [trace.array async for trace in ReplayHandler(path, speed=None).start()]
+    assert len(replayed) == len(live) == len(frames)
+    for a, b in zip(live, replayed):
+        np.testing.assert_array_equal(a, b)
+
+
+async def test_replay_keeps_timing(tmp_path, frames: list[str]) -> None:
+    path = tmp_path / "session.qsws"
+    with SessionRecorder(path) as recorder:
+        for i, frame in enumerate(frames):
+            recorder.write(1000.0 + i, frame)
+
+    started = time.monotonic()
+    traces = [trace async for trace in ReplayHandler(path, speed=20.0).start()]
+    assert len(traces) == len(frames)
+    assert time.monotonic() - started == pytest.approx(0.2, abs=0.1)
+
+
+def test_read_session_rejects_invalid_files(tmp_path, frames: list[str]) -> None:
+    path = tmp_path / "session.qsws"
+    path.write_bytes(b"garbage")
+    with pytest.raises(CorruptedDataError):
+        list(read_session(path))
+
+    with SessionRecorder(path) as recorder:
+        recorder.write(0.0, frames[0])
+    path.write_bytes(path.read_bytes()[:-10])
+    with pytest.raises(CorruptedDataError):
+        list(read_session(path))
@@ -0,0 +1,303 @@
+"""SeedLink client tests against a stand-in SeedLink server."""
+
+import asyncio
+import json
+from io import BytesIO
+from typing import Optional
+
+import numpy as np
+import pytest
+from obspy import Trace, UTCDateTime
+
+from quakesaver_client.errors import CorruptedDataError, NoDataError
+from quakesaver_client.models.local_sensor import LocalSensor
+from quakesaver_client.models.trusted import construct_trusted
+from quakesaver_client.seedlink import (
+    RECORD_SIZE,
+    SeedLinkClient,
+    SequenceStore,
+    decode_record,
+)
+
+T0 = UTCDateTime(2023, 3, 7, 9, 0, 0, 123456)
+
+
+def make_records(
+    data: np.ndarray, encoding: str = "STEIM2", byteorder: str = ">"
+) -> list[bytes]:
+    trace = Trace(data)
+    trace.stats.network = "QS"
+    trace.stats.station = "TEST"
+    trace.stats.channel = "HNZ"
+    trace.stats.sampling_rate = 100.0
+    trace.stats.starttime = T0
+    buffer = BytesIO()
+    trace.write(
+        buffer,
+        format="MSEED",
+        reclen=RECORD_SIZE,
+        encoding=encoding,
+        byteorder=byteorder,
+    )
+    raw = buffer.getvalue()
+    return [raw[i : i + RECORD_SIZE] for i in range(0, len(raw), RECORD_SIZE)]
+
+
+def samples(encoding: str, rng: np.random.Generator) -> np.ndarray:
+    if encoding.startswith("FLOAT"):
+        return rng.normal(size=2000).astype(np.dtype(encoding.lower()))
+    if encoding == "INT16":
+        return rng.integers(-3000, 3000, 2000).astype(np.int16)
+    # Small and large differences, to use every Steim word layout.
+    steps = np.concatenate(
+        [rng.integers(-8, 8, 1000), rng.integers(-(2**26), 2**26, 1000)]
+    )
+    return np.cumsum(steps).astype(np.int32)
+
+
+@pytest.mark.parametrize("byteorder", [">", "<"])
+@pytest.mark.parametrize(
+    "encoding", ["STEIM1", "STEIM2", "INT32", "INT16", "FLOAT32", "FLOAT64"]
+)
+def test_decode_record_matches_obspy(encoding: str, byteorder: str) -> None:
+    data = samples(encoding, np.random.default_rng(0))
+    records = [decode_record(r) for r in make_records(data, encoding, byteorder)]
+
+    decoded = np.concatenate([record.data for record in records])
+    assert decoded.dtype == data.dtype
+    np.testing.assert_array_equal(decoded, data)
+    assert records[0].starttime == pytest.approx(T0.timestamp, abs=1e-6)
+    assert (records[0].network, records[0].station) == ("QS", "TEST")
+    assert records[0].delta == 0.01
+    for previous, record in zip(records, records[1:]):
+        assert record.starttime == pytest.approx(previous.endtime, abs=1e-6)
+
+
+def test_decode_record_checks_steim_integration_constant() -> None:
+    record = bytearray(make_records(samples("STEIM2", np.random.default_rng(0)))[0])
+    # The last sample of the record is stored in the third word of the data.
+    record[64 + 8 : 64 + 12] = (12345).to_bytes(4, "big", signed=True)
+    with pytest.raises(CorruptedDataError):
+        decode_record(bytes(record))
+
+
+class StandInSeedLink:
+    """Serves numbered MiniSEED packets of station QS_TEST."""
+
+    def __init__(self, records: list[bytes], close_after: int = 0) -> None:
+        """Initialize `StandInSeedLink` closing after `close_after` packets."""
+        self.packets = list(enumerate(records, start=1))
+        self.close_after = close_after
+        self.commands: list[list[str]] = []
+        self.handlers: dict = {}
+        self.server = None
+
+    @property
+    def port(self) -> int:
+        """Port the server listens on."""
+        return self.server.sockets[0].getsockname()[1]
+
+    async def start(self) -> None:
+        """Start listening on a free port."""
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+
+    async def stop(self) -> None:
+        """Close the server and all connections."""
+        self.server.close()
+        for writer in self.handlers.values():
+            writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Negotiate a connection, then stream the requested packets."""
+        self.handlers[asyncio.current_task()] = writer
+        commands = []
+        self.commands.append(commands)
+        first = await self.negotiate(reader, writer, commands)
+        if first is not None:
+            await self.stream(reader, writer, first)
+
+    async def negotiate(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        commands: list[str],
+    ) -> Optional[int]:
+        """Answer commands until END and get the first requested sequence number.
+
+        Returns None if the client disconnects before.
+        """
+        first = 1
+        while True:
+            line = await reader.readline()
+            if not line:
+                return None
+            command = line.decode().strip()
+            commands.append(command)
+            if command == "END":
+                return first
+            if command.startswith("DATA "):
+                first = int(command[5:], 16)
+            writer.write(self.reply(command))
+            await writer.drain()
+
+    @staticmethod
+    def reply(command: str) -> bytes:
+        """Get the response to a negotiation command."""
+        if command == "HELLO":
+            return b"SeedLink v3.1 (stand-in)\r\nQuakeSaver\r\n"
+        if command.startswith("STATION"):
+            return b"OK\r\n" if command == "STATION TEST QS" else b"ERROR\r\n"
+        return b"OK\r\n"
+
+    async def stream(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, first: int
+    ) -> None:
+        """Send an INFO packet and the packets from sequence number `first` on."""
+        sent = 0
+        writer.write(b"SLINFO  " + bytes(RECORD_SIZE))
+        for sequence, record in self.packets:
+            if sequence < first:
+                continue
+            writer.write(f"SL{sequence:06X}".encode() + record)
+            sent += 1
+            if sent == self.close_after:
+                break
+        await writer.drain()
+        if self.close_after:
+            writer.close()
+        else:
+            await reader.read()
+
+
+def stream_samples() -> np.ndarray:
+    return samples("STEIM2", np.random.default_rng(1))
+
+
+async def test_client_streams_chunks() -> None:
+    data = stream_samples()
+    server = StandInSeedLink(make_records(data))
+    await server.start()
+    client = SeedLinkClient(
+        "127.0.0.1", server.port, stations=["QS_TEST"], selectors=["HN?"]
+    )
+    chunks = []
+    stream = client.start()
+    try:
+        async for chunk in stream:
+            chunks.append(chunk)
+            if len(chunks) == len(server.packets):
+                break
+    finally:
+        await stream.aclose()
+        await server.stop()
+
+    assert server.commands[0] == [
+        "HELLO",
+        "STATION TEST QS",
+        "SELECT HN?",
+        "DATA",
+        "END",
+    ]
+    assert chunks[0].uid == "TEST" and chunks[0].channels == ("HNZ",)
+    assert chunks[0].tmin == pytest.approx(T0.timestamp, abs=1e-6)
+    assert all(chunk.follows(previous) for previous, chunk in zip(chunks, chunks[1:]))
+    np.testing.assert_array_equal(np.concatenate([c.array[0] for c in chunks]), data)
+    assert client.sequences.get("QS_TEST") == len(server.packets)
+
+
+async def test_client_resumes_after_restart(tmp_path) -> None:
+    data = stream_samples()
+    server = StandInSeedLink(make_records(data))
+    await server.start()
+    state_file = tmp_path / "seedlink.json"
+    received = []
+    try:
+        for _ in range(2):
+            client = SeedLinkClient(
+                "127.0.0.1", server.port, stations=["QS_TEST"], state_file=state_file
+            )
+            records = client.records()
+            async for record in records:
+                received.append(record)
+                if len(received) in (4, len(server.packets)):
+                    break
+            await records.aclose()
+    finally:
+        await server.stop()
+
+    assert json.loads(state_file.read_text()) == {"QS_TEST": len(server.packets)}
+    assert server.commands[1][2] == "DATA 000005"
+    np.testing.assert_array_equal(np.concatenate([r.data for r in received]), data)
+
+
+async def test_client_resumes_after_reconnect() -> None:
+    data = stream_samples()
+    server = StandInSeedLink(make_records(data), close_after=3)
+    await server.start()
+    client = SeedLinkClient(
+        "127.0.0.1", server.port, stations=["QS_TEST"], reconnect_delay=0.01
+    )
+    chunks = []
+    stream = client.start()
+    try:
+        async for chunk in stream:
+            chunks.append(chunk)
+            if len(chunks) == len(server.packets):
+                break
+    finally:
+        await stream.aclose()
+        await server.stop()
+
+    assert len(server.commands) > 1
+    assert [commands[2] for commands in server.commands[:3]] == [
+        "DATA",
+        "DATA 000004",
+        "DATA 000007",
+    ]
+    np.testing.assert_array_equal(np.concatenate([c.array[0] for c in chunks]), data)
+
+
+async def test_client_raises_for_unknown_station() -> None:
+    server = StandInSeedLink([])
+    await server.start()
+    client = SeedLinkClient("127.0.0.1", server.port, stations=["QS_OTHER"])
+    try:
+        with pytest.raises(NoDataError):
+            async for _ in client.records():
+                pass
+    finally:
+        await server.stop()
+
+
+def test_client_requires_network_and_station() -> None:
+    with pytest.raises(ValueError):
+        SeedLinkClient(stations=["TEST"])
+    with pytest.raises(ValueError):
+        SeedLinkClient(stations=[])
+
+
+def test_sequence_store_saves_only_changes(tmp_path) -> None:
+    path = tmp_path / "seedlink.json"
+    store = SequenceStore(path)
+    store.save()
+    assert not path.exists()
+
+    store.update("QS_TEST", 42)
+    store.save()
+    assert SequenceStore(path).get("QS_TEST") == 42
+    assert SequenceStore(path).get("QS_OTHER") is None
+
+
+def test_local_sensor_seedlink_stream(state_payload: dict) -> None:
+    state_payload["SeedLinkServerState"]["config"].update(enabled=True, port=18001)
+    sensor = construct_trusted(LocalSensor, state_payload)
+    sensor._url = "192.168.1.10:5533"
+
+    client = sensor.get_seedlink_stream(selectors=["HNZ"])
+    assert (client.host, client.port) == ("192.168.1.10", 18001)
+    assert client.stations == [("QS", sensor.uid)]
+    assert client.selectors == ("HNZ",)
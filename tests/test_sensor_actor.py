@@ -0,0 +1,109 @@
+"""Sensor actor tests."""
+
+import asyncio
+from typing import Callable
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from quakesaver_client.sensor_actor import SensorActor
+
+
+async def test_actor_keeps_connection_and_measures_rtt(
+    stand_in_sensor: Callable,
+) -> None:
+    requests = []
+    runner = await stand_in_sensor(requests)
+    port = runner.addresses[0][1]
+    try:
+        async with SensorActor("127.0.0.1", port=port, ping_interval=0.05) as actor:
+            assert actor.connected
+            await asyncio.sleep(0.3)
+            assert actor.alive
+            assert actor.rtt_histogram.count >= 3
+            assert 0.0 < actor.rtt < 0.1
+            assert (await actor.get_state())["uid"] == "TEST"
+            assert (await actor.get_state())["uid"] == "TEST"
+        assert not actor.connected
+        assert actor.session is None
+    finally:
+        await runner.cleanup()
+
+    assert requests == ["/ws", "/state", "/state"]
+
+
+async def test_actor_without_context_pings_once(stand_in_sensor: Callable) -> None:
+    runner = await stand_in_sensor()
+    port = runner.addresses[0][1]
+    try:
+        actor = SensorActor("127.0.0.1", port=port)
+        assert await actor.is_alive()
+        assert actor.rtt_histogram.count == 1
+    finally:
+        await runner.cleanup()
+    assert not await SensorActor("127.0.0.1", port=port).is_alive()
+
+
+async def test_actor_detects_dead_sensor(stand_in_sensor: Callable) -> None:
+    runner = await stand_in_sensor()
+    port = runner.addresses[0][1]
+    actor = SensorActor("127.0.0.1", port=port, ping_interval=0.05)
+    async with actor:
+        await asyncio.sleep(0.1)
+        assert actor.alive
+        await runner.cleanup()
+        await asyncio.sleep(0.2)
+        assert not actor.alive
+
+
+async def test_actor_closes_own_session_if_open_fails(
+    stand_in_sensor: Callable,
+) -> None:
+    runner = await stand_in_sensor()
+    port = runner.addresses[0][1]
+    await runner.cleanup()
+
+    actor = SensorActor("127.0.0.1", port=port)
+    with pytest.raises(aiohttp.ClientError):
+        await actor.open()
+    assert actor.session is None
+
+    async with aiohttp.ClientSession() as session:
+        actor = SensorActor("127.0.0.1", port=port, session=session)
+        with pytest.raises(aiohttp.ClientError):
+            await actor.open()
+        assert not session.closed
+
+
+async def test_actor_reconnects_after_close_during_ping() -> None:
+    connections = []
+
+    async def websocket(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(autoping=False)
+        await ws.prepare(request)
+        connections.append(ws)
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.PING:
+                continue
+            if len(connections) == 1:
+                # Drop the first connection while its ping is in flight.
+                await ws.close()
+            else:
+                await ws.pong(msg.data)
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/ws", websocket)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    port = runner.addresses[0][1]
+    try:
+        async with SensorActor("127.0.0.1", port=port, ping_interval=0.05) as actor:
+            await asyncio.sleep(0.3)
+            assert not actor._keepalive.done()
+            assert len(connections) >= 2
+            assert actor.alive
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,58 @@
+"""STA/LTA trigger tests."""
+
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from obspy.signal.trigger import recursive_sta_lta
+
+from quakesaver_client.client_websocket import TraceChunk
+from quakesaver_client.models.sensor_state import STALTAConfig
+from quakesaver_client.triggers import RecursiveSTALTA
+
+T0 = datetime(2023, 3, 7, 9, 0, 0, tzinfo=timezone.utc)
+DELTA_T = 0.01
+
+
+def test_chunked_ratio_matches_obspy() -> None:
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=3000)
+    data[0] = 0.0  # obspy skips the first sample
+    trigger = RecursiveSTALTA(nsta=50, nlta=300)
+
+    ratio = np.concatenate(
+        [
+            trigger.characteristic_function(("TEST", "HHZ"), chunk)
+            for chunk in np.array_split(data, 37)
+        ]
+    )
+    np.testing.assert_allclose(ratio, recursive_sta_lta(data, 50, 300), rtol=1e-10)
+
+
+def test_trigger_events_are_sample_accurate() -> None:
+    rng = np.random.default_rng(1)
+    data = rng.normal(size=4000)
+    data[0] = 0.0
+    data[2000:2300] *= 20.0
+    trigger = RecursiveSTALTA.from_config(
+        STALTAConfig(nsta=50, nlta=300, trigger_threshold=3.0),
+        detrigger_threshold=1.5,
+    )
+
+    events = []
+    for ichunk, chunk in enumerate(np.split(data, 40)):
+        events += trigger.process(
+            TraceChunk(
+                uid="TEST",
+                channels=("HHZ",),
+                array=chunk[np.newaxis],
+                tmax=T0.timestamp() + (ichunk + 1) * chunk.size * DELTA_T,
+                delta_t=DELTA_T,
+            )
+        )
+
+    assert [event.triggered for event in events] == [True, False]
+    onset = (events[0].time - T0).total_seconds() / DELTA_T
+    assert 2000 <= onset < 2010
+    expected = recursive_sta_lta(data, 50, 300)
+    assert events[0].ratio == pytest.approx(expected[round(onset)])
@@ -0,0 +1,76 @@
+"""Trusted construction tests and microbenchmark."""
+
+import logging
+import time
+
+import pytest
+from pydantic import ValidationError
+
+from quakesaver_client.models import trusted
+from quakesaver_client.models.local_sensor import LocalSensor
+from quakesaver_client.models.sensor_state import RingbufferState, SensorState
+from quakesaver_client.models.trusted import construct_trusted
+
+logger = logging.getLogger(__name__)
+
+RINGBUFFER = {"window": "hann", "window_size": 1024, "filter_length": 64}
+
+
+def test_construct_trusted_builds_sub_models(state_payload: dict) -> None:
+    state = construct_trusted(SensorState, state_payload)
+    validated = SensorState.parse_obj(state_payload)
+    assert isinstance(state.RingbufferState, RingbufferState)
+    assert state.RingbufferState.stats.percent_used == 0.0
+    assert state.STALTAState.config.nsta == validated.STALTAState.config.nsta
+    assert state.__fields_set__ == validated.__fields_set__
+
+    sensor = construct_trusted(LocalSensor, state_payload)
+    assert sensor.uid == "TEST"
+    assert not sensor.pending_modules
+
+
+def test_mutable_defaults_are_independent() -> None:
+    first = construct_trusted(RingbufferState, RINGBUFFER)
+    second = construct_trusted(RingbufferState, RINGBUFFER)
+    assert first.stats == second.stats == RingbufferState(**RINGBUFFER).stats
+
+    first.stats.percent_used = 50.0
+    first.stats.tags["uid"] = "OTHER"
+    assert second.stats.percent_used == 0.0
+    assert second.stats.tags["uid"] != "OTHER"
+    assert construct_trusted(RingbufferState, RINGBUFFER).stats.percent_used == 0.0
+
+
+def test_validation_debug_switch(monkeypatch) -> None:
+    invalid = {"window": "hann", "window_size": "large", "filter_length": 64}
+    assert construct_trusted(RingbufferState, invalid).window_size == "large"
+    monkeypatch.setattr(trusted, "VALIDATE", True)
+    with pytest.raises(ValidationError):
+        construct_trusted(RingbufferState, invalid)
+
+
+def timed(function, *args, repeat: int = 10, rounds: int = 5) -> float:
+    """Time a call by the best of some rounds, which is robust against load."""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            function(*args)
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best
+
+
+@pytest.mark.benchmark
+def test_benchmark_trusted_construction(state_payload: dict) -> None:
+    eager = timed(SensorState.parse_obj, state_payload)
+    fast = timed(construct_trusted, SensorState, state_payload)
+    eager_module = timed(lambda: RingbufferState(**RINGBUFFER))
+    fast_module = timed(construct_trusted, RingbufferState, RINGBUFFER)
+    logger.info(
+        f"SensorState: parse_obj {eager * 1e6:.0f} us, "
+        f"construct_trusted {fast * 1e6:.0f} us; "
+        f"RingbufferState: {eager_module * 1e6:.0f} us, "
+        f"construct_trusted {fast_module * 1e6:.0f} us"
+    )
+    assert fast < eager / 1.5
+    assert fast_module < eager_module / 2